@@ -14,6 +14,16 @@ from config import config
 from extensions import jwt, api, init_mongo, get_db, close_mongo
 from models import create_indexes
 from automation import automation_manager
+from utils.serialization import FastJSONProvider
+from utils.http_cache import http_cache, init_http_cache
+from utils.compression import init_compression
+from utils.metrics import init_metrics
+from utils.query_monitor import init_query_monitor
+from utils.profiler import init_request_profiler
+from utils.errors import APIError
+from utils.startup import startup_report
+from services.catalog_watcher import catalog_watcher
+import importlib
 import logging
 from datetime import datetime
 
@@ -25,35 +35,65 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def create_app(config_name='development'):
-    """Application factory"""
+def create_app(config_name='development', start_scheduler=None):
+    """Application factory
     
+    start_scheduler defaults to config.SCHEDULER_ENABLED. Production entry
+    points (wsgi.py) pass False and start it in one designated process.
+    """
+    
+    with startup_report.phase('create_app'):
+        app = _create_app(start_scheduler)
+    logger.info(f"[OK] Flask application initialized in {startup_report.get('create_app')['seconds']:.2f}s")
+    
+    return app
+
+
+def _create_app(start_scheduler):
     # Create Flask app
     app = Flask(__name__)
+    # orjson-backed encoder; also handles ObjectId and datetime
+    app.json = FastJSONProvider(app)
     
     # Load configuration
     app.config.from_object(config)
     
     # Initialize extensions
-    jwt.init_app(app)
-    api.init_app(app)
-    CORS(app, resources={r"/api/*": {"origins": config.CORS_ORIGINS}})
+    with startup_report.phase('extensions'):
+        jwt.init_app(app)
+        api.init_app(app)
+        CORS(app, resources={r"/api/*": {"origins": config.CORS_ORIGINS}})
+        # Before compression so the recorded response size is the compressed one
+        init_metrics(app)
+        init_compression(app)
+        init_http_cache(app)
+        if config.QUERY_MONITOR_ENABLED:
+            init_query_monitor(app)
+        if config.PROFILER_ENABLED:
+            init_request_profiler(app)
     
     # Initialize MongoDB
-    with app.app_context():
+    with startup_report.phase('mongodb'), app.app_context():
         init_mongo(app)
         create_indexes()
     
-    # Register blueprints
-    from routes import auth_bp, products_bp, orders_bp, ml_bp, chatbot_bp, reviews_bp
-    # Register core chatbot blueprint
-    app.register_blueprint(auth_bp)
-    app.register_blueprint(products_bp)
-    app.register_blueprint(orders_bp)
-    app.register_blueprint(reviews_bp)
-    app.register_blueprint(ml_bp)
-    app.register_blueprint(chatbot_bp)
+    # Register blueprints; each import is timed, since that is where ML/RAG libraries load
+    for name in config.ENABLED_BLUEPRINTS:
+        with startup_report.phase(f'routes.{name}'):
+            module = importlib.import_module(f'routes.{name}')
+            app.register_blueprint(getattr(module, f'{name}_bp'))
+    
+    # Per-process product cache invalidation; (re)started lazily so forked workers get their own
+    @app.before_request
+    def start_catalog_watcher():
+        catalog_watcher.ensure_running()
+    
     # Register error handlers
+    @app.errorhandler(APIError)
+    def api_error(error):
+        # Raised outside a route's own try/except, e.g. by role_required
+        return jsonify({'status': 'error', 'message': error.message}), error.status_code
+    
     @app.errorhandler(400)
     def bad_request(error):
         return jsonify({'status': 'error', 'message': 'Bad request'}), 400
@@ -95,6 +135,7 @@ def create_app(config_name='development'):
     
     # API Info endpoint
     @app.route('/api/info', methods=['GET'])
+    @http_cache(max_age=3600, stale_while_revalidate=86400)
     def api_info():
         return jsonify({
             'status': 'success',
@@ -123,7 +164,8 @@ def create_app(config_name='development'):
                 'data': {
                     'database': db.name,
                     'collections': collections,
-                    'collection_count': len(collections)
+                    'collection_count': len(collections),
+                    'catalog_cache': catalog_watcher.get_status()
                 }
             }), 200
         except Exception as e:
@@ -142,18 +184,61 @@ def create_app(config_name='development'):
         }), 200
     
     # Start automation scheduler
-    automation_manager.start()
-    
-    logger.info("[OK] Flask application initialized successfully")
+    if start_scheduler is None:
+        start_scheduler = config.SCHEDULER_ENABLED
+    if start_scheduler:
+        automation_manager.start()
     
     return app
 
 
-# Create app instance for WSGI servers (Waitress, Gunicorn)
-app = create_app()
+def warm_up():
+    """Load ML artifacts and the chatbot KB up front.
+    
+    Called before gunicorn forks workers so the loaded models are shared
+    copy-on-write instead of being built lazily in every worker. Only the
+    enabled blueprints are warmed, so catalogue-only workers skip it all.
+    """
+    steps = []
+    if 'products' in config.ENABLED_BLUEPRINTS:
+        from services.product_search import product_search
+        from services.autocomplete import product_suggestions
+        steps += [
+            ('product search index', product_search.build),
+            ('product suggestions', product_suggestions.build)
+        ]
+    if 'ml' in config.ENABLED_BLUEPRINTS:
+        from ml.models import crop_recommender, price_predictor, product_recommender
+        from ml import item_similarity_index, popularity_index, price_forecaster
+        steps += [
+            ('crop recommendation model', crop_recommender.load_or_train),
+            ('price prediction model', price_predictor.load_or_train),
+            ('user-item matrix', product_recommender.build_user_item_matrix),
+            ('item similarity index', item_similarity_index.load),
+            ('popularity index', popularity_index.load_or_refresh),
+            ('price forecast model', price_forecaster.load)
+        ]
+    if 'chatbot' in config.ENABLED_BLUEPRINTS:
+        from routes.chatbot import chatbot_service
+        from services.autocomplete import question_suggestions
+        steps += [
+            ('chatbot knowledge base', chatbot_service.load),
+            ('question suggestions', question_suggestions.build)
+        ]
+    
+    with startup_report.phase('warm_up'):
+        for name, step in steps:
+            try:
+                with startup_report.phase(name):
+                    step()
+            except Exception as e:
+                logger.warning(f"[WARN] Warm-up of {name} failed: {str(e)}")
+    logger.info(f"[OK] Warm-up complete in {startup_report.get('warm_up')['seconds']:.2f}s")
 
 
 if __name__ == '__main__':
+    app = create_app()
+    
     print("""
     ===================================================================
       AgriSmart - AI-Powered Agriculture E-Commerce
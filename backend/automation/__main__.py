@@ -0,0 +1,58 @@
+"""
+Standalone Scheduler Runner
+Run with: python -m automation [--run-once JOB_ID]
+
+Runs the APScheduler jobs outside the web processes. Several runners may be
+up at once; JobLease ensures each job run executes in only one of them.
+"""
+
+# Load environment variables before config is imported
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import logging
+import signal
+import threading
+from extensions import init_mongo, get_db, close_mongo
+from models import create_indexes
+from automation.scheduler import automation_manager
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger('automation')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AgriSmart scheduler runner')
+    parser.add_argument('--run-once', metavar='JOB_ID', help='run a single job now and exit')
+    args = parser.parse_args()
+    
+    init_mongo(None)
+    if get_db() is None:
+        logger.error("MongoDB unavailable; scheduler needs the database for job leases")
+        return 1
+    create_indexes()
+    
+    if args.run_once:
+        automation_manager.run_now(args.run_once)
+        close_mongo()
+        return 0
+    
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    
+    automation_manager.start()
+    logger.info(f"[OK] Scheduler runner {automation_manager.owner} started")
+    stop_event.wait()
+    
+    automation_manager.stop()
+    close_mongo()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -6,20 +6,44 @@ Handles background jobs and scheduled tasks
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.cron import CronTrigger
-from datetime import datetime, timedelta
-from models import Order, Product, PriceHistory
+from datetime import datetime, timedelta, timezone
+from models import Order, Product, PriceHistory, JobLease, JobRun, CollectionVersion
 import logging
+import os
+import socket
 
 logger = logging.getLogger(__name__)
 
+# Interval jobs count from this instant rather than from process start, so
+# every runner fires them in the same slots and the lease can dedupe them
+INTERVAL_ANCHOR = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class JobSkipped(Exception):
+    """Raised by a job that had nothing to do; the run is recorded as skipped"""
+
 
 class AutomationManager:
-    """Manages scheduled automation tasks"""
+    """Manages scheduled automation tasks
+    
+    Every run goes through _run_job, which takes a Mongo lease for the job
+    first. When several scheduler processes are up, only the one that gets
+    the lease executes that run; the others skip it. Each executed run is
+    recorded in JobRun.
+    """
+    
+    # Lease length for cron jobs; interval jobs hold it for half their interval
+    DEFAULT_LEASE_SECONDS = 3600
     
     def __init__(self):
         self.scheduler = BackgroundScheduler()
         self.jobs = {}
     
+    @property
+    def owner(self):
+        # Evaluated per run so forked processes get their own identity
+        return f"{socket.gethostname()}:{os.getpid()}"
+    
     def start(self):
         """Start the scheduler"""
         if not self.scheduler.running:
@@ -39,7 +63,7 @@ class AutomationManager:
         self.add_job(
             'update_prices',
             self._update_product_prices,
-            trigger=IntervalTrigger(minutes=30)
+            trigger=IntervalTrigger(minutes=30, start_date=INTERVAL_ANCHOR)
         )
         
         # Run daily at 2 AM
@@ -53,7 +77,7 @@ class AutomationManager:
         self.add_job(
             'order_reminders',
             self._send_order_reminders,
-            trigger=IntervalTrigger(hours=6)
+            trigger=IntervalTrigger(hours=6, start_date=INTERVAL_ANCHOR)
         )
         
         # Run daily at 9 AM
@@ -63,28 +87,98 @@ class AutomationManager:
             trigger=CronTrigger(hour=9, minute=0)
         )
         
+        # Run every 15 minutes
+        self.add_job(
+            'popularity_index',
+            self._refresh_popularity_index,
+            trigger=IntervalTrigger(minutes=15, start_date=INTERVAL_ANCHOR)
+        )
+        
+        # Run nightly at 4 AM
+        self.add_job(
+            'price_forecast_model',
+            self._train_price_forecaster,
+            trigger=CronTrigger(hour=4, minute=0)
+        )
+        
+        # Run nightly at 3 AM
+        self.add_job(
+            'item_similarity',
+            self._refresh_item_similarity,
+            trigger=CronTrigger(hour=3, minute=0)
+        )
+        
         print("[OK] All automation jobs registered")
     
-    def add_job(self, job_id, job_func, trigger):
+    def add_job(self, job_id, job_func, trigger, lease_seconds=None):
         """Add a scheduled job"""
         try:
-            if not self.scheduler.running:
-                # Schedule for when scheduler starts
-                self.jobs[job_id] = {
-                    'func': job_func,
-                    'trigger': trigger
-                }
-            else:
-                self.scheduler.add_job(
-                    job_func,
-                    trigger=trigger,
-                    id=job_id,
-                    replace_existing=True
-                )
+            if lease_seconds is None:
+                interval = getattr(trigger, 'interval', None)
+                lease_seconds = interval.total_seconds() / 2 if interval else self.DEFAULT_LEASE_SECONDS
+            
+            self.jobs[job_id] = {
+                'func': job_func,
+                'trigger': trigger,
+                'lease_seconds': lease_seconds
+            }
+            # Jobs added before start() are kept pending by APScheduler
+            self.scheduler.add_job(
+                self._run_job,
+                trigger=trigger,
+                args=[job_id],
+                id=job_id,
+                replace_existing=True,
+                coalesce=True,
+                max_instances=1
+            )
             logger.info(f"Job added: {job_id}")
         except Exception as e:
             logger.error(f"Failed to add job {job_id}: {str(e)}")
     
+    def _run_job(self, job_id):
+        """Execute a registered job under its lease and record the run"""
+        job = self.jobs[job_id]
+        owner = self.owner
+        
+        try:
+            if not JobLease.acquire(job_id, owner, job['lease_seconds']):
+                logger.info(f"Skipping {job_id}: lease held by another scheduler")
+                return
+        except Exception as e:
+            logger.error(f"Could not acquire lease for {job_id}: {str(e)}")
+            return
+        
+        started_at = datetime.utcnow()
+        status, documents_touched, error = 'success', None, None
+        # One version bump per collection for the whole run, e.g. all price updates
+        CollectionVersion.defer()
+        try:
+            documents_touched = job['func']()
+        except JobSkipped as e:
+            status, documents_touched, error = 'skipped', 0, str(e)
+            logger.info(f"Job {job_id} skipped: {error}")
+        except Exception as e:
+            status, error = 'failed', str(e)
+            logger.error(f"Job {job_id} failed: {error}")
+            JobLease.release(job_id, owner)
+        finally:
+            CollectionVersion.flush()
+        finished_at = datetime.utcnow()
+        
+        # The lease is otherwise kept until it expires so late-firing peers skip this run
+        try:
+            JobRun.record_run(job_id, owner, started_at, finished_at, status,
+                              documents_touched=documents_touched, error=error)
+        except Exception as e:
+            logger.error(f"Failed to record run of {job_id}: {str(e)}")
+    
+    def run_now(self, job_id):
+        """Run a registered job immediately, still subject to its lease"""
+        if job_id not in self.jobs:
+            self._register_jobs()
+        self._run_job(job_id)
+    
     def remove_job(self, job_id):
         """Remove a scheduled job"""
         try:
@@ -95,96 +189,130 @@ class AutomationManager:
     
     def _update_product_prices(self):
         """Update product prices based on market data"""
-        try:
-            logger.info("Starting price update task...")
-            
-            products = Product.find_many({'is_active': True})
+        logger.info("Starting price update task...")
+        
+        products = Product.find_many({'is_active': True})
+        
+        for product in products:
+            # Simulate market price update
+            old_price = product['price']
+            price_change = (old_price * 0.02)  # 2% change
+            new_price = old_price + price_change
             
-            for product in products:
-                # Simulate market price update
-                old_price = product['price']
-                price_change = (old_price * 0.02)  # 2% change
-                new_price = old_price + price_change
-                
-                # Record price history
-                PriceHistory.record_price(
-                    product_id=product['_id'],
-                    price=new_price,
-                    market_price=new_price
-                )
-                
-                # Update product price
-                Product.update(str(product['_id']), {'price': new_price})
+            # Record price history
+            PriceHistory.record_price(
+                product_id=product['_id'],
+                price=new_price,
+                market_price=new_price
+            )
             
-            logger.info(f"Price update completed for {len(products)} products")
+            # Update product price
+            Product.update(str(product['_id']), {'price': new_price})
         
-        except Exception as e:
-            logger.error(f"Price update failed: {str(e)}")
+        logger.info(f"Price update completed for {len(products)} products")
+        # One history insert plus one product update each
+        return 2 * len(products)
     
     def _check_low_stock(self):
         """Check for low stock and send alerts"""
-        try:
-            logger.info("Starting stock check task...")
-            
-            # Find products with low stock (< 10 units)
-            products = Product.find_many({'is_active': True})
-            low_stock_products = [p for p in products if p['quantity'] < 10]
-            
-            for product in low_stock_products:
-                alert_message = f"Low stock alert: {product['name']} has only {product['quantity']} units left"
-                logger.warning(alert_message)
-                # TODO: Send notification to farmer
-            
-            logger.info(f"Stock check completed. Found {len(low_stock_products)} low stock items")
+        logger.info("Starting stock check task...")
         
-        except Exception as e:
-            logger.error(f"Stock check failed: {str(e)}")
+        # Find products with low stock (< 10 units)
+        low_stock_products = Product.find_many({'is_active': True, 'quantity': {'$lt': 10}}, analytics=True)
+        
+        for product in low_stock_products:
+            alert_message = f"Low stock alert: {product['name']} has only {product['quantity']} units left"
+            logger.warning(alert_message)
+            # TODO: Send notification to farmer
+        
+        logger.info(f"Stock check completed. Found {len(low_stock_products)} low stock items")
+        return len(low_stock_products)
     
     def _send_order_reminders(self):
         """Send reminders for pending orders"""
-        try:
-            logger.info("Starting order reminder task...")
-            
-            # Find pending orders older than 1 day
-            cutoff_date = datetime.utcnow() - timedelta(days=1)
-            orders = Order.find_many({'status': 'pending'})
-            
-            pending_orders = [
-                o for o in orders 
-                if o['created_at'] < cutoff_date
-            ]
-            
-            for order in pending_orders:
-                reminder_message = f"Order {str(order['_id'])} is still pending for {(datetime.utcnow() - order['created_at']).days} days"
-                logger.info(reminder_message)
-                # TODO: Send notification to buyer
-            
-            logger.info(f"Order reminder task completed for {len(pending_orders)} orders")
+        logger.info("Starting order reminder task...")
         
-        except Exception as e:
-            logger.error(f"Order reminder task failed: {str(e)}")
+        # Find pending orders older than 1 day
+        cutoff_date = datetime.utcnow() - timedelta(days=1)
+        pending_orders = Order.find_many(
+            {'status': 'pending', 'created_at': {'$lt': cutoff_date}}, analytics=True
+        )
+        
+        for order in pending_orders:
+            reminder_message = f"Order {str(order['_id'])} is still pending for {(datetime.utcnow() - order['created_at']).days} days"
+            logger.info(reminder_message)
+            # TODO: Send notification to buyer
+        
+        logger.info(f"Order reminder task completed for {len(pending_orders)} orders")
+        return len(pending_orders)
     
     def _send_weather_notifications(self):
         """Send weather-based notifications to farmers"""
-        try:
-            logger.info("Starting weather notification task...")
-            
-            # TODO: Integrate with weather API
-            # For now, just log
-            logger.info("Weather notifications sent to farmers")
+        logger.info("Starting weather notification task...")
         
-        except Exception as e:
-            logger.error(f"Weather notification task failed: {str(e)}")
+        # TODO: Integrate with weather API
+        # For now, just log
+        logger.info("Weather notifications sent to farmers")
+        return 0
+    
+    def _refresh_popularity_index(self):
+        """Recompute product popularity and publish the snapshot web workers read"""
+        logger.info("Starting popularity index refresh...")
+        
+        from ml.popularity import popularity_index
+        n_products = popularity_index.refresh()
+        
+        logger.info(f"Popularity index refresh completed for {n_products} products")
+        return n_products
+    
+    def _refresh_item_similarity(self):
+        """Recompute the item-item neighbour index used for recommendations"""
+        logger.info("Starting item similarity refresh...")
+        
+        # Imported here so the scheduler does not load the ML stack at import
+        from ml.item_similarity import item_similarity_index
+        n_items = item_similarity_index.build()
+        
+        logger.info(f"Item similarity refresh completed for {n_items} products")
+        return n_items
+    
+    def _train_price_forecaster(self):
+        """Retrain the multi-horizon price forecaster on recent price history"""
+        logger.info("Starting price forecaster training...")
+        
+        from ml.forecasting import price_forecaster
+        n_rows = price_forecaster.train()
+        if not n_rows:
+            raise JobSkipped("Not enough price history to train the forecaster; kept the current model")
+        
+        logger.info(f"Price forecaster training completed on {n_rows} rows")
+        return n_rows
     
     def get_job_status(self):
         """Get status of all scheduled jobs"""
         jobs_info = []
         
         for job in self.scheduler.get_jobs():
+            last_run = None
+            try:
+                runs = JobRun.find_recent(job.id, limit=1)
+                if runs:
+                    last_run = {
+                        'started_at': runs[0]['started_at'].isoformat(),
+                        'duration_ms': runs[0]['duration_ms'],
+                        'status': runs[0]['status'],
+                        'owner': runs[0]['owner'],
+                        'documents_touched': runs[0]['documents_touched'],
+                        'error': runs[0].get('error')
+                    }
+            except Exception as e:
+                logger.error(f"Failed to load run history for {job.id}: {str(e)}")
+            
             jobs_info.append({
                 'job_id': job.id,
-                'next_run': job.next_run_time.isoformat() if job.next_run_time else None,
-                'trigger': str(job.trigger)
+                'next_run': job.next_run_time.isoformat() if getattr(job, 'next_run_time', None) else None,
+                'trigger': str(job.trigger),
+                'last_run': last_run
             })
         
         return {
@@ -0,0 +1,4 @@
+"""
+Benchmark suites
+Load tests and microbenchmarks; not imported by the application
+"""
@@ -0,0 +1,290 @@
+"""
+API load test
+Boots the app in-process against mongomock or a local MongoDB, seeds a synthetic
+dataset and drives endpoints with concurrent clients
+
+    python -m benchmarks.load_test                          # mongomock, default sizes
+    python -m benchmarks.load_test --mongo mongodb://localhost:27017/ --products 20000
+    python -m benchmarks.load_test --endpoints products_list,login --requests 500
+    python -m benchmarks.load_test --compare benchmarks/baselines/<file>.json --fail-on-regression
+
+Results are saved as JSON under benchmarks/baselines/ so runs can be diffed
+between commits.
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.reporting import BACKEND_DIR, new_report, save_report, load_report, compare
+
+
+class Scenario:
+    """One endpoint under test: builds (method, path, json body) per request"""
+
+    def __init__(self, name, build, auth=None):
+        self.name = name
+        self.build = build
+        # None, 'buyer' or 'farmer'; the scenario then sends that role's token
+        self.auth = auth
+
+
+def _scenarios(ctx):
+    product_ids = ctx['product_ids']
+
+    def pick(rng):
+        return rng.choice(product_ids)
+
+    scenarios = [
+        Scenario('products_list', lambda rng: (
+            'GET', f"/api/products/?page={rng.randint(1, 20)}&limit=20", None)),
+        Scenario('products_category', lambda rng: (
+            'GET', f"/api/products/?category={rng.choice(ctx['categories'])}&limit=20", None)),
+        Scenario('product_search', lambda rng: (
+            'GET', f"/api/products/search?q={rng.choice(['tomato', 'wheat seed', 'organik fertiliser', 'pot'])}", None)),
+        Scenario('product_detail', lambda rng: ('GET', f"/api/products/{pick(rng)}", None)),
+        Scenario('reviews_list', lambda rng: ('GET', f"/api/reviews/?product_id={pick(rng)}", None)),
+        Scenario('login', lambda rng: ('POST', '/api/auth/login', {
+            'email': rng.choice(ctx['buyer_emails']), 'password': ctx['password']})),
+        Scenario('profile', lambda rng: ('GET', '/api/auth/profile', None), auth='buyer'),
+        Scenario('orders_list', lambda rng: ('GET', '/api/orders/?limit=20', None), auth='buyer'),
+        Scenario('order_create', lambda rng: ('POST', '/api/orders/', {
+            'items': [{'product_id': pick(rng), 'quantity': 1} for _ in range(rng.randint(1, 3))],
+            'shipping_address': 'Bench Street'}), auth='buyer'),
+        Scenario('popular_products', lambda rng: ('GET', '/api/ml/popular-products?limit=10', None)),
+        Scenario('product_recommendation', lambda rng: (
+            'POST', '/api/ml/product-recommendation', {'n_recommendations': 5}), auth='buyer'),
+        Scenario('price_forecast', lambda rng: ('POST', '/api/ml/price-forecast', {
+            'product_ids': rng.sample(product_ids, 5), 'horizon': 7})),
+        Scenario('crop_recommendation', lambda rng: ('POST', '/api/ml/crop-recommendation', {
+            'soil_type': rng.choice(['Loam', 'Clay', 'Sandy', 'Silt', 'Chalk']),
+            'season': rng.choice(['Spring', 'Summer', 'Monsoon', 'Winter']),
+            'rainfall': rng.choice(['Low', 'Medium', 'High']), 'temperature': rng.randint(10, 40),
+            'humidity': rng.randint(30, 90)})),
+        Scenario('chatbot_ask', lambda rng: ('POST', '/api/chatbot/query', {
+            'question': rng.choice(['How do I grow tomatoes?', 'Best fertilizer for wheat?',
+                                    'When to harvest rice?'])})),
+    ]
+    return {scenario.name: scenario for scenario in scenarios}
+
+
+# Chatbot answers are slow and dominated by the model; opt in with --endpoints
+DEFAULT_ENDPOINTS = [
+    'products_list', 'products_category', 'product_search', 'product_detail', 'reviews_list',
+    'login', 'profile', 'orders_list', 'order_create', 'popular_products',
+    'product_recommendation', 'price_forecast', 'crop_recommendation'
+]
+
+
+class InProcessTransport:
+    """Flask test client per thread; no network or server process involved"""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, body, headers):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HTTPTransport:
+    """requests session per thread against a running server"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self._local = threading.local()
+
+    def request(self, method, path, body, headers):
+        import requests
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        response = session.request(method, self.base_url + path, json=body, headers=headers, timeout=30)
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            return response.status_code, None
+
+
+def _login(transport, email, password):
+    status, body = transport.request('POST', '/api/auth/login', {'email': email, 'password': password}, {})
+    if status != 200:
+        raise RuntimeError(f"Login failed for {email}: {status} {body}")
+    data = body.get('data', body)
+    return data['access_token']
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(transport, scenario, tokens, n_requests, concurrency, warmup, seed):
+    """Fire n_requests at one scenario from `concurrency` threads.
+
+    Returns latency percentiles in milliseconds, throughput and the
+    count of non-2xx responses.
+    """
+    headers = {}
+    if scenario.auth:
+        headers['Authorization'] = f"Bearer {tokens[scenario.auth]}"
+
+    def one(i):
+        rng = random.Random(seed * 1_000_003 + i)
+        method, path, body = scenario.build(rng)
+        start = time.perf_counter()
+        try:
+            status, _ = transport.request(method, path, body, headers)
+        except Exception:
+            status = None
+        return time.perf_counter() - start, status
+
+    for i in range(warmup):
+        one(-1 - i)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(n_requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(duration * 1000 for duration, _ in results)
+    errors = sum(1 for _, status in results if status is None or status >= 400)
+    return {
+        'requests': n_requests,
+        'errors': errors,
+        'throughput_rps': round(n_requests / elapsed, 2) if elapsed else None,
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'p50_ms': round(_percentile(latencies, 50), 3),
+        'p95_ms': round(_percentile(latencies, 95), 3),
+        'p99_ms': round(_percentile(latencies, 99), 3),
+        'max_ms': round(latencies[-1], 3)
+    }
+
+
+def _boot_app(mongo_uri):
+    """Create the app against mongo_uri with background work switched off"""
+    # Config is read from the environment at import time
+    os.environ['MONGODB_URI'] = mongo_uri
+    os.environ.setdefault('MONGODB_DB_NAME', 'agrismart_bench')
+    os.environ.setdefault('CATALOG_WATCH_ENABLED', 'false')
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+
+    from app import create_app
+    app = create_app(start_scheduler=False)
+    return app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='AgriSmart API load test')
+    parser.add_argument('--mongo', default='mongomock://',
+                        help='MongoDB URI, or mongomock:// for an in-memory database (default)')
+    parser.add_argument('--url', help='Benchmark a running server instead; the dataset must already be seeded')
+    parser.add_argument('--buyers', type=int, default=200)
+    parser.add_argument('--farmers', type=int, default=20)
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--reviews', type=int, default=3000)
+    parser.add_argument('--price-days', type=int, default=90)
+    parser.add_argument('--endpoints', default=','.join(DEFAULT_ENDPOINTS),
+                        help='Comma-separated scenario names, or "all"')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per endpoint')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Baseline file to write (default: benchmarks/baselines/load-<commit>-<time>.json)')
+    parser.add_argument('--no-save', action='store_true')
+    parser.add_argument('--compare', help='Baseline JSON to diff against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='p95 increase counted as a regression (default 0.2 = 20%%)')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = {
+        'buyers': args.buyers, 'farmers': args.farmers, 'products': args.products,
+        'orders': args.orders, 'reviews': args.reviews, 'price_days': args.price_days
+    }
+
+    if args.url:
+        transport = HTTPTransport(args.url)
+        target = args.url
+        # A live server can't be seeded from here; derive requests from its data
+        from benchmarks.seed import PASSWORD
+        status, body = transport.request('GET', '/api/products/?limit=100', None, {})
+        products = (body or {}).get('data') or []
+        ctx = {
+            'product_ids': [p['id'] for p in products],
+            'buyer_emails': [f'buyer{i}@bench.local' for i in range(args.buyers)],
+            'farmer_emails': [f'farmer{i}@bench.local' for i in range(args.farmers)],
+            'categories': sorted({p['category'] for p in products}) or ['Vegetables'],
+            'password': PASSWORD,
+            'sizes': None
+        }
+    else:
+        app = _boot_app(args.mongo)
+        transport = InProcessTransport(app)
+        target = args.mongo
+        from extensions import get_db
+        from benchmarks.seed import seed_dataset
+        print(f"[OK] Seeding {sizes} into {target}")
+        started = time.perf_counter()
+        ctx = seed_dataset(get_db(), sizes, seed=args.seed)
+        print(f"[OK] Seeded in {time.perf_counter() - started:.1f}s")
+        # Build models from the seeded data so training isn't timed as request latency
+        from app import warm_up
+        warm_up()
+
+    scenarios = _scenarios(ctx)
+    names = list(scenarios) if args.endpoints == 'all' else [n.strip() for n in args.endpoints.split(',') if n.strip()]
+    unknown = [n for n in names if n not in scenarios]
+    if unknown:
+        raise SystemExit(f"Unknown endpoints {unknown}; choose from {sorted(scenarios)}")
+
+    tokens = {}
+    if any(scenarios[n].auth == 'buyer' for n in names):
+        tokens['buyer'] = _login(transport, ctx['buyer_emails'][0], ctx['password'])
+    if any(scenarios[n].auth == 'farmer' for n in names):
+        tokens['farmer'] = _login(transport, ctx['farmer_emails'][0], ctx['password'])
+
+    results = {}
+    print(f"\n{'endpoint':<24}{'p50':>9}{'p95':>9}{'p99':>9}{'rps':>9}{'errors':>8}")
+    for name in names:
+        result = run_scenario(transport, scenarios[name], tokens, args.requests,
+                              args.concurrency, args.warmup, args.seed)
+        results[name] = result
+        print(f"{name:<24}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+              f"{result['throughput_rps']:>9.1f}{result['errors']:>8}")
+
+    report = new_report('load', {
+        'target': 'http' if args.url else ('mongomock' if target.startswith('mongomock://') else 'mongodb'),
+        'sizes': ctx['sizes'], 'requests': args.requests,
+        'concurrency': args.concurrency, 'warmup': args.warmup, 'seed': args.seed
+    }, results)
+
+    if not args.no_save:
+        save_report(report, args.output)
+
+    if args.compare:
+        regressions = compare(report, load_report(args.compare), 'p95_ms', args.threshold,
+                              columns=('throughput_rps',))
+        if regressions and args.fail_on_regression:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
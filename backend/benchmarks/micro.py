@@ -0,0 +1,337 @@
+"""
+Microbenchmarks
+Per-call timings of RAG retrieval, ML inference and search hot paths over a range of
+corpus and matrix sizes
+
+    python -m benchmarks.micro                          # every case, every size
+    python -m benchmarks.micro --only rag --quick       # cases matching "rag", two smallest sizes
+    python -m benchmarks.micro --compare benchmarks/baselines/<file>.json --fail-on-regression
+
+Timings use timeit with autoranged loop counts; the median of --repeat runs
+is reported per call. Models and corpora are synthetic and built in memory,
+so results depend only on the code under test and the machine.
+"""
+
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import timeit
+
+from benchmarks.reporting import BACKEND_DIR, new_report, save_report, load_report, compare
+
+VOCABULARY = [
+    'tomato', 'wheat', 'rice', 'cotton', 'onion', 'potato', 'maize', 'sugarcane', 'soil',
+    'fertilizer', 'urea', 'compost', 'irrigation', 'drip', 'monsoon', 'winter', 'summer',
+    'pest', 'aphid', 'blight', 'fungicide', 'yield', 'harvest', 'seed', 'sowing', 'market',
+    'price', 'mandi', 'loam', 'clay', 'nitrogen', 'phosphorus', 'potassium', 'organic',
+    'rainfall', 'temperature', 'humidity', 'scheme', 'subsidy', 'storage', 'weather'
+]
+
+QUERY = 'which fertilizer should I use for tomato in the monsoon season'
+
+
+class Case:
+    """One benchmarked function; setup(size) returns the zero-argument callable to time"""
+
+    def __init__(self, name, sizes, setup):
+        self.name = name
+        self.sizes = sizes
+        self.setup = setup
+
+
+def _text(rng, n_words):
+    words = [rng.choice(VOCABULARY) for _ in range(n_words)]
+    # Sentences of ~12 words so sentence-level matching has work to do
+    for i in range(11, n_words, 12):
+        words[i] += '.'
+    return ' '.join(words)
+
+
+def _simple_rag_retrieve(size):
+    from rag.chatbot import SimpleRAGChatbot
+    rng = random.Random(size)
+    chatbot = SimpleRAGChatbot()
+    chatbot.knowledge_base = [
+        {'keywords': rng.sample(VOCABULARY, 4), 'response': _text(rng, 80)}
+        for _ in range(size)
+    ]
+    return lambda: chatbot.retrieve_relevant_docs(QUERY, k=3)
+
+
+def _internal_rag(size):
+    from rag.chatbot import InternalRAGChatbot
+    rng = random.Random(size)
+    chatbot = InternalRAGChatbot()
+    # Time the in-process keyword path, not an embedding model
+    chatbot.available_embeddings = False
+    chatbot.chunks = [
+        {'text': _text(rng, 400), 'metadata': {'title': f'doc{i}', 'category': 'crops'}}
+        for i in range(size)
+    ]
+    return chatbot
+
+
+def _internal_rag_retrieve(size):
+    chatbot = _internal_rag(size)
+    return lambda: chatbot.retrieve(QUERY, k=4)
+
+
+def _internal_rag_answer(size):
+    chatbot = _internal_rag(size)
+    contexts = chatbot.chunks
+    return lambda: chatbot.generate_answer_from_context(QUERY, contexts)
+
+
+def _vector_store(size):
+    from services.vector_store import VectorStore
+    rng = random.Random(size)
+    store = VectorStore()
+    store._initialized = True
+    store.documents = [
+        {'content': _text(rng, 120), 'crop': rng.choice(VOCABULARY[:8]), 'topic': rng.choice(VOCABULARY)}
+        for _ in range(size)
+    ]
+    return store
+
+
+def _vector_store_keyword(size):
+    store = _vector_store(size)
+    store.embeddings_model = None
+    return lambda: store.search(QUERY, k=3)
+
+
+class _FixedEncoder:
+    """Returns one precomputed query vector so model inference stays out of the timing"""
+
+    def __init__(self, vector):
+        self.vector = vector
+
+    def encode(self, texts, convert_to_numpy=True):
+        return self.vector
+
+
+def _vector_store_cosine(size):
+    import numpy as np
+    store = _vector_store(size)
+    rng = np.random.default_rng(size)
+    # all-MiniLM-L6-v2 dimensions
+    store.embeddings = rng.standard_normal((size, 384)).astype(np.float32)
+    store.embeddings_model = _FixedEncoder(rng.standard_normal((1, 384)).astype(np.float32))
+    store.faiss_index = None
+    return lambda: store.search(QUERY, k=3)
+
+
+def _forest_data(n_samples, n_features, rng):
+    return rng.integers(0, 40, size=(n_samples, n_features)), rng.integers(0, 10, size=n_samples)
+
+
+def _crop_predict(n_estimators):
+    from sklearn.ensemble import RandomForestClassifier
+    from ml.models import CropRecommendationModel
+    import numpy as np
+    X, y = _forest_data(2000, 5, np.random.default_rng(0))
+    model = CropRecommendationModel()
+    model.model = RandomForestClassifier(n_estimators=n_estimators, random_state=42, n_jobs=1)
+    model.model.fit(X, np.asarray(CropRecommendationModel.CROPS)[y])
+    # Marked loaded so predict() keeps this forest instead of the persisted model
+    model._loaded = True
+    return lambda: model.predict('Loam', 'Monsoon', 'High', 28, 75)
+
+
+def _price_predict(n_estimators):
+    from sklearn.ensemble import RandomForestRegressor
+    from ml.models import PricePredictionModel
+    import numpy as np
+    rng = np.random.default_rng(0)
+    X, _ = _forest_data(2000, 4, rng)
+    y = 100 + X[:, 1] * 10 - X[:, 3] / 10 + rng.normal(0, 10, len(X))
+    model = PricePredictionModel()
+    model.model = RandomForestRegressor(n_estimators=n_estimators, random_state=42, n_jobs=1)
+    model.model.fit(X, y)
+    model._loaded = True
+    return lambda: model.predict(days_from_now=7, season=2, category=1, quantity=250)
+
+
+def _recommender(size, ratings_per_user=20):
+    """ProductRecommendationModel over a random users x items rating matrix.
+
+    Products exist in the (mongomock) database so recommend_products can
+    hydrate its results the way it does in production.
+    """
+    import numpy as np
+    from scipy import sparse
+    from bson import ObjectId
+    from datetime import datetime
+    from extensions import get_db
+    from ml.models import ProductRecommendationModel
+
+    n_users, n_items = (int(n) for n in size.split('x'))
+    rng = np.random.default_rng(n_users * 31 + n_items)
+    item_ids = [str(ObjectId()) for _ in range(n_items)]
+    now = datetime.utcnow()
+    get_db().products.insert_many([
+        {'_id': ObjectId(pid), 'name': f'Product {i}', 'category': 'crops', 'price': 10.0,
+         'rating': 4.0, 'is_active': True, 'created_at': now, 'updated_at': now}
+        for i, pid in enumerate(item_ids)
+    ])
+
+    # Popularity-skewed item choice, like real purchase data
+    popularity = 1.0 / np.arange(1, n_items + 1)
+    popularity /= popularity.sum()
+    rows = np.repeat(np.arange(n_users), ratings_per_user)
+    cols = rng.choice(n_items, size=rows.size, p=popularity)
+    values = rng.integers(1, 6, size=rows.size).astype(np.float32)
+    matrix = sparse.coo_matrix((values, (rows, cols)), shape=(n_users, n_items)).tocsr()
+    # Duplicate (user, item) pairs were summed; clamp back to the rating scale
+    matrix.data = np.minimum(matrix.data, 5)
+
+    model = ProductRecommendationModel()
+    model.user_item_matrix = matrix
+    model.row_sq_norms = model._row_sq_norms(matrix)
+    model.user_index = {f'user{i}': i for i in range(n_users)}
+    model.item_ids = item_ids
+    model.item_index = {pid: i for i, pid in enumerate(item_ids)}
+    return model, rng
+
+
+def _recommender_score(size):
+    model, rng = _recommender(size)
+    rows = itertools.cycle(int(row) for row in rng.integers(0, model.user_item_matrix.shape[0], size=64))
+    return lambda: model._score_user_based(next(rows))
+
+
+def _recommender_recommend(size):
+    model, rng = _recommender(size)
+    buyers = itertools.cycle(f'user{i}' for i in rng.integers(0, model.user_item_matrix.shape[0], size=64))
+    return lambda: model.recommend_products(next(buyers), 5)
+
+
+SEARCH_QUERIES = ['tomato', 'tomatoe', 'basmathi rice', 'organic fertilizer', 'tamatar', 'pot',
+                  'drip irrigation kit', 'wheat seed', 'fertiliser for cotton', 'ur']
+
+
+def _product_search(size):
+    from services.product_search import ProductSearchIndex
+    rng = random.Random(size)
+    names = ['Tomato', 'Basmati Rice', 'Potato', 'Onion', 'Wheat Seed', 'Urea', 'Drip Kit',
+             'Cotton Seed', 'Organic Compost', 'Chilli', 'Maize', 'Sugarcane Sets']
+    index = ProductSearchIndex()
+    index.build({
+        '_id': f'p{i}',
+        'name': f'{rng.choice(names)} {rng.choice(VOCABULARY)}',
+        'category': rng.choice(['crops', 'seeds', 'fertilizers', 'tools', 'Vegetables', 'Grains']),
+        'description': _text(rng, 20)
+    } for i in range(size))
+    queries = itertools.cycle(SEARCH_QUERIES)
+    return lambda: index.search(next(queries), limit=20)
+
+
+SUGGEST_PREFIXES = ['t', 'tom', 'tomato ', 'or', 'organic c', 'wh', 'pot', 'dri', 'xyz', 'rice monsoon s']
+
+
+def _autocomplete(size):
+    from services.autocomplete import PrefixIndex
+    rng = random.Random(size)
+    index = PrefixIndex((
+        (' '.join(rng.choice(VOCABULARY) for _ in range(rng.randint(1, 4))).title(), rng.paretovariate(1.5))
+        for _ in range(size)
+    ), match_words=True)
+    prefixes = itertools.cycle(SUGGEST_PREFIXES)
+    return lambda: index.complete(next(prefixes), 8)
+
+
+CASES = [
+    Case('simple_rag.retrieve_relevant_docs', [10, 100, 1000, 10000], _simple_rag_retrieve),
+    Case('internal_rag.retrieve', [10, 100, 1000, 5000], _internal_rag_retrieve),
+    Case('internal_rag.generate_answer_from_context', [1, 5, 20, 50], _internal_rag_answer),
+    Case('vector_store.search[keyword]', [100, 1000, 10000], _vector_store_keyword),
+    Case('vector_store.search[cosine]', [100, 1000, 10000, 50000], _vector_store_cosine),
+    Case('crop_recommendation.predict', [10, 100, 300], _crop_predict),
+    Case('price_prediction.predict', [10, 100, 300], _price_predict),
+    Case('product_recommendation.score_user_based', ['1000x500', '10000x2000', '50000x5000'], _recommender_score),
+    Case('product_search.search', [1000, 10000, 100000], _product_search),
+    Case('autocomplete.complete', [1000, 10000, 100000], _autocomplete),
+    Case('product_recommendation.recommend_products', ['1000x500', '10000x2000', '50000x5000'], _recommender_recommend),
+]
+
+
+def run_case(fn, repeat):
+    """Per-call seconds for each of `repeat` autoranged timeit runs"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return number, [total / number for total in timer.repeat(repeat=repeat, number=number)]
+
+
+def _init_database():
+    # Recommendation cases hydrate products from an in-memory database
+    os.environ['MONGODB_URI'] = 'mongomock://'
+    os.environ.setdefault('MONGODB_DB_NAME', 'agrismart_bench')
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    from extensions import init_mongo
+    init_mongo(None)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='AgriSmart microbenchmarks')
+    parser.add_argument('--only', help='Comma-separated substrings; run cases whose name contains one')
+    parser.add_argument('--quick', action='store_true', help='Only the two smallest sizes of each case')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--list', action='store_true', help='List cases and sizes, then exit')
+    parser.add_argument('--output', help='Baseline file to write (default: benchmarks/baselines/micro-<commit>-<time>.json)')
+    parser.add_argument('--no-save', action='store_true')
+    parser.add_argument('--compare', help='Baseline JSON to diff against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Median increase counted as a regression (default 0.2 = 20%%)')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    cases = CASES
+    if args.only:
+        patterns = [p.strip() for p in args.only.split(',') if p.strip()]
+        cases = [case for case in cases if any(p in case.name for p in patterns)]
+
+    if args.list:
+        for case in cases:
+            print(f"{case.name:<45}{case.sizes}")
+        return 0
+
+    _init_database()
+
+    results = {}
+    print(f"\n{'case':<60}{'median us':>12}{'min us':>12}{'loops':>8}")
+    for case in cases:
+        sizes = case.sizes[:2] if args.quick else case.sizes
+        for size in sizes:
+            name = f"{case.name}[{size}]"
+            fn = case.setup(size)
+            number, per_call = run_case(fn, args.repeat)
+            results[name] = {
+                'size': size,
+                'loops': number,
+                'median_us': round(statistics.median(per_call) * 1e6, 3),
+                'min_us': round(min(per_call) * 1e6, 3)
+            }
+            print(f"{name:<60}{results[name]['median_us']:>12.1f}{results[name]['min_us']:>12.1f}{number:>8}")
+
+    report = new_report('micro', {'repeat': args.repeat, 'python': sys.version.split()[0]}, results)
+
+    if not args.no_save:
+        save_report(report, args.output)
+
+    if args.compare:
+        regressions = compare(report, load_report(args.compare), 'median_us', args.threshold)
+        if regressions and args.fail_on_regression:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Benchmark reports
+Saving results as JSON baselines and diffing them against earlier runs
+"""
+
+import json
+import os
+import subprocess
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = os.path.join(BACKEND_DIR, 'benchmarks', 'baselines')
+
+
+def git_commit():
+    """Short hash of the checked-out commit, or None outside a git checkout"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def new_report(suite, params, results):
+    return {
+        'suite': suite,
+        'commit': git_commit(),
+        'timestamp': datetime.utcnow().isoformat(),
+        'params': params,
+        'results': results
+    }
+
+
+def save_report(report, output=None):
+    """Write report to output, or to baselines/<suite>-<commit>-<time>.json"""
+    if output is None:
+        output = os.path.join(
+            BASELINE_DIR,
+            f"{report['suite']}-{report['commit'] or 'local'}-{datetime.utcnow():%Y%m%dT%H%M%S}.json"
+        )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n[OK] Baseline written to {output}")
+    return output
+
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(current, baseline, metric, threshold, columns=()):
+    """Print per-case deltas of metric (lower is better).
+
+    columns are extra result keys printed for context. Returns the
+    names whose metric grew by more than threshold (a fraction).
+    """
+    if baseline.get('params') != current['params']:
+        print("[WARN] Baseline was recorded with different parameters; deltas may not be comparable")
+
+    regressions = []
+    header = f"\n{'case':<60}{'base':>12}{'now':>12}{'delta':>9}"
+    for column in columns:
+        header += f"{'base ' + column:>22}{'now ' + column:>22}"
+    print(header)
+
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if not base:
+            print(f"{name:<60}{'-':>12}{result[metric]:>12.3f}{'new':>9}")
+            continue
+        delta = (result[metric] - base[metric]) / base[metric] if base[metric] else 0.0
+        line = f"{name:<60}{base[metric]:>12.3f}{result[metric]:>12.3f}{delta:>+9.1%}"
+        for column in columns:
+            line += f"{base.get(column, 0):>22.1f}{result.get(column, 0):>22.1f}"
+        if delta > threshold:
+            regressions.append(name)
+            line += '  <-- regression'
+        print(line)
+
+    if regressions:
+        print(f"\n[WARN] {metric} regressed more than {threshold:.0%} on: {', '.join(regressions)}")
+    return regressions
@@ -0,0 +1,117 @@
+"""
+Synthetic dataset for benchmarks
+Bulk-inserts users, products, orders, reviews and price history
+"""
+
+import random
+from datetime import datetime, timedelta
+from bson import ObjectId
+
+DEFAULT_SIZES = {
+    'farmers': 20,
+    'buyers': 200,
+    'products': 1000,
+    'orders': 2000,
+    'reviews': 3000,
+    'price_days': 90
+}
+
+PASSWORD = 'bench-password'
+
+_NAMES = ['Tomato', 'Onion', 'Potato', 'Wheat', 'Rice', 'Maize', 'Cotton', 'Chilli',
+          'Mango', 'Banana', 'Turmeric', 'Ginger', 'Cabbage', 'Carrot', 'Millet']
+_CATEGORIES = ['Vegetables', 'Grains', 'Fruits', 'Spices', 'crops', 'seeds']
+
+
+def seed_dataset(db, sizes=None, seed=42, batch_size=1000):
+    """Fill db with a deterministic synthetic dataset.
+
+    Returns a context dict with the generated ids, which benchmark
+    scenarios use to build requests. Users share one password hash so
+    seeding does not spend minutes in bcrypt.
+    """
+    from models import User
+    sizes = {**DEFAULT_SIZES, **(sizes or {})}
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    password_hash = User._hash_password(PASSWORD)
+
+    def insert(collection, docs):
+        for start in range(0, len(docs), batch_size):
+            db[collection].insert_many(docs[start:start + batch_size], ordered=False)
+
+    def user(role, i):
+        return {
+            '_id': ObjectId(), 'email': f'{role}{i}@bench.local', 'password_hash': password_hash,
+            'name': f'{role.title()} {i}', 'role': role, 'phone': None, 'address': None,
+            'is_active': True, 'created_at': now, 'updated_at': now
+        }
+
+    farmers = [user('farmer', i) for i in range(sizes['farmers'])]
+    buyers = [user('buyer', i) for i in range(sizes['buyers'])]
+    insert('users', farmers + buyers)
+
+    products = []
+    for i in range(sizes['products']):
+        name = rng.choice(_NAMES)
+        products.append({
+            '_id': ObjectId(), 'farmer_id': rng.choice(farmers)['_id'],
+            'name': f'{name} {i}', 'category': rng.choice(_CATEGORIES),
+            'description': f'Fresh {name.lower()} from farm {i % 50}',
+            'price': round(rng.uniform(5, 500), 2), 'quantity': rng.randint(100, 10000),
+            'soil_type': None, 'season': None, 'quality_grade': rng.choice(['A', 'B', 'C']),
+            'image_url': None, 'rating': round(rng.uniform(1, 5), 1), 'review_count': 0,
+            'is_active': True, 'created_at': now, 'updated_at': now
+        })
+    insert('products', products)
+
+    # Skewed popularity so recommendations and popularity rankings have structure
+    weights = [1.0 / (rank + 1) for rank in range(len(products))]
+
+    orders = []
+    for _ in range(sizes['orders']):
+        items = []
+        for product in rng.choices(products, weights=weights, k=rng.randint(1, 4)):
+            quantity = rng.randint(1, 5)
+            items.append({
+                'product_id': str(product['_id']), 'product_name': product['name'],
+                'quantity': quantity, 'price': product['price'],
+                'total': product['price'] * quantity
+            })
+        created = now - timedelta(days=rng.uniform(0, 90))
+        orders.append({
+            'buyer_id': rng.choice(buyers)['_id'], 'items': items,
+            'total_price': sum(item['total'] for item in items),
+            'status': rng.choice(['pending', 'confirmed', 'delivered', 'delivered', 'cancelled']),
+            'shipping_address': 'Bench Street', 'created_at': created, 'updated_at': created
+        })
+    insert('orders', orders)
+
+    reviews = []
+    for product in rng.choices(products, weights=weights, k=sizes['reviews']):
+        reviews.append({
+            'product_id': product['_id'], 'buyer_id': rng.choice(buyers)['_id'],
+            'rating': rng.randint(1, 5), 'comment': 'benchmark review',
+            'created_at': now, 'updated_at': now
+        })
+    insert('reviews', reviews)
+
+    history = []
+    for product in products:
+        price = product['price']
+        for day in range(sizes['price_days'], 0, -1):
+            price *= 1 + rng.gauss(0, 0.02)
+            history.append({
+                'product_id': product['_id'], 'price': round(price, 2),
+                'market_price': round(price, 2), 'timestamp': now - timedelta(days=day)
+            })
+    insert('price_history', history)
+
+    return {
+        'farmer_emails': [u['email'] for u in farmers],
+        'buyer_emails': [u['email'] for u in buyers],
+        'product_ids': [str(p['_id']) for p in products],
+        'categories': _CATEGORIES,
+        'password': PASSWORD,
+        'sizes': sizes
+    }
@@ -3,6 +3,7 @@ Flask Configuration Management
 """
 
 import os
+import tempfile
 from datetime import timedelta
 from dotenv import load_dotenv
 
@@ -23,10 +24,40 @@ class Config:
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
     
+    # Password hashing
+    PASSWORD_HASH_SCHEME = os.getenv('PASSWORD_HASH_SCHEME', 'bcrypt')  # bcrypt or scrypt
+    PASSWORD_BCRYPT_ROUNDS = int(os.getenv('PASSWORD_BCRYPT_ROUNDS', 12))
+    PASSWORD_SCRYPT_N = int(os.getenv('PASSWORD_SCRYPT_N', 2 ** 14))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    # Queued + running hashes before logins get 503; 0 sizes it from PASSWORD_HASH_WORKERS
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 0))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))
+    
     # MongoDB
     MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
     MONGODB_DB_NAME = os.getenv('MONGODB_DB_NAME', 'agrismart')
     
+    # MongoDB connection pool (per process)
+    MONGODB_MAX_POOL_SIZE = int(os.getenv('MONGODB_MAX_POOL_SIZE', 100))
+    MONGODB_MIN_POOL_SIZE = int(os.getenv('MONGODB_MIN_POOL_SIZE', 0))
+    MONGODB_MAX_IDLE_TIME_MS = int(os.getenv('MONGODB_MAX_IDLE_TIME_MS', 300000))
+    # Fail fast instead of queueing forever when the pool is exhausted
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGODB_WAIT_QUEUE_TIMEOUT_MS', 5000))
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGODB_SERVER_SELECTION_TIMEOUT_MS', 5000))
+    MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv('MONGODB_CONNECT_TIMEOUT_MS', 10000))
+    MONGODB_LOCAL_THRESHOLD_MS = int(os.getenv('MONGODB_LOCAL_THRESHOLD_MS', 15))
+    # Comma-separated, in preference order; ones without their library installed are skipped
+    MONGODB_COMPRESSORS = os.getenv('MONGODB_COMPRESSORS', 'zstd,snappy,zlib')
+    MONGODB_RETRY_WRITES = os.getenv('MONGODB_RETRY_WRITES', 'true').lower() in ['1', 'true', 'yes']
+    MONGODB_RETRY_READS = os.getenv('MONGODB_RETRY_READS', 'true').lower() in ['1', 'true', 'yes']
+    
+    # Read preferences: primary for request traffic, a separate handle for analytics reads
+    MONGODB_READ_PREFERENCE = os.getenv('MONGODB_READ_PREFERENCE', 'primary')
+    MONGODB_ANALYTICS_READ_PREFERENCE = os.getenv('MONGODB_ANALYTICS_READ_PREFERENCE', 'secondaryPreferred')
+    MONGODB_MAX_STALENESS_SECONDS = int(os.getenv('MONGODB_MAX_STALENESS_SECONDS', -1))  # >= 90 to enable
+    # Prefer same-zone secondaries, e.g. "zone:us-east-1a"
+    MONGODB_READ_TAGS = os.getenv('MONGODB_READ_TAGS', '')
+    
     # LLM & RAG
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
     HF_TOKEN = os.getenv('HF_TOKEN', '')
@@ -35,6 +66,20 @@ class Config:
     SERVER_PORT = int(os.getenv('SERVER_PORT', 5000))
     SERVER_HOST = os.getenv('SERVER_HOST', '0.0.0.0')
     
+    # Production serving (gunicorn.conf.py / serve.py)
+    WEB_WORKERS = int(os.getenv('WEB_WORKERS', min(os.cpu_count() or 1, 4)))
+    WEB_THREADS = int(os.getenv('WEB_THREADS', 4))
+    WEB_TIMEOUT = int(os.getenv('WEB_TIMEOUT', 120))
+    PRELOAD_APP = os.getenv('PRELOAD_APP', 'true').lower() in ['1', 'true', 'yes']
+    PRELOAD_MODELS = os.getenv('PRELOAD_MODELS', 'true').lower() in ['1', 'true', 'yes']
+    
+    # In-process scheduler. Production runs `python -m automation` instead; within
+    # gunicorn it runs in exactly one worker, which holds this lock file
+    SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'true').lower() in ['1', 'true', 'yes']
+    SCHEDULER_LOCK_FILE = os.getenv(
+        'SCHEDULER_LOCK_FILE', os.path.join(tempfile.gettempdir(), 'agrismart-scheduler.lock')
+    )
+    
     # CORS
     CORS_ORIGINS = [
         'http://localhost:3000',
@@ -50,6 +95,65 @@ class Config:
     MAIL_PASSWORD = os.getenv('MAIL_PASSWORD', '')
     MAIL_USE_TLS = True
     
+    # Product cache invalidation: change stream, or polling updated_at on standalone servers
+    CATALOG_WATCH_ENABLED = os.getenv('CATALOG_WATCH_ENABLED', 'true').lower() in ['1', 'true', 'yes']
+    CATALOG_POLL_INTERVAL = float(os.getenv('CATALOG_POLL_INTERVAL', 5))
+    
+    # Response compression (brotli when installed, else gzip)
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'true').lower() in ['1', 'true', 'yes']
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 500))  # bytes; streams always compress
+    COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 4))
+    COMPRESSION_MIMETYPES = (
+        'application/json', 'application/x-ndjson', 'text/event-stream',
+        'text/plain', 'text/html', 'text/csv'
+    )
+    # Per-blueprint overrides, or False to disable for a blueprint
+    COMPRESSION_BLUEPRINTS = {
+        'chatbot': {'min_size': 256}
+    }
+    
+    # Prometheus metrics (per process) and MongoDB command timing
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ['1', 'true', 'yes']
+    METRICS_PATH = os.getenv('METRICS_PATH', '/metrics')
+    
+    # Per-request query monitoring: slow-query log, N+1 warnings, X-DB-Queries header (always on in DEBUG)
+    QUERY_MONITOR_ENABLED = os.getenv('QUERY_MONITOR_ENABLED', 'true').lower() in ['1', 'true', 'yes']
+    SLOW_QUERY_MS = int(os.getenv('SLOW_QUERY_MS', 100))
+    N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', 10))
+    QUERY_DEBUG_HEADER = os.getenv('QUERY_DEBUG_HEADER', 'false').lower() in ['1', 'true', 'yes']
+    
+    # Sampling profiler: /api/admin/profile and ?profile=1 (admins only)
+    PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', 'true').lower() in ['1', 'true', 'yes']
+    PROFILER_INTERVAL_MS = float(os.getenv('PROFILER_INTERVAL_MS', 5))
+    PROFILER_MAX_SECONDS = int(os.getenv('PROFILER_MAX_SECONDS', 60))
+    
+    # In-process product search index (/api/products/search)
+    SEARCH_FUZZY_MAX_EDITS = int(os.getenv('SEARCH_FUZZY_MAX_EDITS', 2))  # 0 disables typo tolerance
+    SEARCH_COMPACTION_THRESHOLD = int(os.getenv('SEARCH_COMPACTION_THRESHOLD', 20000))  # postings
+    
+    # Nearby products (?near=lat,lng&radius=km on /api/products)
+    NEARBY_DEFAULT_RADIUS_KM = float(os.getenv('NEARBY_DEFAULT_RADIUS_KM', 50))
+    NEARBY_MAX_RADIUS_KM = float(os.getenv('NEARBY_MAX_RADIUS_KM', 500))
+    
+    # Bulk product import (/api/products/import), streamed past MAX_CONTENT_LENGTH
+    PRODUCT_IMPORT_MAX_BYTES = int(os.getenv('PRODUCT_IMPORT_MAX_BYTES', 256 * 1024 * 1024))
+    PRODUCT_IMPORT_CHUNK_SIZE = int(os.getenv('PRODUCT_IMPORT_CHUNK_SIZE', 1000))
+    
+    # Typeahead completions (/api/products/suggest, /api/chatbot/suggest), rebuilt in the background
+    AUTOCOMPLETE_REFRESH_SECONDS = int(os.getenv('AUTOCOMPLETE_REFRESH_SECONDS', 600))
+    AUTOCOMPLETE_MIN_REBUILD_SECONDS = int(os.getenv('AUTOCOMPLETE_MIN_REBUILD_SECONDS', 30))
+    # Past chatbot questions are only suggested once this many askings have been seen
+    AUTOCOMPLETE_MIN_QUESTION_COUNT = int(os.getenv('AUTOCOMPLETE_MIN_QUESTION_COUNT', 3))
+    
+    # Blueprints this process serves, e.g. "auth,products" for catalogue-only workers;
+    # ML and chatbot libraries are only imported when their blueprint is enabled
+    ENABLED_BLUEPRINTS = [
+        name.strip() for name in
+        os.getenv('ENABLED_BLUEPRINTS', 'auth,products,orders,reviews,ml,chatbot,admin').split(',')
+        if name.strip()
+    ]
+    
     # Pagination
     ITEMS_PER_PAGE = 20
     
@@ -69,6 +173,8 @@ class ProductionConfig(Config):
     """Production configuration"""
     DEBUG = False
     TESTING = False
+    # Jobs run in the dedicated scheduler process (python -m automation)
+    SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'false').lower() in ['1', 'true', 'yes']
 
 
 class TestingConfig(Config):
@@ -6,6 +6,7 @@ Centralized management of Flask extensions
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from pymongo import MongoClient
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
 from flask_restful import Api
 
 # JWT Extension
@@ -20,11 +21,74 @@ api = Api()
 # MongoDB Client
 mongo_client = None
 db = None
+# Same client, but reads may go to secondaries (analytics, ML, scheduler scans)
+read_db = None
+
+# Wire compressors and the module each one needs
+_COMPRESSOR_MODULES = {'zstd': 'zstandard', 'snappy': 'snappy', 'zlib': 'zlib'}
+
+
+def _available_compressors(names):
+    """Configured compressors whose libraries are installed, in preference order"""
+    import importlib.util
+    available = []
+    for name in (n.strip() for n in names.split(',')):
+        module = _COMPRESSOR_MODULES.get(name)
+        if module and importlib.util.find_spec(module) is not None:
+            available.append(name)
+    return available
+
+
+def _parse_tag_sets(tags):
+    """'zone:us-east-1a,rack:2' -> [{'zone': 'us-east-1a', 'rack': '2'}, {}]"""
+    if not tags:
+        return None
+    tag_set = dict(pair.split(':', 1) for pair in tags.split(',') if ':' in pair)
+    # Trailing {} falls back to any eligible member when no tagged one is up
+    return [tag_set, {}]
+
+
+def _client_options(config):
+    """MongoClient keyword arguments from config"""
+    options = {
+        'maxPoolSize': config.MONGODB_MAX_POOL_SIZE,
+        'minPoolSize': config.MONGODB_MIN_POOL_SIZE,
+        'maxIdleTimeMS': config.MONGODB_MAX_IDLE_TIME_MS,
+        'waitQueueTimeoutMS': config.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        'serverSelectionTimeoutMS': config.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        'connectTimeoutMS': config.MONGODB_CONNECT_TIMEOUT_MS,
+        'localThresholdMS': config.MONGODB_LOCAL_THRESHOLD_MS,
+        'retryWrites': config.MONGODB_RETRY_WRITES,
+        'retryReads': config.MONGODB_RETRY_READS,
+        'readPreference': config.MONGODB_READ_PREFERENCE
+    }
+    compressors = _available_compressors(config.MONGODB_COMPRESSORS)
+    if compressors:
+        options['compressors'] = ','.join(compressors)
+    listeners = []
+    if config.METRICS_ENABLED:
+        from utils.metrics import MongoCommandMetrics
+        listeners.append(MongoCommandMetrics())
+    if config.QUERY_MONITOR_ENABLED:
+        from utils.query_monitor import QueryMonitor
+        listeners.append(QueryMonitor.from_config(config))
+    if listeners:
+        options['event_listeners'] = listeners
+    return options
+
+
+def _analytics_read_preference(config):
+    max_staleness = config.MONGODB_MAX_STALENESS_SECONDS
+    return make_read_preference(
+        read_pref_mode_from_name(config.MONGODB_ANALYTICS_READ_PREFERENCE),
+        _parse_tag_sets(config.MONGODB_READ_TAGS),
+        max_staleness if max_staleness > 0 else -1
+    )
 
 
 def init_mongo(app):
     """Initialize MongoDB connection"""
-    global mongo_client, db
+    global mongo_client, db, read_db
     
     from config import config
     
@@ -32,17 +96,26 @@ def init_mongo(app):
     db_name = config.MONGODB_DB_NAME
     
     try:
-        mongo_client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
+        if mongo_uri.startswith('mongomock://'):
+            # In-memory server for tests and benchmarks (requirements-dev.txt)
+            import mongomock
+            mongo_client = mongomock.MongoClient()
+        else:
+            mongo_client = MongoClient(mongo_uri, **_client_options(config))
         db = mongo_client[db_name]
+        read_db = mongo_client.get_database(
+            db_name, read_preference=_analytics_read_preference(config)
+        )
         
         # Verify connection
-        mongo_client.admin.command('ismaster')
+        mongo_client.admin.command('ping')
         print("[OK] MongoDB connected successfully")
     except Exception as e:
         print(f"[WARNING] MongoDB connection failed: {str(e)}")
         print("[WARNING] App will start without database (read-only mode)")
         mongo_client = None
         db = None
+        read_db = None
 
 
 def get_db():
@@ -53,6 +126,15 @@ def get_db():
     return db
 
 
+def get_read_db():
+    """Database handle for analytics-style reads that tolerate replication lag.
+    
+    Uses MONGODB_ANALYTICS_READ_PREFERENCE (secondaryPreferred by default).
+    Never use it to read a document before writing it back.
+    """
+    return read_db if read_db is not None else db
+
+
 def close_mongo():
     """Close MongoDB connection"""
     global mongo_client
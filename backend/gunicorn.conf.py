@@ -0,0 +1,68 @@
+"""
+Gunicorn Configuration
+Run with: gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+import fcntl
+import gc
+import os
+# Aliased: gunicorn reads every module-level name here as a setting, and "config" is one
+from config import config as app_config
+
+bind = f"{app_config.SERVER_HOST}:{app_config.SERVER_PORT}"
+workers = app_config.WEB_WORKERS
+threads = app_config.WEB_THREADS
+worker_class = 'gthread'
+timeout = app_config.WEB_TIMEOUT
+graceful_timeout = 30
+keepalive = 5
+
+# Import wsgi (models, KB, warm-up) once in the master so workers share it copy-on-write
+preload_app = app_config.PRELOAD_APP
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.getenv('LOG_LEVEL', 'info')
+
+# Open for the lifetime of the worker holding the scheduler lock
+_scheduler_lock = None
+
+
+def pre_fork(server, worker):
+    # Move preloaded objects out of GC tracking so collections in workers don't touch their pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # MongoClient is not fork-safe; every worker needs its own connection pool
+    from extensions import init_mongo
+    init_mongo(None)
+
+
+def post_worker_init(worker):
+    """Start the scheduler in whichever worker holds the lock file.
+    
+    The lock is released when that worker exits, so its replacement
+    (or any worker spawned later) takes the scheduler over.
+    """
+    global _scheduler_lock
+    if not app_config.SCHEDULER_ENABLED:
+        return
+    
+    lock = open(app_config.SCHEDULER_LOCK_FILE, 'a')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return
+    
+    _scheduler_lock = lock
+    from automation import automation_manager
+    automation_manager.start()
+    worker.log.info(f"[OK] Scheduler running in worker {worker.pid}")
+
+
+def worker_exit(server, worker):
+    if _scheduler_lock is not None:
+        from automation import automation_manager
+        automation_manager.stop()
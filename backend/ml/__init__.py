@@ -10,6 +10,9 @@ from ml.models import (
     price_predictor,
     product_recommender
 )
+from ml.item_similarity import ItemSimilarityIndex, item_similarity_index
+from ml.popularity import PopularityIndex, popularity_index
+from ml.forecasting import PriceForecaster, price_forecaster
 
 __all__ = [
     'CropRecommendationModel',
@@ -17,5 +20,11 @@ __all__ = [
     'ProductRecommendationModel',
     'crop_recommender',
     'price_predictor',
-    'product_recommender'
+    'product_recommender',
+    'ItemSimilarityIndex',
+    'item_similarity_index',
+    'PopularityIndex',
+    'popularity_index',
+    'PriceForecaster',
+    'price_forecaster'
 ]
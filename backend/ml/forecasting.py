@@ -0,0 +1,298 @@
+"""
+Price Forecasting
+Multi-horizon product price forecasts built from PriceHistory daily rollups
+"""
+
+import os
+import threading
+import time
+import numpy as np
+from datetime import datetime, timedelta
+from bson import ObjectId
+from models import Product, PriceHistory
+from utils.cache import TTLCache
+
+
+class PriceForecaster:
+    """Random Forest forecaster predicting price ratios for 1..MAX_HORIZON days.
+    
+    One model covers every horizon: the horizon is a feature, so a whole
+    forecast vector is a single batch of rows. Intervals come from the
+    spread of the individual trees' predictions.
+    
+    Training is left to the nightly scheduler job; until it has written
+    the model, forecasts use the naive random-walk method. Workers pick
+    up a retrained model by its file modification time.
+    """
+    
+    MODEL_PATH = 'models/price_forecast_model.pkl'
+    MAX_HORIZON = 30
+    LOOKBACK_DAYS = 60
+    TRAINING_DAYS = 365
+    MIN_HISTORY_DAYS = 14
+    MIN_TRAINING_ROWS = 200
+    MAX_TRAINING_ROWS = 100000
+    ORIGINS_PER_PRODUCT = 20
+    QUANTILES = (10, 50, 90)
+    RELOAD_CHECK_SECONDS = 60
+    
+    def __init__(self):
+        self.model = None
+        self.model_version = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        # product_id -> (latest price timestamp, model version, forecast)
+        self.cache = TTLCache(maxsize=10000)
+    
+    def load(self):
+        """Load the trained model, or a newer one written by the scheduler; never trains"""
+        now = time.monotonic()
+        if self.model is not None and now - self._last_check < self.RELOAD_CHECK_SECONDS:
+            return True
+        self._last_check = now
+        try:
+            mtime = os.path.getmtime(self.MODEL_PATH)
+        except OSError:
+            return self.model is not None
+        
+        with self._lock:
+            if mtime != self.model_version:
+                import joblib
+                self.model = joblib.load(self.MODEL_PATH)
+                self.model_version = mtime
+                print("[OK] Price forecast model loaded from disk")
+        return True
+    
+    def train(self):
+        """Retrain from all recent price history and persist the model.
+        
+        Returns the number of training rows, or 0 when there is too little
+        history and the current model is kept.
+        """
+        with self._lock:
+            return self._train()
+    
+    def _train(self):
+        import joblib
+        from sklearn.ensemble import RandomForestRegressor
+        
+        rollups = self.daily_rollups(None, self.TRAINING_DAYS)
+        rng = np.random.default_rng(42)
+        X_parts, y_parts = [], []
+        
+        for series, last_date in rollups.values():
+            n = len(series)
+            origins = np.arange(self.MIN_HISTORY_DAYS - 1, n - 1)
+            if origins.size == 0:
+                continue
+            if origins.size > self.ORIGINS_PER_PRODUCT:
+                origins = rng.choice(origins, self.ORIGINS_PER_PRODUCT, replace=False)
+            first_date = last_date - timedelta(days=n - 1)
+            for t in origins:
+                horizons = np.arange(1, min(self.MAX_HORIZON, n - 1 - t) + 1)
+                X_parts.append(self._features(series[:t + 1], first_date + timedelta(days=int(t)), horizons))
+                y_parts.append(series[t + horizons] / series[t])
+        
+        n_rows = sum(len(part) for part in y_parts)
+        if n_rows < self.MIN_TRAINING_ROWS:
+            print(f"[WARN] Not enough price history to train forecaster ({n_rows} rows)")
+            return 0
+        
+        X = np.vstack(X_parts)
+        y = np.concatenate(y_parts)
+        if len(y) > self.MAX_TRAINING_ROWS:
+            keep = rng.choice(len(y), self.MAX_TRAINING_ROWS, replace=False)
+            X, y = X[keep], y[keep]
+        
+        model = RandomForestRegressor(n_estimators=100, min_samples_leaf=5, n_jobs=-1, random_state=42)
+        model.fit(X, y)
+        
+        os.makedirs(os.path.dirname(self.MODEL_PATH), exist_ok=True)
+        # Written aside and renamed so workers never load a half-written file
+        tmp_path = f'{self.MODEL_PATH}.{os.getpid()}.tmp'
+        joblib.dump(model, tmp_path)
+        os.replace(tmp_path, self.MODEL_PATH)
+        self.model = model
+        self.model_version = os.path.getmtime(self.MODEL_PATH)
+        self.cache.clear()
+        print(f"[OK] Price forecast model trained on {len(y)} rows and saved")
+        return len(y)
+    
+    @staticmethod
+    def daily_rollups(product_ids, days):
+        """Daily mean price per product as forward-filled arrays.
+        
+        Returns {product_id: (prices, last_date)} where prices[-1] is the
+        mean price on last_date. Pass product_ids=None for all products.
+        """
+        start = datetime.utcnow() - timedelta(days=days)
+        match = {'timestamp': {'$gte': start}}
+        if product_ids is not None:
+            match['product_id'] = {'$in': [ObjectId(pid) for pid in product_ids]}
+        
+        pipeline = [
+            {'$match': match},
+            {'$group': {
+                '_id': {
+                    'product_id': '$product_id',
+                    'day': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$timestamp'}}
+                },
+                'price': {'$avg': '$price'}
+            }}
+        ]
+        
+        days_by_product = {}
+        for row in PriceHistory.get_analytics_collection().aggregate(pipeline):
+            key = row['_id']
+            if row.get('price') is None:
+                continue
+            day = datetime.strptime(key['day'], '%Y-%m-%d')
+            days_by_product.setdefault(str(key['product_id']), {})[day] = float(row['price'])
+        
+        rollups = {}
+        for product_id, prices_by_day in days_by_product.items():
+            first, last = min(prices_by_day), max(prices_by_day)
+            n = (last - first).days + 1
+            series = np.full(n, np.nan)
+            for day, price in prices_by_day.items():
+                series[(day - first).days] = price
+            # Forward-fill days without observations
+            filled = np.where(~np.isnan(series), np.arange(n), 0)
+            np.maximum.accumulate(filled, out=filled)
+            rollups[product_id] = (series[filled], last)
+        return rollups
+    
+    @staticmethod
+    def _features(history, origin_date, horizons):
+        """Feature rows for forecasting each horizon from the end of history"""
+        last = history[-1]
+        recent = history[-30:]
+        log_returns = np.diff(np.log(np.maximum(recent, 1e-6)))
+        base = [
+            history[-7:].mean() / last,
+            recent.mean() / last,
+            (last - history[max(len(history) - 8, 0)]) / (7 * last),
+            log_returns.std() if log_returns.size else 0.0
+        ]
+        target_doy = np.array([
+            (origin_date + timedelta(days=int(h))).timetuple().tm_yday for h in horizons
+        ])
+        angle = 2 * np.pi * target_doy / 365.25
+        rows = np.empty((len(horizons), 7))
+        rows[:, 0] = horizons
+        rows[:, 1:5] = base
+        rows[:, 5] = np.sin(angle)
+        rows[:, 6] = np.cos(angle)
+        return rows
+    
+    def _latest_price_times(self, product_ids):
+        """Timestamp of the newest PriceHistory entry per product"""
+        pipeline = [
+            {'$match': {'product_id': {'$in': [ObjectId(pid) for pid in product_ids]}}},
+            {'$group': {'_id': '$product_id', 'latest': {'$max': '$timestamp'}}}
+        ]
+        return {
+            str(row['_id']): row['latest']
+            for row in PriceHistory.get_analytics_collection().aggregate(pipeline)
+        }
+    
+    def forecast_many(self, product_ids, horizon=MAX_HORIZON):
+        """Forecast 1..horizon days ahead for several products at once.
+        
+        Cached forecasts are reused until a newer PriceHistory entry exists
+        for the product. All uncached products are predicted with a single
+        batch of feature rows.
+        """
+        self.load()
+        horizon = max(1, min(int(horizon), self.MAX_HORIZON))
+        product_ids = [pid for pid in dict.fromkeys(product_ids) if ObjectId.is_valid(pid)]
+        latest = self._latest_price_times(product_ids)
+        
+        forecasts, stale = {}, []
+        for pid in product_ids:
+            cached = self.cache.get(pid)
+            if cached and cached[0] == latest.get(pid) and cached[1] == self.model_version:
+                forecasts[pid] = cached[2]
+            else:
+                stale.append(pid)
+        
+        if stale:
+            computed = self._compute(stale)
+            for pid, forecast in computed.items():
+                self.cache.set(pid, (latest.get(pid), self.model_version, forecast))
+            forecasts.update(computed)
+        
+        return {
+            pid: self._truncate(forecasts[pid], horizon)
+            for pid in product_ids
+            if pid in forecasts
+        }
+    
+    def _compute(self, product_ids):
+        """Full MAX_HORIZON forecasts for products without a valid cache entry"""
+        rollups = self.daily_rollups(product_ids, self.LOOKBACK_DAYS)
+        
+        # Products without history are forecast flat from their listed price
+        missing = [pid for pid in product_ids if pid not in rollups]
+        if missing:
+            query = {'_id': {'$in': [ObjectId(pid) for pid in missing]}}
+            for product in Product.find_many(query, analytics=True):
+                if product.get('price'):
+                    rollups[str(product['_id'])] = (np.array([float(product['price'])]), datetime.utcnow())
+        
+        horizons = np.arange(1, self.MAX_HORIZON + 1)
+        ordered = [pid for pid in product_ids if pid in rollups]
+        if not ordered:
+            return {}
+        
+        X = np.vstack([
+            self._features(rollups[pid][0], rollups[pid][1], horizons)
+            for pid in ordered
+        ])
+        last_prices = np.repeat([rollups[pid][0][-1] for pid in ordered], len(horizons))
+        
+        if self.model is not None:
+            tree_predictions = np.stack([tree.predict(X) for tree in self.model.estimators_])
+            lower, median, upper = np.percentile(tree_predictions, self.QUANTILES, axis=0)
+            method = 'random_forest'
+        else:
+            # Naive random walk: flat median, interval widening with sqrt(h)
+            volatility = X[:, 4]
+            spread = 1.2816 * volatility * np.sqrt(X[:, 0])
+            median = np.ones(len(X))
+            lower, upper = np.exp(-spread), np.exp(spread)
+            method = 'naive'
+        
+        lower, median, upper = (np.maximum(q * last_prices, 0) for q in (lower, median, upper))
+        width = (upper - lower) / np.maximum(2 * median, 1e-6)
+        confidence = np.clip(100 * (1 - width), 0, 100)
+        
+        forecasts = {}
+        n = len(horizons)
+        for i, pid in enumerate(ordered):
+            rows = slice(i * n, (i + 1) * n)
+            last_date = rollups[pid][1]
+            forecasts[pid] = {
+                'product_id': pid,
+                'method': method,
+                'last_price': round(float(rollups[pid][0][-1]), 2),
+                'last_observed': last_date.date().isoformat(),
+                'dates': [(last_date + timedelta(days=int(h))).date().isoformat() for h in horizons],
+                'predicted': np.round(median[rows], 2).tolist(),
+                'lower': np.round(lower[rows], 2).tolist(),
+                'upper': np.round(upper[rows], 2).tolist(),
+                'confidence': np.round(confidence[rows], 1).tolist()
+            }
+        return forecasts
+    
+    @staticmethod
+    def _truncate(forecast, horizon):
+        """Copy of a cached forecast limited to the requested horizon"""
+        result = dict(forecast)
+        for key in ('dates', 'predicted', 'lower', 'upper', 'confidence'):
+            result[key] = forecast[key][:horizon]
+        return result
+
+
+# Shared forecaster; the model is loaded on first use
+price_forecaster = PriceForecaster()
@@ -0,0 +1,92 @@
+"""
+User-item interaction loading
+Builds the sparse buyer x product matrix shared by the recommenders
+"""
+
+import numpy as np
+from scipy import sparse
+
+
+# Implicit rating given to products a buyer ordered but never reviewed
+PURCHASE_WEIGHT = 3.0
+
+
+class _IdMap:
+    """Assigns consecutive integer ids to string keys"""
+    
+    def __init__(self):
+        self.index = {}
+        self.keys = []
+    
+    def get(self, key):
+        idx = self.index.get(key)
+        if idx is None:
+            idx = self.index[key] = len(self.keys)
+            self.keys.append(key)
+        return idx
+
+
+def load_interaction_matrix(include_orders=True):
+    """Load reviews (and optionally orders) into a CSR buyer x product matrix.
+    
+    Explicit review ratings are averaged per (buyer, product) pair. Ordered
+    products without a review get PURCHASE_WEIGHT. Cancelled orders are
+    ignored.
+    
+    Returns (matrix, user_index, item_ids, item_index) or None when there
+    are no interactions.
+    """
+    from extensions import get_read_db
+    db = get_read_db()
+    users, items = _IdMap(), _IdMap()
+    
+    rating_rows, rating_cols, ratings = [], [], []
+    for r in db['reviews'].find({}, {'buyer_id': 1, 'product_id': 1, 'rating': 1, '_id': 0}):
+        rating_rows.append(users.get(str(r['buyer_id'])))
+        rating_cols.append(items.get(str(r['product_id'])))
+        ratings.append(float(r.get('rating') or 0))
+    
+    purchase_rows, purchase_cols = [], []
+    if include_orders:
+        cursor = db['orders'].find(
+            {'status': {'$ne': 'cancelled'}},
+            {'buyer_id': 1, 'items.product_id': 1, '_id': 0}
+        )
+        for order in cursor:
+            row = users.get(str(order['buyer_id']))
+            for item in order.get('items', []):
+                if item.get('product_id'):
+                    purchase_rows.append(row)
+                    purchase_cols.append(items.get(str(item['product_id'])))
+    
+    if not ratings and not purchase_rows:
+        return None
+    
+    shape = (len(users.keys), len(items.keys))
+    matrix = _average_ratings(rating_rows, rating_cols, ratings, shape)
+    
+    if purchase_rows:
+        purchases = sparse.csr_matrix(
+            (np.full(len(purchase_rows), PURCHASE_WEIGHT, dtype=np.float32),
+             (purchase_rows, purchase_cols)),
+            shape=shape
+        )
+        purchases.sum_duplicates()
+        purchases.data[:] = PURCHASE_WEIGHT
+        # Explicit ratings take precedence over the implicit purchase signal
+        rated = (matrix != 0).astype(np.float32)
+        matrix = (matrix + purchases - purchases.multiply(rated)).tocsr()
+    
+    matrix.eliminate_zeros()
+    return matrix, users.index, items.keys, items.index
+
+
+def _average_ratings(rows, cols, values, shape):
+    """CSR matrix of ratings with duplicate (row, col) pairs averaged"""
+    totals = sparse.csr_matrix((np.asarray(values, dtype=np.float32), (rows, cols)), shape=shape)
+    counts = sparse.csr_matrix((np.ones(len(values), dtype=np.float32), (rows, cols)), shape=shape)
+    totals.sum_duplicates()
+    counts.sum_duplicates()
+    if totals.nnz:
+        totals.data = totals.data / counts.data
+    return totals
@@ -0,0 +1,197 @@
+"""
+Item-item similarity index
+Precomputes top-K product neighbours offline so recommendation requests
+only merge a handful of neighbour lists
+"""
+
+import os
+import shutil
+import time
+from datetime import datetime
+import numpy as np
+from scipy import sparse
+from ml.interactions import load_interaction_matrix
+
+
+class ItemSimilarityIndex:
+    """Top-K cosine neighbours per product, persisted as memory-mapped arrays.
+    
+    Each build is written to its own directory under INDEX_DIR and
+    published by replacing the CURRENT pointer file, so readers always
+    load the three arrays of one build together.
+    """
+    
+    INDEX_DIR = 'models/item_neighbors'
+    POINTER_FILE = 'CURRENT'
+    KEEP_BUILDS = 2
+    TOP_K = 50
+    CHUNK_SIZE = 256
+    RELOAD_CHECK_SECONDS = 60
+    
+    def __init__(self, index_dir=None):
+        self.index_dir = index_dir or self.INDEX_DIR
+        self.item_ids = None
+        self.item_index = {}
+        self.neighbors = None
+        self.scores = None
+        self._loaded_build = None
+        self._last_check = 0.0
+    
+    @property
+    def _pointer_path(self):
+        return os.path.join(self.index_dir, self.POINTER_FILE)
+    
+    def _paths(self, build):
+        return {
+            name: os.path.join(self.index_dir, build, f'{name}.npy')
+            for name in ('item_ids', 'neighbors', 'scores')
+        }
+    
+    def current_build(self):
+        """Name of the published build directory, or None"""
+        try:
+            with open(self._pointer_path) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+    
+    def build(self):
+        """Compute neighbours from the review/order matrix and persist them"""
+        loaded = load_interaction_matrix()
+        if loaded is None:
+            print("[WARN] No interactions found; item similarity index not built")
+            return 0
+        
+        matrix, _, item_ids, _ = loaded
+        neighbors, scores = self.compute_neighbors(matrix, self.TOP_K, self.CHUNK_SIZE)
+        self._save(np.array(item_ids, dtype='<U24'), neighbors, scores)
+        self.load()
+        print(f"[OK] Item similarity index built for {len(item_ids)} products")
+        return len(item_ids)
+    
+    @staticmethod
+    def compute_neighbors(matrix, top_k, chunk_size):
+        """Top-K cosine neighbours for every column of a user x item matrix.
+        
+        Similarities are computed a chunk of items at a time so peak memory
+        is chunk_size x n_items instead of n_items squared. Missing
+        neighbours are padded with -1.
+        """
+        n_items = matrix.shape[1]
+        k = max(min(top_k, n_items - 1), 1)
+        
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+        norms[norms == 0] = 1.0
+        normalized = matrix.dot(sparse.diags(1.0 / norms)).tocsc()
+        item_vectors = normalized.T.tocsr()
+        
+        neighbors = np.full((n_items, k), -1, dtype=np.int32)
+        scores = np.zeros((n_items, k), dtype=np.float32)
+        
+        for start in range(0, n_items, chunk_size):
+            end = min(start + chunk_size, n_items)
+            block = item_vectors[start:end].dot(normalized).toarray().astype(np.float32)
+            block[np.arange(end - start), np.arange(start, end)] = 0
+            
+            if n_items > k:
+                top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+            else:
+                top = np.tile(np.arange(n_items), (end - start, 1))[:, :k]
+            top_scores = np.take_along_axis(block, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            
+            top[top_scores <= 0] = -1
+            neighbors[start:end] = top
+            scores[start:end] = np.maximum(top_scores, 0)
+        
+        return neighbors, scores
+    
+    def _save(self, item_ids, neighbors, scores):
+        """Write a new build directory, then publish it by replacing the pointer file"""
+        build = f"build-{datetime.utcnow():%Y%m%d%H%M%S%f}-{os.getpid()}"
+        os.makedirs(os.path.join(self.index_dir, build))
+        arrays = {'item_ids': item_ids, 'neighbors': neighbors, 'scores': scores}
+        for name, path in self._paths(build).items():
+            np.save(path, arrays[name])
+        
+        tmp_pointer = f'{self._pointer_path}.{os.getpid()}.tmp'
+        with open(tmp_pointer, 'w') as f:
+            f.write(build)
+        os.replace(tmp_pointer, self._pointer_path)
+        self._remove_old_builds(build)
+    
+    def _remove_old_builds(self, current):
+        """Delete all but the newest KEEP_BUILDS builds; the previous one may still be loading elsewhere"""
+        builds = sorted(
+            name for name in os.listdir(self.index_dir)
+            if name.startswith('build-') and name != current
+        )
+        for name in builds[:max(len(builds) - (self.KEEP_BUILDS - 1), 0)]:
+            # Mapped files cannot be deleted on Windows; they go on a later build
+            shutil.rmtree(os.path.join(self.index_dir, name), ignore_errors=True)
+    
+    def load(self):
+        """Memory-map the published build if there is one"""
+        build = self.current_build()
+        if build is None:
+            return False
+        paths = self._paths(build)
+        try:
+            item_ids = np.load(paths['item_ids'], mmap_mode='r')
+            neighbors = np.load(paths['neighbors'], mmap_mode='r')
+            scores = np.load(paths['scores'], mmap_mode='r')
+            if not (len(item_ids) == len(neighbors) == len(scores)):
+                return False
+            
+            self.item_index = {str(pid): i for i, pid in enumerate(item_ids)}
+            self.item_ids = item_ids
+            self.neighbors = neighbors
+            self.scores = scores
+            self._loaded_build = build
+            return True
+        except Exception as e:
+            print(f"[WARN] Failed to load item similarity index: {str(e)}")
+            return False
+    
+    def is_ready(self):
+        """Load the index, or pick up a newer build, and report availability"""
+        now = time.monotonic()
+        if self.neighbors is None or now - self._last_check >= self.RELOAD_CHECK_SECONDS:
+            self._last_check = now
+            build = self.current_build()
+            if build is not None and build != self._loaded_build:
+                self.load()
+        return self.neighbors is not None
+    
+    def recommend(self, history_ids, n_recommendations=5):
+        """Rank products by summed similarity to the given purchase history.
+        
+        Cost is O(len(history_ids) x TOP_K) regardless of catalogue size.
+        Earlier entries in history_ids (the most recent) weigh slightly more.
+        """
+        if not self.is_ready():
+            return []
+        
+        history_rows = [self.item_index[pid] for pid in history_ids if pid in self.item_index]
+        if not history_rows:
+            return []
+        
+        seen = set(history_rows)
+        totals = {}
+        for rank, row in enumerate(history_rows):
+            recency = 1.0 / (1.0 + 0.1 * rank)
+            for neighbor, score in zip(self.neighbors[row], self.scores[row]):
+                if neighbor < 0:
+                    break
+                neighbor = int(neighbor)
+                if neighbor not in seen:
+                    totals[neighbor] = totals.get(neighbor, 0.0) + float(score) * recency
+        
+        ranked = sorted(totals, key=totals.get, reverse=True)[:n_recommendations]
+        return [str(self.item_ids[i]) for i in ranked]
+
+
+# Shared index instance; arrays are memory-mapped lazily on first use
+item_similarity_index = ItemSimilarityIndex()
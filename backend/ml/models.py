@@ -4,15 +4,15 @@ Includes crop recommendation, price prediction, and product recommendation
 """
 
 import numpy as np
-import pandas as pd
-from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
-from sklearn.preprocessing import LabelEncoder
-from sklearn.metrics.pairwise import cosine_similarity
-import joblib
+from scipy import sparse
 import os
+import threading
 from datetime import datetime, timedelta
-from models import Product, Review, PriceHistory
+from models import Product, Order, Review, PriceHistory
 from bson import ObjectId
+from ml.interactions import load_interaction_matrix, PURCHASE_WEIGHT
+from ml.item_similarity import item_similarity_index
+from ml.popularity import popularity_index
 
 
 class CropRecommendationModel:
@@ -31,19 +31,29 @@ class CropRecommendationModel:
     def __init__(self):
         self.model = None
         self.label_encoder = None
-        self.load_or_train()
+        self._loaded = False
+        self._lock = threading.Lock()
     
     def load_or_train(self):
-        """Load model from disk or train if not exists"""
-        if os.path.exists(self.MODEL_PATH) and os.path.exists(self.LABEL_ENCODER_PATH):
-            self.model = joblib.load(self.MODEL_PATH)
-            self.label_encoder = joblib.load(self.LABEL_ENCODER_PATH)
-            print("[OK] Crop recommendation model loaded from disk")
-        else:
-            self.train()
+        """Load model from disk or train if not exists; sklearn is imported on first call"""
+        with self._lock:
+            if self._loaded:
+                return
+            if os.path.exists(self.MODEL_PATH) and os.path.exists(self.LABEL_ENCODER_PATH):
+                import joblib
+                self.model = joblib.load(self.MODEL_PATH)
+                self.label_encoder = joblib.load(self.LABEL_ENCODER_PATH)
+                print("[OK] Crop recommendation model loaded from disk")
+            else:
+                self.train()
+            self._loaded = True
     
     def train(self):
         """Train crop recommendation model"""
+        import joblib
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.preprocessing import LabelEncoder
+        
         # Create synthetic training data
         np.random.seed(42)
         n_samples = 500
@@ -87,6 +97,7 @@ class CropRecommendationModel:
     
     def predict(self, soil_type, season, rainfall, temperature, humidity):
         """Predict suitable crops"""
+        self.load_or_train()
         try:
             soil_idx = self.SOIL_TYPES.index(soil_type)
             season_idx = self.SEASONS.index(season)
@@ -121,18 +132,27 @@ class PricePredictionModel:
     
     def __init__(self):
         self.model = None
-        self.load_or_train()
+        self._loaded = False
+        self._lock = threading.Lock()
     
     def load_or_train(self):
-        """Load model from disk or train if not exists"""
-        if os.path.exists(self.MODEL_PATH):
-            self.model = joblib.load(self.MODEL_PATH)
-            print("[OK] Price prediction model loaded from disk")
-        else:
-            self.train()
+        """Load model from disk or train if not exists; sklearn is imported on first call"""
+        with self._lock:
+            if self._loaded:
+                return
+            if os.path.exists(self.MODEL_PATH):
+                import joblib
+                self.model = joblib.load(self.MODEL_PATH)
+                print("[OK] Price prediction model loaded from disk")
+            else:
+                self.train()
+            self._loaded = True
     
     def train(self):
         """Train price prediction model with synthetic data"""
+        import joblib
+        from sklearn.ensemble import RandomForestRegressor
+        
         np.random.seed(42)
         
         # Create synthetic training data
@@ -162,123 +182,332 @@ class PricePredictionModel:
     
     def predict(self, days_from_now=7, season=0, category=0, quantity=100):
         """Predict future price"""
+        self.load_or_train()
         try:
             X = np.array([[days_from_now, season, category, quantity]])
-            predicted_price = float(self.model.predict(X)[0])
+            tree_predictions = np.array([tree.predict(X)[0] for tree in self.model.estimators_])
+            predicted_price = float(tree_predictions.mean())
+            lower, upper = np.percentile(tree_predictions, [10, 90])
+            # Narrower agreement between trees means higher confidence
+            spread = (upper - lower) / max(2 * predicted_price, 1e-6)
             return {
                 'predicted_price': max(predicted_price, 10),
                 'days_from_now': days_from_now,
-                'confidence': 85  # Static confidence for demo
+                'confidence': round(float(np.clip(100 * (1 - spread), 0, 100)), 1)
             }
         except Exception as e:
             raise ValueError(f"Price prediction failed: {str(e)}")
 
 
 class ProductRecommendationModel:
-    """Collaborative filtering based product recommendation"""
+    """Collaborative filtering based product recommendation
+    
+    Ratings are held in a scipy.sparse CSR user-item matrix with integer
+    id maps, so memory grows with the number of reviews rather than
+    buyers x products. Review and order writes are applied as sparse
+    deltas on top of that matrix (see refresh_ratings / record_purchase)
+    and folded back in by periodic compaction.
+    
+    Deltas only cover writes served by this process, so the matrix is
+    also rebuilt from the database every REBUILD_INTERVAL to pick up
+    writes made by other workers.
+    """
+    
+    N_SIMILAR_USERS = 20
+    COMPACTION_THRESHOLD = 5000
+    COMPACTION_INTERVAL = timedelta(minutes=10)
+    REBUILD_INTERVAL = timedelta(minutes=15)
     
     def __init__(self):
         self.user_item_matrix = None
-        self.products = None
+        self.row_sq_norms = None
+        self.user_index = {}
+        self.item_ids = []
+        self.item_index = {}
+        self._delta = {}
+        self._delta_matrix = None
+        self._last_compaction = datetime.utcnow()
+        self.built_at = None
+        # Updates applied while a build reads the database; None when no build runs
+        self._replay = None
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
     
     def build_user_item_matrix(self):
-        """Build user-item interaction matrix from reviews"""
-        try:
-            # Get all reviews
-            from extensions import get_db
-            reviews_collection = get_db()['reviews']
-            reviews = list(reviews_collection.find())
-            
-            if not reviews:
-                return None
-            
-            # Create dataframe
-            df = pd.DataFrame([
-                {
-                    'buyer_id': str(r['buyer_id']),
-                    'product_id': str(r['product_id']),
-                    'rating': r['rating']
-                }
-                for r in reviews
-            ])
-            
-            # Create pivot table
-            self.user_item_matrix = df.pivot_table(
-                index='buyer_id',
-                columns='product_id',
-                values='rating',
-                fill_value=0
-            )
+        """Build sparse user-item interaction matrix from reviews and orders"""
+        with self._build_lock:
+            with self._lock:
+                self._replay = []
+            try:
+                loaded = load_interaction_matrix()
+                if loaded is None:
+                    return None
+                
+                matrix, user_index, item_ids, item_index = loaded
+                with self._lock:
+                    self.user_item_matrix = matrix
+                    self.row_sq_norms = self._row_sq_norms(matrix)
+                    self.user_index = user_index
+                    self.item_index = item_index
+                    self.item_ids = item_ids
+                    self._delta = {}
+                    self._delta_matrix = None
+                    self._last_compaction = datetime.utcnow()
+                    # The load may have missed writes made meanwhile; setting cells again is harmless
+                    replay, self._replay = self._replay, None
+                    for buyer_id, updates in replay:
+                        self._apply_updates(buyer_id, updates)
+                
+                return True
             
-            return True
+            except Exception as e:
+                print(f"Failed to build user-item matrix: {str(e)}")
+                return False
+            finally:
+                with self._lock:
+                    self._replay = None
+                    self.built_at = datetime.utcnow()
+    
+    def build_async(self):
+        """Rebuild in a background thread unless a build is already running"""
+        if self._build_lock.locked():
+            return
+        threading.Thread(target=self.build_user_item_matrix, name='user-item-matrix-build', daemon=True).start()
+    
+    def needs_rebuild(self):
+        return self.built_at is None or datetime.utcnow() - self.built_at >= self.REBUILD_INTERVAL
+    
+    @staticmethod
+    def _row_sq_norms(matrix):
+        """Squared L2 norm of every row"""
+        return np.asarray(matrix.multiply(matrix).sum(axis=1), dtype=np.float64).ravel()
+    
+    def record_rating(self, buyer_id, product_id, rating):
+        """Apply a created or edited review to the cached matrix"""
+        self._apply_updates(buyer_id, [(product_id, float(rating), True)])
+    
+    def refresh_ratings(self, buyer_id, product_ids):
+        """Re-derive a buyer's cells from their reviews and orders, as a full rebuild would.
         
+        Used for review writes and order cancellations: a buyer may have
+        several reviews of one product, and a cancelled order stops counting.
+        """
+        if self.user_item_matrix is None and self._replay is None:
+            return
+        try:
+            updates = [(pid, self._rating_from_history(buyer_id, pid), True) for pid in product_ids]
         except Exception as e:
-            print(f"Failed to build user-item matrix: {str(e)}")
-            return False
+            print(f"Failed to apply recommendation update: {str(e)}")
+            return
+        self._apply_updates(buyer_id, updates)
     
-    def recommend_products(self, buyer_id, n_recommendations=5):
-        """Recommend products for a buyer"""
+    def remove_rating(self, buyer_id, product_id):
+        """Apply a deleted review; remaining reviews or a purchase still count"""
+        self.refresh_ratings(buyer_id, [product_id])
+    
+    @staticmethod
+    def _rating_from_history(buyer_id, product_id):
+        """Cell value the way load_interaction_matrix computes it, for one buyer and product"""
+        reviews = Review.find_many(
+            {'buyer_id': ObjectId(str(buyer_id)), 'product_id': ObjectId(str(product_id))},
+            projection={'rating': 1}
+        )
+        if reviews:
+            return sum(float(r.get('rating') or 0) for r in reviews) / len(reviews)
+        return PURCHASE_WEIGHT if Order.has_purchased(buyer_id, product_id) else 0.0
+    
+    def record_purchase(self, buyer_id, product_ids):
+        """Apply a new order; existing explicit ratings are left untouched"""
+        self._apply_updates(buyer_id, [(pid, PURCHASE_WEIGHT, False) for pid in product_ids])
+    
+    def _apply_updates(self, buyer_id, updates):
+        """Set matrix cells for one buyer as deltas and adjust the cached norms.
+        
+        updates is a list of (product_id, value, overwrite) tuples; when
+        overwrite is False the cell is only set if it is currently empty.
+        Nothing happens until the matrix has been built once, since the
+        first build reads the current state from the database anyway.
+        """
         try:
-            if self.user_item_matrix is None or self.user_item_matrix.empty:
-                self.build_user_item_matrix()
-            
-            if self.user_item_matrix is None or buyer_id not in self.user_item_matrix.index:
-                # Return popular products if no data
-                return self._get_popular_products(n_recommendations)
-            
-            # Calculate similarity
-            user_vector = self.user_item_matrix.loc[buyer_id].values.reshape(1, -1)
-            similarities = cosine_similarity(user_vector, self.user_item_matrix)[0]
-            
-            # Get similar users
-            similar_user_indices = np.argsort(similarities)[-5:-1]  # Top 4 similar users
-            
-            # Get products rated by similar users but not by this user
-            recommendations = set()
-            for idx in similar_user_indices:
-                similar_user = self.user_item_matrix.index[idx]
-                rated_products = self.user_item_matrix.loc[similar_user]
-                rated_products = rated_products[rated_products > 0].index.tolist()
-                user_rated = self.user_item_matrix.loc[buyer_id]
-                user_rated = user_rated[user_rated > 0].index.tolist()
+            with self._lock:
+                if self._replay is not None:
+                    self._replay.append((buyer_id, updates))
+                if self.user_item_matrix is None:
+                    return
                 
-                recommendations.update(set(rated_products) - set(user_rated))
-            
-            # Get product details
-            product_list = []
-            for product_id in list(recommendations)[:n_recommendations]:
-                product = Product.find_by_id(product_id)
-                if product:
-                    product_list.append({
-                        'product_id': str(product['_id']),
-                        'name': product.get('name'),
-                        'category': product.get('category'),
-                        'price': product.get('price'),
-                        'rating': product.get('rating')
-                    })
+                row = self.user_index.get(str(buyer_id))
+                if row is None:
+                    row = self.user_index[str(buyer_id)] = len(self.user_index)
+                    self.row_sq_norms = np.append(self.row_sq_norms, 0.0)
+                    self._sync_shape()
+                
+                for product_id, value, overwrite in updates:
+                    product_id = str(product_id)
+                    col = self.item_index.get(product_id)
+                    if col is None:
+                        col = self.item_index[product_id] = len(self.item_ids)
+                        self.item_ids.append(product_id)
+                        self._sync_shape()
+                    
+                    base = float(self.user_item_matrix[row, col])
+                    old = base + self._delta.get((row, col), 0.0)
+                    if old == value or (old and not overwrite):
+                        continue
+                    
+                    self._delta[(row, col)] = value - base
+                    self.row_sq_norms[row] += value * value - old * old
+                    self._delta_matrix = None
+                
+                if (len(self._delta) >= self.COMPACTION_THRESHOLD or
+                        datetime.utcnow() - self._last_compaction >= self.COMPACTION_INTERVAL):
+                    self.compact()
+        
+        except Exception as e:
+            print(f"Failed to apply recommendation update: {str(e)}")
+    
+    def _sync_shape(self):
+        """Grow the base matrix after new buyers or products were mapped"""
+        shape = (len(self.user_index), len(self.item_ids))
+        if self.user_item_matrix.shape != shape:
+            self.user_item_matrix.resize(shape)
+            self._delta_matrix = None
+    
+    def compact(self):
+        """Fold pending deltas into the base matrix and refresh exact norms"""
+        with self._lock:
+            if self.user_item_matrix is None:
+                return
+            if self._delta:
+                matrix = (self.user_item_matrix + self._get_delta_matrix()).tocsr()
+                matrix.eliminate_zeros()
+                self.user_item_matrix = matrix
+                self.row_sq_norms = self._row_sq_norms(matrix)
+                self._delta = {}
+                self._delta_matrix = None
+            self._last_compaction = datetime.utcnow()
+    
+    def _get_delta_matrix(self):
+        """Pending deltas as a CSR matrix, rebuilt only after new writes"""
+        if self._delta_matrix is None:
+            shape = self.user_item_matrix.shape
+            if self._delta:
+                (rows, cols), values = zip(*self._delta.keys()), list(self._delta.values())
+                self._delta_matrix = sparse.csr_matrix(
+                    (np.asarray(values, dtype=np.float32), (rows, cols)), shape=shape
+                )
+            else:
+                self._delta_matrix = sparse.csr_matrix(shape, dtype=np.float32)
+        return self._delta_matrix
+    
+    def recommend_products(self, buyer_id, n_recommendations=5):
+        """Recommend products for a buyer
+        
+        Uses the precomputed item-item index when it has been built,
+        otherwise falls back to user-user similarity on the sparse matrix.
+        """
+        try:
+            if item_similarity_index.is_ready():
+                history = Order.find_recent_product_ids(buyer_id)
+                ranked = item_similarity_index.recommend(history, n_recommendations)
+                if ranked:
+                    product_list = self._hydrate_products(ranked)
+                    if product_list:
+                        return product_list
             
-            return product_list
+            return self._recommend_user_based(buyer_id, n_recommendations)
         
         except Exception as e:
             print(f"Recommendation failed: {str(e)}")
-            return self._get_popular_products(n_recommendations)
+            return self.get_popular_products(n_recommendations)
     
-    def _get_popular_products(self, n_recommendations=5):
-        """Get popular products as fallback"""
-        products = Product.find_many({'is_active': True}, limit=n_recommendations)
+    def _recommend_user_based(self, buyer_id, n_recommendations):
+        """Recommend from the ratings of the most similar buyers"""
+        if self.user_item_matrix is None:
+            self.build_user_item_matrix()
+        elif self.needs_rebuild():
+            # Serve the current matrix while writes from other workers are loaded
+            self.build_async()
+        
+        with self._lock:
+            row = self.user_index.get(buyer_id)
+            if self.user_item_matrix is not None and row is not None:
+                scores = self._score_user_based(row)
+            else:
+                scores = None
+            item_ids = self.item_ids
+        
+        if scores is None:
+            # Return popular products if no data
+            return self.get_popular_products(n_recommendations)
+        
+        candidates = np.flatnonzero(scores > 0)
+        if candidates.size == 0:
+            return self.get_popular_products(n_recommendations)
+        top = candidates[np.argsort(-scores[candidates])][:n_recommendations]
+        
+        product_list = self._hydrate_products([item_ids[i] for i in top])
+        return product_list or self.get_popular_products(n_recommendations)
+    
+    def _score_user_based(self, row):
+        """Similarity-weighted neighbour ratings for one buyer row, or None"""
+        matrix = self.user_item_matrix
+        delta = self._get_delta_matrix()
+        norms = np.sqrt(self.row_sq_norms)
+        norms[norms == 0] = 1.0
+        
+        # Cosine similarity against every buyer in one sparse mat-vec product
+        user_vector = (matrix[row] + delta[row]).tocsr()
+        user_vector.eliminate_zeros()
+        dots = matrix.dot(user_vector.T).toarray().ravel() + delta.dot(user_vector.T).toarray().ravel()
+        similarities = dots / (norms * norms[row])
+        similarities[row] = 0
+        
+        n_similar = min(self.N_SIMILAR_USERS, similarities.size)
+        similar_users = np.argpartition(-similarities, n_similar - 1)[:n_similar]
+        similar_users = similar_users[similarities[similar_users] > 0]
+        if similar_users.size == 0:
+            return None
+        
+        # Similarity-weighted sum of neighbour ratings for every product
+        weights = similarities[similar_users]
+        scores = matrix[similar_users].T.dot(weights) + delta[similar_users].T.dot(weights)
+        scores = np.asarray(scores).ravel()
+        scores[user_vector.indices] = 0
+        return scores
+    
+    def _hydrate_products(self, product_ids):
+        """Fetch product details for ranked ids in one query, preserving rank order"""
+        by_id = Product.find_by_ids(product_ids, analytics=True)
         return [
-            {
-                'product_id': str(p['_id']),
-                'name': p.get('name'),
-                'category': p.get('category'),
-                'price': p.get('price'),
-                'rating': p.get('rating')
-            }
-            for p in products
+            self._format_product(by_id[pid])
+            for pid in product_ids
+            if pid in by_id and by_id[pid].get('is_active', True)
         ]
+    
+    @staticmethod
+    def _format_product(product):
+        """Format a product document for recommendation responses"""
+        return {
+            'product_id': str(product['_id']),
+            'name': product.get('name'),
+            'category': product.get('category'),
+            'price': product.get('price'),
+            'rating': product.get('rating')
+        }
+    
+    def get_popular_products(self, n_recommendations=5, category=None):
+        """Get popular products as fallback"""
+        products = popularity_index.top(n_recommendations, category=category)
+        if products:
+            return products
+        query = {'is_active': True}
+        if category:
+            query['category'] = category
+        products = Product.find_many(query, limit=n_recommendations, analytics=True)
+        return [self._format_product(p) for p in products]
 
 
-# Initialize models
+# Shared models; the random forests are loaded on first prediction or by warm_up()
 crop_recommender = CropRecommendationModel()
 price_predictor = PricePredictionModel()
 product_recommender = ProductRecommendationModel()
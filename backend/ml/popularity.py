@@ -0,0 +1,190 @@
+"""
+Product popularity index
+Time-decayed popularity from orders and ratings, computed by a scheduled
+job and served from process memory
+"""
+
+import heapq
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+class PopularityIndex:
+    """Top products overall and per category.
+    
+    The popularity_index job aggregates the scores and stores the top lists
+    in one snapshot document; workers load that snapshot in a background
+    thread, so requests only ever read memory.
+    """
+    
+    COLLECTION = 'product_popularity'
+    SNAPSHOT_ID = 'current'
+    TTL = timedelta(minutes=15)
+    RELOAD_CHECK_SECONDS = 60
+    HALF_LIFE_DAYS = 14
+    WINDOW_DAYS = 90
+    RATING_WEIGHT = 1.0
+    TOP_N = 50
+    
+    def __init__(self):
+        self.top_overall = []
+        self.top_by_category = {}
+        self.refreshed_at = None
+        self._last_check = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+    
+    def refresh(self):
+        """Recompute popularity scores, publish the snapshot and swap in the new top lists"""
+        now = datetime.utcnow()
+        overall = []
+        by_category = {}
+        for product_id, score, product in self.scores(now):
+            entry = (score, product_id, {
+                'product_id': product_id,
+                'name': product.get('name'),
+                'category': product.get('category'),
+                'price': product.get('price'),
+                'rating': product.get('rating')
+            })
+            self._push(overall, entry)
+            self._push(by_category.setdefault(product.get('category'), []), entry)
+        
+        top_overall = self._ranked(overall)
+        top_by_category = {category: self._ranked(heap) for category, heap in by_category.items()}
+        self._save(top_overall, top_by_category, now)
+        self._swap(top_overall, top_by_category, now)
+        return len(top_overall)
+    
+    def _save(self, top_overall, top_by_category, refreshed_at):
+        from extensions import get_db
+        get_db()[self.COLLECTION].replace_one({'_id': self.SNAPSHOT_ID}, {
+            'top_overall': top_overall,
+            # Category names are not safe as field names; keep them as values
+            'top_by_category': [
+                {'category': category, 'products': products}
+                for category, products in top_by_category.items()
+            ],
+            'refreshed_at': refreshed_at
+        }, upsert=True)
+    
+    def _swap(self, top_overall, top_by_category, refreshed_at):
+        with self._lock:
+            self.top_overall = top_overall
+            self.top_by_category = top_by_category
+            self.refreshed_at = refreshed_at
+    
+    def load(self):
+        """Swap in the published snapshot; False if there is none"""
+        from extensions import get_db
+        self._last_check = time.monotonic()
+        snapshot = get_db()[self.COLLECTION].find_one({'_id': self.SNAPSHOT_ID})
+        if snapshot is None:
+            return False
+        if snapshot['refreshed_at'] != self.refreshed_at:
+            self._swap(
+                snapshot['top_overall'],
+                {entry['category']: entry['products'] for entry in snapshot['top_by_category']},
+                snapshot['refreshed_at']
+            )
+        return True
+    
+    def load_or_refresh(self):
+        """Load the snapshot, aggregating only when it is missing or the job has stopped updating it"""
+        if not self.load() or self.is_expired():
+            self.refresh()
+        return True
+    
+    def scores(self, now=None):
+        """Yield (product_id, score, product) for every active product"""
+        from extensions import get_read_db
+        db = get_read_db()
+        now = now or datetime.utcnow()
+        
+        order_scores = {
+            str(row['_id']): row['score']
+            for row in db['orders'].aggregate(self._order_pipeline(now))
+            if row.get('_id')
+        }
+        for product in db['products'].aggregate(self._product_pipeline()):
+            product_id = str(product['_id'])
+            score = order_scores.get(product_id, 0.0) + self.RATING_WEIGHT * product.get('rating_score', 0.0)
+            yield product_id, score, product
+    
+    def _order_pipeline(self, now):
+        """Sum of exponentially decayed order lines per product"""
+        decay_per_ms = math.log(2) / (self.HALF_LIFE_DAYS * 24 * 3600 * 1000)
+        return [
+            {'$match': {
+                'status': {'$ne': 'cancelled'},
+                'created_at': {'$gte': now - timedelta(days=self.WINDOW_DAYS)}
+            }},
+            {'$unwind': '$items'},
+            {'$group': {
+                '_id': '$items.product_id',
+                'score': {'$sum': {'$exp': {'$multiply': [
+                    -decay_per_ms, {'$subtract': [now, '$created_at']}
+                ]}}}
+            }}
+        ]
+    
+    @staticmethod
+    def _product_pipeline():
+        """Active products with a rating score of rating x ln(1 + review_count)"""
+        return [
+            {'$match': {'is_active': True}},
+            {'$project': {
+                'name': 1, 'category': 1, 'price': 1, 'rating': 1,
+                'rating_score': {'$multiply': [
+                    {'$ifNull': ['$rating', 0]},
+                    {'$ln': {'$add': [1, {'$ifNull': ['$review_count', 0]}]}}
+                ]}
+            }}
+        ]
+    
+    def _push(self, heap, entry):
+        """Keep only the TOP_N highest scored entries in a min-heap"""
+        if len(heap) < self.TOP_N:
+            heapq.heappush(heap, entry)
+        elif entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+    
+    @staticmethod
+    def _ranked(heap):
+        return [product for _, _, product in sorted(heap, key=lambda e: e[:2], reverse=True)]
+    
+    def is_expired(self):
+        """True when the lists are older than two job intervals, i.e. nobody is refreshing them"""
+        return self.refreshed_at is None or datetime.utcnow() - self.refreshed_at >= 2 * self.TTL
+    
+    def needs_reload(self):
+        return self._last_check is None or time.monotonic() - self._last_check >= self.RELOAD_CHECK_SECONDS
+    
+    def load_async(self):
+        """Pick up the latest snapshot in a background thread unless one is already running"""
+        if self._refresh_lock.locked():
+            return
+        threading.Thread(target=self._load_quietly, name='popularity-load', daemon=True).start()
+    
+    def _load_quietly(self):
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self.load_or_refresh()
+        except Exception as e:
+            print(f"[WARN] Popularity refresh failed: {str(e)}")
+        finally:
+            self._refresh_lock.release()
+    
+    def top(self, n=5, category=None):
+        """Most popular products from memory; empty until the first snapshot is loaded"""
+        if self.needs_reload():
+            self.load_async()
+        products = self.top_by_category.get(category, []) if category else self.top_overall
+        return products[:n]
+
+
+# Shared per-process index
+popularity_index = PopularityIndex()
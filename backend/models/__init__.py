@@ -4,10 +4,10 @@ Models package initialization
 
 from models.database import (
     User, Product, Order, Review, PriceHistory, RAGDocument,
-    create_indexes
+    ChatQuery, CollectionVersion, JobLease, JobRun, create_indexes
 )
 
 __all__ = [
     'User', 'Product', 'Order', 'Review', 'PriceHistory', 'RAGDocument',
-    'create_indexes'
+    'ChatQuery', 'CollectionVersion', 'JobLease', 'JobRun', 'create_indexes'
 ]
@@ -3,17 +3,29 @@ Database Models using PyMongo
 Define MongoDB collection schemas and operations
 """
 
-from datetime import datetime
+from contextvars import ContextVar
+from datetime import datetime, timedelta
 from bson import ObjectId
 from bson.errors import InvalidId
-from extensions import get_db
-import hashlib
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from extensions import get_db, get_read_db
+from services.password_hasher import password_hasher
+from utils.cache import TTLCache
+from utils.validators import parse_location, parse_number
+
+# Collections written since CollectionVersion.defer(); None when bumps are immediate
+_pending_versions = ContextVar('pending_collection_versions', default=None)
 
 
 class BaseModel:
     """Base model for common operations"""
     
     collection_name = None
+    # Optional TTLCache of documents by _id; invalidated by update/delete
+    cache = None
+    # Bump a CollectionVersion counter after writes (used for HTTP ETags)
+    versioned = False
     
     @classmethod
     def get_collection(cls):
@@ -22,16 +34,56 @@ class BaseModel:
             raise NotImplementedError("collection_name must be defined")
         return get_db()[cls.collection_name]
     
+    @classmethod
+    def get_analytics_collection(cls):
+        """Collection handle that may read from secondaries (stale reads allowed)"""
+        if cls.collection_name is None:
+            raise NotImplementedError("collection_name must be defined")
+        return get_read_db()[cls.collection_name]
+    
     @classmethod
     def create(cls, data):
         """Create a new document"""
+        return cls.create_document(data)['_id']
+    
+    @classmethod
+    def create_document(cls, data):
+        """Create a new document and return it as stored, including _id"""
         doc = {
             **data,
             'created_at': datetime.utcnow(),
             'updated_at': datetime.utcnow()
         }
         result = cls.get_collection().insert_one(doc)
-        return result.inserted_id
+        doc['_id'] = result.inserted_id
+        if cls.cache is not None:
+            cls.cache.set(doc['_id'], doc)
+        cls._changed()
+        return dict(doc)
+    
+    @classmethod
+    def create_many(cls, documents):
+        """Insert documents in one unordered batch.
+        
+        A failed document does not stop the others. Returns the inserted
+        documents and {position in documents: error message} for the rest.
+        """
+        now = datetime.utcnow()
+        docs = [{**data, 'created_at': now, 'updated_at': now} for data in documents]
+        if not docs:
+            return [], {}
+        errors = {}
+        try:
+            cls.get_collection().insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            errors = {error['index']: error.get('errmsg', 'Insert failed') for error in e.details.get('writeErrors', [])}
+        inserted = [doc for i, doc in enumerate(docs) if i not in errors]
+        if cls.cache is not None:
+            for doc in inserted:
+                cls.cache.set(doc['_id'], doc)
+        if inserted:
+            cls._changed()
+        return inserted, errors
     
     @classmethod
     def find_by_id(cls, doc_id):
@@ -39,10 +91,53 @@ class BaseModel:
         try:
             if isinstance(doc_id, str):
                 doc_id = ObjectId(doc_id)
-            return cls.get_collection().find_one({'_id': doc_id})
         except (InvalidId, ValueError) as e:
             # Invalid ObjectId format
             return None
+        
+        if cls.cache is None:
+            return cls.get_collection().find_one({'_id': doc_id})
+        
+        doc = cls.cache.get(doc_id)
+        if doc is None:
+            doc = cls.get_collection().find_one({'_id': doc_id})
+            if doc is None:
+                return None
+            cls.cache.set(doc_id, doc)
+        # Callers may mutate the result; never hand out the cached dict
+        return dict(doc)
+    
+    @classmethod
+    def find_by_ids(cls, doc_ids, analytics=False, cached=True):
+        """Find several documents by ID in one query; returns {str(_id): doc}.
+        
+        cached=False reads every document from the database (and refreshes
+        the cache), e.g. when the response carries a version-based ETag.
+        """
+        object_ids = [ObjectId(d) if isinstance(d, str) else d for d in doc_ids
+                      if not isinstance(d, str) or ObjectId.is_valid(d)]
+        found = {}
+        missing = []
+        for doc_id in object_ids:
+            doc = cls.cache.get(doc_id) if cached and cls.cache is not None else None
+            if doc is None:
+                missing.append(doc_id)
+            else:
+                found[str(doc_id)] = dict(doc)
+        
+        if missing:
+            collection = cls.get_analytics_collection() if analytics else cls.get_collection()
+            for doc in collection.find({'_id': {'$in': missing}}):
+                if cls.cache is not None:
+                    cls.cache.set(doc['_id'], doc)
+                found[str(doc['_id'])] = dict(doc)
+        return found
+    
+    @classmethod
+    def invalidate(cls, doc_id):
+        """Drop a document from the local cache after an external change"""
+        if cls.cache is not None:
+            cls.cache.pop(ObjectId(doc_id) if isinstance(doc_id, str) else doc_id)
     
     @classmethod
     def find_one(cls, query):
@@ -50,15 +145,44 @@ class BaseModel:
         return cls.get_collection().find_one(query)
     
     @classmethod
-    def find_many(cls, query, limit=None, skip=None):
-        """Find multiple documents"""
-        cursor = cls.get_collection().find(query)
+    def find_many(cls, query, limit=None, skip=None, analytics=False, projection=None, sort=None):
+        """Find multiple documents; analytics=True allows reading from a secondary"""
+        collection = cls.get_analytics_collection() if analytics else cls.get_collection()
+        cursor = collection.find(query, projection)
+        if sort:
+            cursor = cursor.sort(sort)
         if skip:
             cursor = cursor.skip(skip)
         if limit:
             cursor = cursor.limit(limit)
         return list(cursor)
     
+    @classmethod
+    def find_near(cls, point, radius_m, query=None, skip=0, limit=20, projection=None):
+        """Documents whose 'location' is within radius_m of a GeoJSON point, nearest first.
+        
+        One $geoNear aggregation (served by the 2dsphere index) returns the
+        page and the total match count; each document gets distance_km.
+        """
+        page = [{'$skip': skip}, {'$limit': limit}] if skip else [{'$limit': limit}]
+        page.append({'$addFields': {'distance_km': {'$round': [{'$divide': ['$distance_m', 1000]}, 2]}}})
+        if projection:
+            page.append({'$project': {**projection, 'distance_km': 1}})
+        
+        result = next(cls.get_collection().aggregate([
+            {'$geoNear': {
+                'near': point,
+                'key': 'location',
+                'distanceField': 'distance_m',
+                'maxDistance': radius_m,
+                'query': query or {},
+                'spherical': True
+            }},
+            {'$facet': {'data': page, 'total': [{'$count': 'count'}]}}
+        ]), {})
+        total = result.get('total') or [{'count': 0}]
+        return result.get('data', []), total[0]['count']
+    
     @classmethod
     def update(cls, doc_id, data):
         """Update document"""
@@ -74,6 +198,10 @@ class BaseModel:
             {'_id': doc_id},
             {'$set': update_data}
         )
+        if cls.cache is not None:
+            cls.cache.pop(doc_id)
+        if result.modified_count:
+            cls._changed()
         return result.modified_count > 0
     
     @classmethod
@@ -82,12 +210,18 @@ class BaseModel:
         if isinstance(doc_id, str):
             doc_id = ObjectId(doc_id)
         result = cls.get_collection().delete_one({'_id': doc_id})
+        if cls.cache is not None:
+            cls.cache.pop(doc_id)
+        if result.deleted_count:
+            cls._changed()
         return result.deleted_count > 0
     
     @classmethod
     def delete_many(cls, query):
         """Delete multiple documents"""
         result = cls.get_collection().delete_many(query)
+        if result.deleted_count:
+            cls._changed()
         return result.deleted_count
     
     @classmethod
@@ -96,18 +230,28 @@ class BaseModel:
         if query is None:
             query = {}
         return cls.get_collection().count_documents(query)
+    
+    @classmethod
+    def _changed(cls):
+        """Record a write to a versioned collection; call after direct collection writes too"""
+        if cls.versioned:
+            CollectionVersion.changed(cls.collection_name)
 
 
 class User(BaseModel):
     """User model for farmers, buyers, and admins"""
     collection_name = 'users'
     
+    # Profile and ownership lookups by id; short TTL bounds staleness across workers
+    cache = TTLCache(maxsize=2048, ttl=60)
+    
     # Accept both 'buyer' and 'consumer' to be compatible with frontend
     ROLES = ['farmer', 'buyer', 'consumer', 'admin']
     
     @classmethod
-    def create_user(cls, email, password, name, role='buyer', phone=None, address=None):
-        """Create a new user with hashed password"""
+    def create_user(cls, email, password, name, role='buyer', phone=None, address=None,
+                    location=None, return_document=False):
+        """Create a new user with hashed password; returns the id or the inserted document"""
         
         # Check if user already exists
         if cls.find_one({'email': email}):
@@ -130,8 +274,16 @@ class User(BaseModel):
             'created_at': datetime.utcnow(),
             'updated_at': datetime.utcnow()
         }
+        # GeoJSON Point; left out rather than null when unknown
+        if location:
+            user_data['location'] = location
         
-        return cls.create(user_data)
+        try:
+            user = cls.create_document(user_data)
+        except DuplicateKeyError:
+            # Lost a race with a concurrent signup for the same email
+            raise ValueError(f"User with email {email} already exists")
+        return user if return_document else user['_id']
     
     @classmethod
     def find_by_email(cls, email):
@@ -140,21 +292,27 @@ class User(BaseModel):
     
     @classmethod
     def verify_password(cls, user, password):
-        """Verify password"""
+        """Verify password, upgrading legacy or outdated hashes on success"""
         if not user:
             return False
-        password_hash = cls._hash_password(password)
-        return user.get('password_hash') == password_hash
+        matches, needs_rehash = password_hasher.verify(password, user.get('password_hash'))
+        if matches and needs_rehash:
+            cls.update(user['_id'], {'password_hash': cls._hash_password(password)})
+        return matches
     
     @staticmethod
     def _hash_password(password):
-        """Hash password using SHA256"""
-        return hashlib.sha256(password.encode()).hexdigest()
+        """Hash password with the configured bcrypt/scrypt worker pool"""
+        return password_hasher.hash(password)
 
 
 class Product(BaseModel):
     """Product model for crops and agricultural items"""
     collection_name = 'products'
+    versioned = True
+    
+    # Catalogue reads by id; CatalogWatcher invalidates entries changed by other processes
+    cache = TTLCache(maxsize=5000, ttl=300)
     
     # Include categories used by frontend (Vegetables, Grains, Fruits, Spices)
     CATEGORIES = [
@@ -162,10 +320,26 @@ class Product(BaseModel):
         'Vegetables', 'Grains', 'Fruits', 'Spices'
     ]
     
+    # Fields a farmer sets when listing a product (create endpoint and bulk import)
+    REQUIRED_FIELDS = ['name', 'category', 'description', 'price', 'quantity']
+    OPTIONAL_FIELDS = ['soil_type', 'season', 'quality_grade', 'image_url']
+    
     @classmethod
     def create_product(cls, farmer_id, name, category, description, price, quantity, 
-                      soil_type=None, season=None, quality_grade=None, image_url=None):
-        """Create a new product"""
+                      soil_type=None, season=None, quality_grade=None, image_url=None, location=None):
+        """Create a new product; without a location of its own it is placed at the farm"""
+        return cls.create(cls.new_document(
+            farmer_id, name, category, description, price, quantity,
+            soil_type=soil_type, season=season, quality_grade=quality_grade,
+            image_url=image_url, location=location,
+            farm_location=cls.farm_location(farmer_id) if location is None else None
+        ))
+    
+    @classmethod
+    def new_document(cls, farmer_id, name, category, description, price, quantity,
+                     soil_type=None, season=None, quality_grade=None, image_url=None, location=None,
+                     farm_location=None):
+        """Product document ready to insert; farm_location is used when it has no location of its own"""
         
         if category not in cls.CATEGORIES:
             raise ValueError(f"Invalid category. Must be one of {cls.CATEGORIES}")
@@ -184,11 +358,69 @@ class Product(BaseModel):
             'rating': 0,
             'review_count': 0,
             'is_active': True,
+            'location_inherited': location is None,
             'created_at': datetime.utcnow(),
             'updated_at': datetime.utcnow()
         }
+        location = location or farm_location
+        if location:
+            product_data['location'] = location
+        
+        return product_data
+    
+    @classmethod
+    def clean_fields(cls, data):
+        """Validated new_document keyword arguments from request JSON or an import row; raises ValueError"""
+        if any(data.get(field) in (None, '') for field in cls.REQUIRED_FIELDS):
+            raise ValueError(f"Missing required fields: {cls.REQUIRED_FIELDS}")
         
-        return cls.create(product_data)
+        if data['category'] not in cls.CATEGORIES:
+            raise ValueError(f"Invalid category. Must be one of {cls.CATEGORIES}")
+        
+        try:
+            price, quantity = parse_number(data['price']), parse_number(data['quantity'])
+        except ValueError:
+            raise ValueError("Price and quantity must be numbers")
+        if price <= 0 or quantity < 0:
+            raise ValueError("Price must be positive and quantity must be non-negative")
+        
+        fields = {field: data[field] for field in ('name', 'category', 'description')}
+        fields.update(price=price, quantity=quantity)
+        fields.update({field: data.get(field) or None for field in cls.OPTIONAL_FIELDS})
+        
+        # A GeoJSON/"lat,lng" location, or latitude and longitude columns
+        if data.get('location'):
+            fields['location'] = parse_location(data['location'])
+        elif data.get('latitude') not in (None, '') or data.get('longitude') not in (None, ''):
+            fields['location'] = parse_location({'latitude': data.get('latitude'), 'longitude': data.get('longitude')})
+        return fields
+    
+    @staticmethod
+    def farm_location(farmer_id):
+        """The farmer's GeoJSON location, or None"""
+        farmer = User.find_by_id(farmer_id)
+        return farmer.get('location') if farmer else None
+    
+    @classmethod
+    def set_farm_location(cls, farmer_id, location):
+        """Move a farmer's products that have no location of their own to a new farm location"""
+        if isinstance(farmer_id, str):
+            farmer_id = ObjectId(farmer_id)
+        # Products created before locations existed have no flag and are moved too
+        query = {'farmer_id': farmer_id, 'location_inherited': {'$ne': False}}
+        product_ids = [doc['_id'] for doc in cls.get_collection().find(query, {'_id': 1})]
+        if not product_ids:
+            return 0
+        
+        result = cls.get_collection().update_many(
+            {'_id': {'$in': product_ids}},
+            {'$set': {'location': location, 'location_inherited': True, 'updated_at': datetime.utcnow()}}
+        )
+        for product_id in product_ids:
+            cls.invalidate(product_id)
+        if result.modified_count:
+            cls._changed()
+        return result.modified_count
     
     @classmethod
     def find_by_category(cls, category, limit=None, skip=None):
@@ -201,6 +433,49 @@ class Product(BaseModel):
         if isinstance(farmer_id, str):
             farmer_id = ObjectId(farmer_id)
         return cls.find_many({'farmer_id': farmer_id, 'is_active': True}, limit=limit, skip=skip)
+    
+    @classmethod
+    def adjust_stock(cls, product_id, delta):
+        """Atomically add delta to quantity; a decrement fails if stock would go negative.
+        
+        Checked in Mongo rather than against a (possibly cached) read, so
+        concurrent orders cannot oversell.
+        """
+        if isinstance(product_id, str):
+            product_id = ObjectId(product_id)
+        query = {'_id': product_id}
+        if delta < 0:
+            query['quantity'] = {'$gte': -delta}
+        
+        result = cls.get_collection().update_one(
+            query,
+            {'$inc': {'quantity': delta}, '$set': {'updated_at': datetime.utcnow()}}
+        )
+        cls.invalidate(product_id)
+        if result.modified_count:
+            cls._changed()
+        return result.modified_count > 0
+    
+    @classmethod
+    def restock(cls, items):
+        """Add item quantities back to their products in one bulk write (cancellations, rollbacks)"""
+        quantities = {}
+        for item in items:
+            product_id = ObjectId(item['product_id']) if isinstance(item['product_id'], str) else item['product_id']
+            quantities[product_id] = quantities.get(product_id, 0) + item['quantity']
+        if not quantities:
+            return 0
+        
+        now = datetime.utcnow()
+        result = cls.get_collection().bulk_write([
+            UpdateOne({'_id': product_id}, {'$inc': {'quantity': quantity}, '$set': {'updated_at': now}})
+            for product_id, quantity in quantities.items()
+        ], ordered=False)
+        for product_id in quantities:
+            cls.invalidate(product_id)
+        if result.modified_count:
+            cls._changed()
+        return result.modified_count
 
 
 class Order(BaseModel):
@@ -232,6 +507,45 @@ class Order(BaseModel):
             buyer_id = ObjectId(buyer_id)
         return cls.find_many({'buyer_id': buyer_id}, limit=limit, skip=skip)
     
+    @classmethod
+    def has_purchased(cls, buyer_id, product_id):
+        """Whether the buyer has a non-cancelled order containing the product"""
+        try:
+            buyer_id = ObjectId(str(buyer_id))
+        except InvalidId:
+            return False
+        # Order items keep the product id as the client sent it
+        product_ids = [str(product_id)]
+        if ObjectId.is_valid(str(product_id)):
+            product_ids.append(ObjectId(str(product_id)))
+        order = cls.get_collection().find_one(
+            {'buyer_id': buyer_id, 'status': {'$ne': 'cancelled'}, 'items.product_id': {'$in': product_ids}},
+            {'_id': 1}
+        )
+        return order is not None
+    
+    @classmethod
+    def find_recent_product_ids(cls, buyer_id, limit=20):
+        """Distinct product ids from a buyer's most recent orders, newest first"""
+        if isinstance(buyer_id, str):
+            try:
+                buyer_id = ObjectId(buyer_id)
+            except InvalidId:
+                return []
+        
+        cursor = cls.get_collection().find(
+            {'buyer_id': buyer_id, 'status': {'$ne': 'cancelled'}},
+            {'items.product_id': 1}
+        ).sort('created_at', -1).limit(limit)
+        
+        product_ids = []
+        for order in cursor:
+            for item in order.get('items', []):
+                product_id = str(item.get('product_id'))
+                if item.get('product_id') and product_id not in product_ids:
+                    product_ids.append(product_id)
+        return product_ids
+    
     @classmethod
     def update_status(cls, order_id, new_status):
         """Update order status"""
@@ -243,6 +557,7 @@ class Order(BaseModel):
 class Review(BaseModel):
     """Review model for product ratings"""
     collection_name = 'reviews'
+    versioned = True
     
     @classmethod
     def create_review(cls, product_id, buyer_id, rating, comment=None):
@@ -299,7 +614,7 @@ class PriceHistory(BaseModel):
         return cls.find_many({
             'product_id': product_id,
             'timestamp': {'$gte': start_date}
-        })
+        }, analytics=True)
 
 
 class RAGDocument(BaseModel):
@@ -328,19 +643,168 @@ class RAGDocument(BaseModel):
         return cls.find_many({'category': category, 'is_indexed': True})
 
 
+class ChatQuery(BaseModel):
+    """Chatbot questions counted by normalized text, for question autocomplete"""
+    collection_name = 'chat_queries'
+    
+    RETENTION_DAYS = 180
+    
+    @classmethod
+    def record(cls, key, text):
+        """Count one asking of a question; its first wording is kept for display"""
+        cls.get_collection().update_one(
+            {'_id': key},
+            {
+                '$inc': {'count': 1},
+                '$set': {'last_asked_at': datetime.utcnow()},
+                '$setOnInsert': {'text': text}
+            },
+            upsert=True
+        )
+    
+    @classmethod
+    def most_asked(cls, min_count=1, limit=5000):
+        """Most frequently asked questions, at least min_count times each"""
+        cursor = cls.get_analytics_collection().find(
+            {'count': {'$gte': min_count}}, {'text': 1, 'count': 1}
+        ).sort('count', -1).limit(limit)
+        return list(cursor)
+
+
+class CollectionVersion(BaseModel):
+    """Per-collection change counters backing ETags of list endpoints.
+    
+    Every write bumps one shared document per collection, so requests and
+    scheduled jobs defer their bumps to one per collection (see defer and
+    flush) instead of one per written document.
+    """
+    collection_name = 'collection_versions'
+    
+    @classmethod
+    def changed(cls, name):
+        """Bump now, or at flush() when bumps are deferred"""
+        pending = _pending_versions.get()
+        if pending is None:
+            cls.bump(name)
+        else:
+            pending.add(name)
+    
+    @classmethod
+    def defer(cls):
+        """Collect bumps in the current context until flush()"""
+        if _pending_versions.get() is None:
+            _pending_versions.set(set())
+    
+    @classmethod
+    def flush(cls):
+        """Bump every collection written since defer(), once each"""
+        pending = _pending_versions.get()
+        _pending_versions.set(None)
+        for name in sorted(pending or ()):
+            cls.bump(name)
+    
+    @classmethod
+    def bump(cls, name):
+        """Increment the version of a collection after a write"""
+        cls.get_collection().update_one(
+            {'_id': name},
+            {'$inc': {'version': 1}, '$set': {'updated_at': datetime.utcnow()}},
+            upsert=True
+        )
+    
+    @classmethod
+    def get_token(cls, name):
+        """Opaque version token, or None if the collection has no counter yet"""
+        doc = cls.get_collection().find_one({'_id': name})
+        if not doc:
+            return None
+        # updated_at keeps tokens unique if the counter is ever reset
+        return f"{doc['version']}:{doc['updated_at'].timestamp()}"
+
+
+class JobLease(BaseModel):
+    """Time-limited locks so each scheduled job run executes in one scheduler process"""
+    collection_name = 'job_leases'
+    
+    @classmethod
+    def acquire(cls, job_id, owner, ttl_seconds):
+        """Take the lease for job_id unless another owner holds an unexpired one"""
+        now = datetime.utcnow()
+        try:
+            cls.get_collection().update_one(
+                {'_id': job_id, '$or': [{'expires_at': {'$lte': now}}, {'owner': owner}]},
+                {'$set': {
+                    'owner': owner,
+                    'acquired_at': now,
+                    'expires_at': now + timedelta(seconds=ttl_seconds)
+                }},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            # The upsert collided with a live lease held by someone else
+            return False
+    
+    @classmethod
+    def release(cls, job_id, owner):
+        """Drop the lease early so another process may retry the job"""
+        result = cls.get_collection().delete_one({'_id': job_id, 'owner': owner})
+        return result.deleted_count > 0
+
+
+class JobRun(BaseModel):
+    """History of scheduled job executions"""
+    collection_name = 'job_runs'
+    
+    # skipped: the job ran but had nothing to do, e.g. too little data
+    STATUSES = ['success', 'skipped', 'failed']
+    RETENTION_DAYS = 30
+    
+    @classmethod
+    def record_run(cls, job_id, owner, started_at, finished_at, status,
+                   documents_touched=None, error=None):
+        """Record one job execution"""
+        
+        run_data = {
+            'job_id': job_id,
+            'owner': owner,
+            'started_at': started_at,
+            'finished_at': finished_at,
+            'duration_ms': round((finished_at - started_at).total_seconds() * 1000, 1),
+            'status': status,
+            'documents_touched': documents_touched,
+            'error': error
+        }
+        
+        return cls.create(run_data)
+    
+    @classmethod
+    def find_recent(cls, job_id=None, limit=20):
+        """Most recent runs, newest first"""
+        query = {'job_id': job_id} if job_id else {}
+        cursor = cls.get_collection().find(query).sort('started_at', -1).limit(limit)
+        return list(cursor)
+
+
 def create_indexes():
     """Create MongoDB indexes for better query performance"""
     
     # User indexes
     User.get_collection().create_index('email', unique=True)
+    User.get_collection().create_index([('location', '2dsphere'), ('role', 1)])
     
     # Product indexes
     Product.get_collection().create_index('farmer_id')
     Product.get_collection().create_index('category')
     Product.get_collection().create_index([('name', 'text'), ('description', 'text')])
+    # Nearby products ($geoNear); category narrows the scan inside the index
+    Product.get_collection().create_index([('location', '2dsphere'), ('category', 1)])
+    # Catalogue watcher polling fallback, run by every worker
+    Product.get_collection().create_index('updated_at')
     
     # Order indexes
     Order.get_collection().create_index('buyer_id')
+    Order.get_collection().create_index([('buyer_id', 1), ('created_at', -1)])
     Order.get_collection().create_index('status')
     
     # Review indexes
@@ -350,8 +814,22 @@ def create_indexes():
     # Price history indexes
     PriceHistory.get_collection().create_index('product_id')
     PriceHistory.get_collection().create_index('timestamp')
+    PriceHistory.get_collection().create_index([('product_id', 1), ('timestamp', -1)])
     
     # RAG document indexes
     RAGDocument.get_collection().create_index('category')
     
+    # Chatbot question counts; questions not asked for RETENTION_DAYS are dropped
+    ChatQuery.get_collection().create_index([('count', -1)])
+    ChatQuery.get_collection().create_index(
+        'last_asked_at', expireAfterSeconds=ChatQuery.RETENTION_DAYS * 24 * 3600
+    )
+    
+    # Scheduler indexes; expired leases and old run history are removed by TTL
+    JobLease.get_collection().create_index('expires_at', expireAfterSeconds=0)
+    JobRun.get_collection().create_index([('job_id', 1), ('started_at', -1)])
+    JobRun.get_collection().create_index(
+        'started_at', expireAfterSeconds=JobRun.RETENTION_DAYS * 24 * 3600
+    )
+    
     print("[OK] All MongoDB indexes created successfully")
@@ -660,12 +660,17 @@ class InternalRAGChatbot:
         self.vector_store = None
         self.faiss_index_path = os.path.join('data', 'internal_rag_index')
         self.initialized = False
-        self.available_embeddings = False
+        self.available_embeddings = None
         self.HF_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
 
         # Build internal KB immediately
         self._build_internal_kb()
-        # Try to initialize embeddings & index lazily
+        # Embedding libraries (torch via langchain_huggingface) are probed on first retrieval
+
+    def _load_embedding_backend(self):
+        """Import the HuggingFace/FAISS integrations once; False when unavailable"""
+        if self.available_embeddings is not None:
+            return self.available_embeddings
         try:
             from langchain_huggingface import HuggingFaceEmbeddings
             from langchain.docstore.document import Document
@@ -679,6 +684,7 @@ class InternalRAGChatbot:
         except Exception as e:
             self.available_embeddings = False
             print(f'[WARN] InternalRAG: embeddings not available, using keyword fallback: {e}')
+        return self.available_embeddings
 
     def _build_internal_kb(self):
         """Create the internal agriculture knowledge base as Python data structures."""
@@ -826,7 +832,7 @@ class InternalRAGChatbot:
         """Build embeddings and FAISS vector store (lazy)."""
         if self.initialized:
             return True
-        if not self.available_embeddings:
+        if not self._load_embedding_backend():
             print('[WARN] InternalRAG: embeddings not available; using keyword search')
             self.initialized = True
             return False
@@ -859,7 +865,7 @@ class InternalRAGChatbot:
 
     def retrieve(self, question: str, k: int = 4):
         """Retrieve top-k chunks for the question using embeddings or keyword fallback."""
-        if self.available_embeddings and self.initialize_embeddings_and_index():
+        if self._load_embedding_backend() and self.initialize_embeddings_and_index():
             try:
                 docs = self.vector_store.similarity_search(question, k=k)
                 # convert Document objects to text+metadata
@@ -945,7 +951,7 @@ class InternalRAGChatbot:
         return {
             'kb_entries': len(self.kb),
             'chunks': len(self.chunks),
-            'embeddings_available': self.available_embeddings,
+            'embeddings_available': bool(self.available_embeddings),
             'status': 'ready'
         }
 
@@ -1,14 +1,26 @@
 """
 Routes package initialization
+Blueprints are imported on first access, so create_app only pays for the enabled ones
 """
 
-from routes.auth import auth_bp
-from routes.products import products_bp
-from routes.orders import orders_bp
-from routes.reviews import reviews_bp
-from routes.ml import ml_bp
-from routes.chatbot import chatbot_bp
+import importlib
 
-__all__ = [
-    'auth_bp', 'products_bp', 'orders_bp', 'reviews_bp', 'ml_bp', 'chatbot_bp'
-]
+BLUEPRINT_MODULES = {
+    'auth_bp': 'routes.auth',
+    'products_bp': 'routes.products',
+    'orders_bp': 'routes.orders',
+    'reviews_bp': 'routes.reviews',
+    'ml_bp': 'routes.ml',
+    'chatbot_bp': 'routes.chatbot',
+    'admin_bp': 'routes.admin'
+}
+
+
+def __getattr__(name):
+    module = BLUEPRINT_MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module 'routes' has no attribute '{name}'")
+    return getattr(importlib.import_module(module), name)
+
+
+__all__ = list(BLUEPRINT_MODULES)
@@ -0,0 +1,67 @@
+"""
+Admin Routes
+Operational endpoints for administrators
+"""
+
+import os
+from datetime import datetime
+from flask import Blueprint, request, jsonify, Response, current_app
+from flask_jwt_extended import jwt_required
+from utils.decorators import role_required
+from utils.errors import BadRequestError
+from utils.profiler import process_profiler, render_collapsed
+from utils.startup import startup_report
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
+
+
+@admin_bp.route('/profile', methods=['GET'])
+@jwt_required()
+@role_required(['admin'])
+def profile_process():
+    """Sample this worker's threads for a few seconds and return collapsed stacks (admin only)
+    
+    Output is one "frame;frame;... count" line per stack, ready for
+    flamegraph.pl or speedscope. Profiles the worker that serves this
+    request only.
+    """
+    try:
+        if not current_app.config.get('PROFILER_ENABLED', True):
+            return jsonify({'status': 'error', 'message': 'Profiler is disabled'}), 404
+        
+        seconds = request.args.get('seconds', 10, type=float)
+        interval_ms = request.args.get('interval_ms', None, type=float)
+        
+        if seconds <= 0 or seconds > process_profiler.max_seconds:
+            raise BadRequestError(f"seconds must be between 0 and {process_profiler.max_seconds}")
+        
+        if interval_ms is not None and not 1 <= interval_ms <= 1000:
+            raise BadRequestError("interval_ms must be between 1 and 1000")
+        
+        result = process_profiler.profile(seconds, interval_ms / 1000.0 if interval_ms else None)
+        if result is None:
+            return jsonify({'status': 'error', 'message': 'A profile is already running in this worker'}), 409
+        
+        samples, sample_count = result
+        response = Response(render_collapsed(samples), mimetype='text/plain')
+        filename = f"profile-{os.getpid()}-{datetime.utcnow():%Y%m%dT%H%M%S}.folded"
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response.headers['X-Profile-Samples'] = str(sample_count)
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    
+    except BadRequestError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+
+@admin_bp.route('/startup', methods=['GET'])
+@jwt_required()
+@role_required(['admin'])
+def startup_timings():
+    """Startup phase timings and the packages each phase imported, for this worker (admin only)"""
+    try:
+        return jsonify({'status': 'success', 'data': startup_report.as_dict()}), 200
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
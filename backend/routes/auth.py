@@ -5,16 +5,24 @@ Handles user signup, login, token refresh
 
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
-from utils.decorators import get_identity
-import json
-from models import User
-from utils.validators import validate_email, validate_password
+from utils.decorators import get_identity, role_required, IDENTITY_CLAIMS
+from models import User, Product
+from services.password_hasher import password_hasher, PasswordHasherBusyError
+from utils.validators import validate_email, validate_password, parse_location
 from utils.errors import BadRequestError, UnauthorizedError
 from bson import ObjectId
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
 
+def _create_tokens(identity, refresh=True):
+    """Create access (and refresh) tokens with the identity as top-level claims"""
+    claims = {key: identity.get(key) for key in IDENTITY_CLAIMS}
+    access_token = create_access_token(identity=claims['user_id'], additional_claims=claims)
+    refresh_token = create_refresh_token(identity=claims['user_id'], additional_claims=claims) if refresh else None
+    return access_token, refresh_token
+
+
 @auth_bp.route('/signup', methods=['POST'])
 def signup():
     """User signup endpoint"""
@@ -36,27 +44,23 @@ def signup():
         if role not in User.ROLES:
             raise BadRequestError(f"Invalid role. Must be one of {User.ROLES}")
         
-        user_id = User.create_user(
+        user = User.create_user(
             email=data['email'],
             password=data['password'],
             name=data['name'],
             role=role,
             phone=data.get('phone'),
-            address=data.get('address')
+            address=data.get('address'),
+            location=parse_location(data['location']) if data.get('location') else None,
+            return_document=True
         )
         
-        # Fetch created user to get full details
-        user = User.find_by_id(user_id)
-        
         # Create tokens
-        identity_payload = {
+        access_token, refresh_token = _create_tokens({
             'user_id': str(user['_id']),
             'email': user['email'],
             'role': user['role']
-        }
-        # Store identity as JSON string inside the token subject to avoid subject type issues
-        access_token = create_access_token(identity=json.dumps(identity_payload))
-        refresh_token = create_refresh_token(identity=json.dumps(identity_payload))
+        })
         
         return jsonify({
             'status': 'success',
@@ -75,6 +79,8 @@ def signup():
         return jsonify({'status': 'error', 'message': str(e)}), 400
     except ValueError as e:
         return jsonify({'status': 'error', 'message': str(e)}), 400
+    except PasswordHasherBusyError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 503
     except Exception as e:
         return jsonify({'status': 'error', 'message': f'Signup failed: {str(e)}'}), 500
 
@@ -98,14 +104,11 @@ def login():
             raise UnauthorizedError("User account is inactive")
         
         # Create tokens
-        identity_payload = {
+        access_token, refresh_token = _create_tokens({
             'user_id': str(user['_id']),
             'email': user['email'],
             'role': user['role']
-        }
-        # Store identity as JSON string inside the token subject to avoid subject type issues
-        access_token = create_access_token(identity=json.dumps(identity_payload))
-        refresh_token = create_refresh_token(identity=json.dumps(identity_payload))
+        })
         
         return jsonify({
             'status': 'success',
@@ -124,6 +127,8 @@ def login():
         return jsonify({'status': 'error', 'message': str(e)}), 400
     except UnauthorizedError as e:
         return jsonify({'status': 'error', 'message': str(e)}), 401
+    except PasswordHasherBusyError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 503
     except Exception as e:
         return jsonify({'status': 'error', 'message': f'Login failed: {str(e)}'}), 500
 
@@ -135,8 +140,8 @@ def refresh():
     try:
         identity = get_identity()
         
-        # Preserve identity format stored in token (stringified JSON or dict)
-        access_token = create_access_token(identity=json.dumps(identity) if not isinstance(identity, str) else identity)
+        # Tokens refreshed from the legacy layout are reissued in the compact one
+        access_token = _create_tokens(identity, refresh=False)[0]
         
         return jsonify({
             'status': 'success',
@@ -169,6 +174,7 @@ def get_profile():
                 'role': user['role'],
                 'phone': user.get('phone'),
                 'address': user.get('address'),
+                'location': user.get('location'),
                 'created_at': user.get('created_at').isoformat() if user.get('created_at') else None
             }
         }), 200
@@ -192,6 +198,12 @@ def update_profile():
         allowed_fields = ['name', 'phone', 'address']
         update_data = {field: data[field] for field in allowed_fields if field in data}
         
+        if data.get('location'):
+            try:
+                update_data['location'] = parse_location(data['location'])
+            except ValueError as e:
+                raise BadRequestError(str(e))
+        
         if not update_data:
             raise BadRequestError("No valid fields to update")
         
@@ -200,6 +212,10 @@ def update_profile():
         if not success:
             raise ValueError("User not found")
         
+        # Products without a location of their own move with the farm
+        if 'location' in update_data and identity.get('role') == 'farmer':
+            Product.set_farm_location(user_id, update_data['location'])
+        
         return jsonify({
             'status': 'success',
             'message': 'Profile updated successfully'
@@ -211,6 +227,17 @@ def update_profile():
         return jsonify({'status': 'error', 'message': f'Update failed: {str(e)}'}), 500
 
 
+@auth_bp.route('/hash-metrics', methods=['GET'])
+@jwt_required()
+@role_required(['admin'])
+def get_hash_metrics():
+    """Password hashing latency metrics (admin only)"""
+    return jsonify({
+        'status': 'success',
+        'data': password_hasher.get_metrics()
+    }), 200
+
+
 @auth_bp.route('/logout', methods=['POST'])
 @jwt_required()
 def logout():
@@ -5,40 +5,57 @@ API endpoints for RAG chatbot functionality
 
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from services.chatbot_service import ChatbotService
+from services.chatbot_service import ChatbotService, SUGGESTED_QUESTIONS
+from services.autocomplete import question_suggestions, record_question
 from utils.errors import BadRequestError
+from utils.http_cache import http_cache
 import os
 from datetime import datetime
 
 chatbot_bp = Blueprint('chatbot', __name__, url_prefix='/api/chatbot')
 
-# Initialize chatbot service
+# Shared chatbot service; the KB and embeddings load on first query or in warm_up()
 chatbot_service = ChatbotService()
 
 
 
 @chatbot_bp.route('/suggestions', methods=['GET'])
+@http_cache(max_age=3600, stale_while_revalidate=86400)
 def get_suggestions():
     """Get common agricultural question suggestions"""
-    suggestions = [
-        "Which fertilizer is best for tomatoes?",
-        "How do I grow cucumber?",
-        "What is the best irrigation method for wheat?",
-        "How can I prevent pests on rice?",
-        "When should I harvest onions?",
-        "What fertilizer for cotton?",
-        "How to grow potatoes?",
-        "When to plant wheat?"
-    ]
-    
     return jsonify({
         'status': 'success',
         'data': {
-            'suggestions': suggestions
+            'suggestions': SUGGESTED_QUESTIONS
         }
     }), 200
 
 
+@chatbot_bp.route('/suggest', methods=['GET'])
+@http_cache(max_age=60, stale_while_revalidate=300)
+def suggest_questions():
+    """Typeahead completions for the question box, most asked first"""
+    try:
+        q = request.args.get('q', '')
+        limit = request.args.get('limit', 8, type=int)
+        
+        if len(q) > 200:
+            raise BadRequestError("Query too long (max 200 characters)")
+        if not 1 <= limit <= 20:
+            raise BadRequestError("limit must be between 1 and 20")
+        
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'suggestions': question_suggestions.suggest(q, limit)
+            }
+        }), 200
+    except BadRequestError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+
 @chatbot_bp.route('/ask', methods=['POST'])
 def ask_question():
     """Legacy endpoint - use /query instead"""
@@ -73,6 +90,7 @@ def query_internal_rag():
         
         # Use production RAG chatbot service
         result = chatbot_service.query(question)
+        record_question(question)
         
         return jsonify({
             'status': result.get('status'),
@@ -6,7 +6,11 @@ Provides API endpoints for ML predictions
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
 from ml.models import crop_recommender, price_predictor, product_recommender
+from ml.forecasting import price_forecaster
+from models import Product
 from utils.errors import BadRequestError
+from utils.http_cache import http_cache
+from utils.metrics import timed
 
 ml_bp = Blueprint('ml', __name__, url_prefix='/api/ml')
 
@@ -23,13 +27,14 @@ def recommend_crops():
             raise BadRequestError(f"Missing required fields: {required}")
         
         # Get recommendations
-        recommendations = crop_recommender.predict(
-            soil_type=data['soil_type'],
-            season=data['season'],
-            rainfall=data['rainfall'],
-            temperature=int(data['temperature']),
-            humidity=int(data['humidity'])
-        )
+        with timed('ml.crop_recommendation'):
+            recommendations = crop_recommender.predict(
+                soil_type=data['soil_type'],
+                season=data['season'],
+                rainfall=data['rainfall'],
+                temperature=int(data['temperature']),
+                humidity=int(data['humidity'])
+            )
         
         return jsonify({
             'status': 'success',
@@ -70,12 +75,13 @@ def predict_price():
         if quantity <= 0:
             raise BadRequestError("Quantity must be positive")
         
-        prediction = price_predictor.predict(
-            days_from_now=days,
-            season=season,
-            category=category,
-            quantity=quantity
-        )
+        with timed('ml.price_prediction'):
+            prediction = price_predictor.predict(
+                days_from_now=days,
+                season=season,
+                category=category,
+                quantity=quantity
+            )
         
         return jsonify({
             'status': 'success',
@@ -88,6 +94,44 @@ def predict_price():
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 
+@ml_bp.route('/price-forecast', methods=['POST'])
+def forecast_prices():
+    """Forecast daily prices for several products over a horizon"""
+    try:
+        data = request.get_json() or {}
+        
+        product_ids = data.get('product_ids')
+        horizon = int(data.get('horizon', price_forecaster.MAX_HORIZON))
+        
+        if not product_ids or not isinstance(product_ids, list):
+            raise BadRequestError("product_ids must be a non-empty list")
+        
+        if len(product_ids) > 100:
+            raise BadRequestError("At most 100 products can be forecast per request")
+        
+        if horizon < 1 or horizon > price_forecaster.MAX_HORIZON:
+            raise BadRequestError(f"Horizon must be between 1 and {price_forecaster.MAX_HORIZON}")
+        
+        with timed('ml.price_forecast'):
+            forecasts = price_forecaster.forecast_many([str(pid) for pid in product_ids], horizon)
+        
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'horizon': horizon,
+                'forecasts': forecasts,
+                'count': len(forecasts)
+            }
+        }), 200
+    
+    except BadRequestError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+
 @ml_bp.route('/product-recommendation', methods=['POST'])
 @jwt_required()
 def recommend_products():
@@ -103,7 +147,8 @@ def recommend_products():
         if n_recommendations < 1 or n_recommendations > 20:
             raise BadRequestError("n_recommendations must be between 1 and 20")
         
-        recommendations = product_recommender.recommend_products(buyer_id, n_recommendations)
+        with timed('ml.product_recommendation'):
+            recommendations = product_recommender.recommend_products(buyer_id, n_recommendations)
         
         return jsonify({
             'status': 'success',
@@ -119,7 +164,38 @@ def recommend_products():
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 
+@ml_bp.route('/popular-products', methods=['GET'])
+def get_popular_products():
+    """Get the most popular products, optionally within one category"""
+    try:
+        limit = request.args.get('limit', 10, type=int)
+        category = request.args.get('category', None)
+        
+        if limit < 1 or limit > 50:
+            raise BadRequestError("limit must be between 1 and 50")
+        
+        if category and category not in Product.CATEGORIES:
+            raise BadRequestError(f"Invalid category. Must be one of {Product.CATEGORIES}")
+        
+        with timed('ml.popular_products'):
+            products = product_recommender.get_popular_products(limit, category=category)
+        
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'products': products,
+                'count': len(products)
+            }
+        }), 200
+    
+    except BadRequestError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+
 @ml_bp.route('/model-info', methods=['GET'])
+@http_cache(max_age=300, stale_while_revalidate=3600)
 def get_model_info():
     """Get information about available ML models"""
     return jsonify({
@@ -140,6 +216,13 @@ def get_model_info():
                     'description': 'Predicts future crop prices',
                     'requires_auth': False
                 },
+                {
+                    'name': 'Price Forecast',
+                    'endpoint': '/api/ml/price-forecast',
+                    'method': 'POST',
+                    'description': 'Forecasts daily prices with intervals for up to 100 products over 1-30 days',
+                    'requires_auth': False
+                },
                 {
                     'name': 'Product Recommendation',
                     'endpoint': '/api/ml/product-recommendation',
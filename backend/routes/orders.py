@@ -8,9 +8,27 @@ from flask_jwt_extended import jwt_required
 from utils.decorators import get_identity, role_required
 from models import Order, Product
 from utils.errors import BadRequestError, UnauthorizedError, NotFoundError
+from utils.serialization import serialize, serialize_many, projection
+from utils.startup import loaded
+from bson import ObjectId
 
 orders_bp = Blueprint('orders', __name__, url_prefix='/api/orders')
 
+# Response field maps: output key -> document key
+ORDER_SUMMARY_FIELDS = {
+    'order_id': '_id',
+    'items': 'items',
+    'total_price': 'total_price',
+    'status': 'status',
+    'created_at': 'created_at'
+}
+
+ORDER_DETAIL_FIELDS = {
+    **ORDER_SUMMARY_FIELDS,
+    'shipping_address': 'shipping_address',
+    'updated_at': 'updated_at'
+}
+
 
 @orders_bp.route('/', methods=['POST'])
 @jwt_required()
@@ -29,6 +47,14 @@ def create_order():
         if not data.get('shipping_address'):
             raise BadRequestError("Shipping address is required")
         
+        for item in data['items']:
+            quantity = item.get('quantity')
+            if not item.get('product_id') or not quantity or quantity <= 0:
+                raise BadRequestError("Each item must have valid product_id and quantity")
+        
+        # All products in one query instead of one per item
+        products = Product.find_by_ids([item['product_id'] for item in data['items']])
+        
         # Calculate total price and validate items
         items = []
         total_price = 0
@@ -37,11 +63,7 @@ def create_order():
             product_id = item.get('product_id')
             quantity = item.get('quantity')
             
-            if not product_id or not quantity or quantity <= 0:
-                raise BadRequestError("Each item must have valid product_id and quantity")
-            
-            # Get product
-            product = Product.find_by_id(product_id)
+            product = products.get(str(product_id))
             
             if not product:
                 raise NotFoundError(f"Product {product_id} not found")
@@ -60,19 +82,30 @@ def create_order():
                 'total': item_price
             })
         
+        # Reserve stock atomically; the check above may have used a cached product
+        reserved = []
+        for item in items:
+            if not Product.adjust_stock(item['product_id'], -item['quantity']):
+                Product.restock(reserved)
+                raise BadRequestError(f"Insufficient stock for product {item['product_name']}")
+            reserved.append(item)
+        
         # Create order
-        order_id = Order.create_order(
-            buyer_id=buyer_id,
-            items=items,
-            total_price=total_price,
-            shipping_address=data['shipping_address']
-        )
+        try:
+            order_id = Order.create_order(
+                buyer_id=buyer_id,
+                items=items,
+                total_price=total_price,
+                shipping_address=data['shipping_address']
+            )
+        except Exception:
+            Product.restock(reserved)
+            raise
         
-        # Update product quantities
-        for item in items:
-            product = Product.find_by_id(item['product_id'])
-            new_quantity = product['quantity'] - item['quantity']
-            Product.update(item['product_id'], {'quantity': new_quantity})
+        # Only workers serving recommendations hold a matrix; the rest never import the ML stack
+        recommender = loaded('ml.models', 'product_recommender')
+        if recommender is not None:
+            recommender.record_purchase(buyer_id, [item['product_id'] for item in items])
         
         return jsonify({
             'status': 'success',
@@ -114,23 +147,14 @@ def get_orders():
             query['status'] = status
         
         # Get orders
-        orders = Order.find_many(query, limit=limit, skip=skip)
+        orders = Order.find_many(
+            query, limit=limit, skip=skip, projection=projection(ORDER_SUMMARY_FIELDS)
+        )
         total = Order.count(query)
         
-        orders_list = [
-            {
-                'order_id': str(o['_id']),
-                'items': o.get('items'),
-                'total_price': o.get('total_price'),
-                'status': o.get('status'),
-                'created_at': o.get('created_at').isoformat() if o.get('created_at') else None
-            }
-            for o in orders
-        ]
-        
         return jsonify({
             'status': 'success',
-            'data': orders_list,
+            'data': serialize_many(orders, ORDER_SUMMARY_FIELDS),
             'pagination': {
                 'page': page,
                 'limit': limit,
@@ -165,15 +189,7 @@ def get_order(order_id):
         
         return jsonify({
             'status': 'success',
-            'data': {
-                'order_id': str(order['_id']),
-                'items': order.get('items'),
-                'total_price': order.get('total_price'),
-                'status': order.get('status'),
-                'shipping_address': order.get('shipping_address'),
-                'created_at': order.get('created_at').isoformat() if order.get('created_at') else None,
-                'updated_at': order.get('updated_at').isoformat() if order.get('updated_at') else None
-            }
+            'data': serialize(order, ORDER_DETAIL_FIELDS)
         }), 200
     
     except (NotFoundError, UnauthorizedError) as e:
@@ -238,10 +254,13 @@ def cancel_order(order_id):
         Order.update_status(order_id, 'cancelled')
         
         # Restore product quantities
-        for item in order.get('items', []):
-            product = Product.find_by_id(item['product_id'])
-            new_quantity = product['quantity'] + item['quantity']
-            Product.update(item['product_id'], {'quantity': new_quantity})
+        Product.restock(order.get('items', []))
+        # Cancelled orders no longer count as purchases
+        recommender = loaded('ml.models', 'product_recommender')
+        if recommender is not None:
+            recommender.refresh_ratings(
+                order['buyer_id'], [item['product_id'] for item in order.get('items', [])]
+            )
         
         return jsonify({
             'status': 'success',
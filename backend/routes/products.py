@@ -3,16 +3,77 @@ Product Routes
 Handles product listing, creation, and management
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from flask_jwt_extended import jwt_required
 from utils.decorators import get_identity, role_required
-from models import Product
+from models import Product, User
 from utils.errors import BadRequestError, UnauthorizedError, NotFoundError
+from utils.serialization import serialize, serialize_many, projection
+from utils.http_cache import http_cache, collection_version
+from utils.validators import parse_location
+from services.catalog_watcher import catalog_watcher
+from services.product_search import product_search
+from services.autocomplete import product_suggestions
+from services.product_io import (
+    FORMATS, EXPORT_PROJECTION, detect_format, import_products, export_products
+)
+from bson import ObjectId
+import re
+from datetime import datetime
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.wsgi import get_input_stream
+from config import config
 
 products_bp = Blueprint('products', __name__, url_prefix='/api/products')
 
+# Keep this process's search index and completions in step with writes made by other processes
+catalog_watcher.subscribe(product_search.apply_change)
+catalog_watcher.subscribe(product_suggestions.apply_change)
+
+# Response field maps: output key -> document key
+PRODUCT_SUMMARY_FIELDS = {
+    'product_id': '_id',
+    'name': 'name',
+    'category': 'category',
+    'description': 'description',
+    'price': 'price',
+    'quantity': 'quantity',
+    'rating': 'rating',
+    'image_url': 'image_url'
+}
+
+SEARCH_RESULT_FIELDS = {
+    **PRODUCT_SUMMARY_FIELDS,
+    'score': 'score'
+}
+
+NEARBY_RESULT_FIELDS = {
+    **PRODUCT_SUMMARY_FIELDS,
+    'distance_km': 'distance_km'
+}
+
+# Search matches considered when a search is combined with ?near=
+NEAR_SEARCH_CANDIDATES = 1000
+# Words of a ?near= search matched while the search index is still building
+NEAR_SEARCH_MAX_WORDS = 10
+
+PRODUCT_DETAIL_FIELDS = {
+    **PRODUCT_SUMMARY_FIELDS,
+    'soil_type': 'soil_type',
+    'season': 'season',
+    'quality_grade': 'quality_grade',
+    'review_count': 'review_count'
+}
+
+
+def _product_version(product_id):
+    """ETag token from the updated_at of the document get_product serves (cached or not)"""
+    doc = Product.find_by_id(product_id)
+    return doc['updated_at'].timestamp() if doc and doc.get('updated_at') else None
+
 
 @products_bp.route('/', methods=['GET'])
+@http_cache(max_age=30, stale_while_revalidate=120, version=collection_version('products'))
 def get_products():
     """Get all products with pagination and filters"""
     try:
@@ -20,6 +81,7 @@ def get_products():
         limit = request.args.get('limit', 20, type=int)
         category = request.args.get('category', None)
         search = request.args.get('search', None)
+        near = request.args.get('near', None)
         
         skip = (page - 1) * limit
         
@@ -29,31 +91,136 @@ def get_products():
         if category and category in Product.CATEGORIES:
             query['category'] = category
         
-        if search:
-            query['$text'] = {'$search': search}
+        result_fields = PRODUCT_SUMMARY_FIELDS
+        if near:
+            point, radius_km = _parse_near(near, request.args.get('radius', None))
+            if search and product_search.is_ready():
+                # Nearest first among the best text matches
+                ranked, _, _ = product_search.search(
+                    search, limit=NEAR_SEARCH_CANDIDATES, category=query.get('category')
+                )
+                query['_id'] = {'$in': [ObjectId(product_id) for product_id, _ in ranked]}
+            elif search:
+                # Index still building; $geoNear cannot take $text, so match the words instead
+                product_search.build_async()
+                query.update(_word_match(search))
+            products, total = Product.find_near(
+                point, radius_km * 1000, query=query, skip=skip, limit=limit,
+                projection=projection(PRODUCT_SUMMARY_FIELDS)
+            )
+            result_fields = NEARBY_RESULT_FIELDS
+        elif search and product_search.is_ready():
+            # Relevance-ranked with typo tolerance, from the in-process index
+            ranked, total, _ = product_search.search(
+                search, limit=limit, offset=skip, category=query.get('category')
+            )
+            products = _hydrate_ranked(ranked)
+        elif search:
+            # Index still building in the background; Mongo text search meanwhile
+            product_search.build_async()
+            products, total = _text_search(query, search, limit, skip)
+        else:
+            products = Product.find_many(
+                query, limit=limit, skip=skip, projection=projection(PRODUCT_SUMMARY_FIELDS)
+            )
+            total = Product.count(query)
         
-        # Get products
-        products = Product.find_many(query, limit=limit, skip=skip)
-        total = Product.count(query)
-        
-        # Format response
-        products_list = [
-            {
-                'product_id': str(p['_id']),
-                'name': p.get('name'),
-                'category': p.get('category'),
-                'description': p.get('description'),
-                'price': p.get('price'),
-                'quantity': p.get('quantity'),
-                'rating': p.get('rating'),
-                'image_url': p.get('image_url')
+        return jsonify({
+            'status': 'success',
+            'data': serialize_many(products, result_fields),
+            'pagination': {
+                'page': page,
+                'limit': limit,
+                'total': total,
+                'pages': (total + limit - 1) // limit
             }
-            for p in products
-        ]
+        }), 200
+    
+    except BadRequestError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+
+def _parse_near(near, radius):
+    """GeoJSON point and radius in km from the near=lat,lng and radius= query parameters"""
+    try:
+        point = parse_location(near)
+    except ValueError as e:
+        raise BadRequestError(str(e))
+    try:
+        radius_km = float(radius) if radius is not None else config.NEARBY_DEFAULT_RADIUS_KM
+    except ValueError:
+        raise BadRequestError("radius must be a number of kilometres")
+    if not 0 < radius_km <= config.NEARBY_MAX_RADIUS_KM:
+        raise BadRequestError(f"radius must be between 0 and {config.NEARBY_MAX_RADIUS_KM:g} km")
+    return point, radius_km
+
+
+def _hydrate_ranked(ranked):
+    """Active product documents for ranked (product_id, score) pairs, in rank order"""
+    # Not from the cache: the response's ETag is the products collection version
+    by_id = Product.find_by_ids([product_id for product_id, _ in ranked], cached=False)
+    return [
+        {**by_id[product_id], 'score': round(score, 4)}
+        for product_id, score in ranked
+        if product_id in by_id and by_id[product_id].get('is_active', True)
+    ]
+
+
+def _word_match(search):
+    """Filter for products whose name or description contains any word of search"""
+    words = [re.escape(word) for word in search.split()[:NEAR_SEARCH_MAX_WORDS]]
+    pattern = {'$regex': '|'.join(words) or '^', '$options': 'i'}
+    return {'$or': [{'name': pattern}, {'description': pattern}]}
+
+
+def _text_search(query, search, limit, skip):
+    """Mongo text-index search, used while the in-process index is still building"""
+    query = {**query, '$text': {'$search': search}}
+    fields = {**projection(PRODUCT_SUMMARY_FIELDS), 'score': {'$meta': 'textScore'}}
+    products = Product.find_many(
+        query, limit=limit, skip=skip, projection=fields,
+        sort=[('score', {'$meta': 'textScore'})]
+    )
+    return products, Product.count(query)
+
+
+@products_bp.route('/search', methods=['GET'])
+@http_cache(max_age=30, stale_while_revalidate=120, version=collection_version('products'))
+def search_products():
+    """Relevance-ranked product search with prefix matching and typo tolerance"""
+    try:
+        q = request.args.get('q', '')
+        page = request.args.get('page', 1, type=int)
+        limit = request.args.get('limit', 20, type=int)
+        category = request.args.get('category', None)
+        
+        if not q.strip():
+            raise BadRequestError("Query parameter 'q' is required")
+        if len(q) > 200:
+            raise BadRequestError("Query too long (max 200 characters)")
+        if page < 1 or not 1 <= limit <= 100:
+            raise BadRequestError("page must be >= 1 and limit between 1 and 100")
+        
+        if product_search.is_ready():
+            ranked, total, corrections = product_search.search(
+                q, limit=limit, offset=(page - 1) * limit, category=category
+            )
+            products = _hydrate_ranked(ranked)
+        else:
+            # Never build the index on a request; Mongo text search until the background build lands
+            product_search.build_async()
+            query = {'is_active': True}
+            if category:
+                query['category'] = category
+            products, total = _text_search(query, q, limit, (page - 1) * limit)
+            corrections = {}
         
         return jsonify({
             'status': 'success',
-            'data': products_list,
+            'data': serialize_many(products, SEARCH_RESULT_FIELDS),
+            'corrections': corrections,
             'pagination': {
                 'page': page,
                 'limit': limit,
@@ -62,11 +229,66 @@ def get_products():
             }
         }), 200
     
+    except BadRequestError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+
+@products_bp.route('/farmers/nearby', methods=['GET'])
+def get_nearby_farmers():
+    """Farmers within radius km of near=lat,lng, nearest first (distances only, never coordinates)"""
+    try:
+        limit = request.args.get('limit', 20, type=int)
+        if not 1 <= limit <= 100:
+            raise BadRequestError("limit must be between 1 and 100")
+        point, radius_km = _parse_near(request.args.get('near', ''), request.args.get('radius', None))
+        
+        farmers, total = User.find_near(
+            point, radius_km * 1000, query={'role': 'farmer', 'is_active': True},
+            limit=limit, projection={'name': 1}
+        )
+        
+        return jsonify({
+            'status': 'success',
+            'data': serialize_many(farmers, {'farmer_id': '_id', 'name': 'name', 'distance_km': 'distance_km'}),
+            'total': total
+        }), 200
+    
+    except BadRequestError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+
+@products_bp.route('/suggest', methods=['GET'])
+@http_cache(max_age=60, stale_while_revalidate=300)
+def suggest_products():
+    """Typeahead completions of product names, most popular first"""
+    try:
+        q = request.args.get('q', '')
+        limit = request.args.get('limit', 8, type=int)
+        
+        if len(q) > 100:
+            raise BadRequestError("Query too long (max 100 characters)")
+        if not 1 <= limit <= 20:
+            raise BadRequestError("limit must be between 1 and 20")
+        
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'suggestions': product_suggestions.suggest(q, limit)
+            }
+        }), 200
+    
+    except BadRequestError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 
 @products_bp.route('/<product_id>', methods=['GET'])
+@http_cache(max_age=30, stale_while_revalidate=120, version=_product_version)
 def get_product(product_id):
     """Get single product details"""
     try:
@@ -77,20 +299,7 @@ def get_product(product_id):
         
         return jsonify({
             'status': 'success',
-            'data': {
-                'product_id': str(product['_id']),
-                'name': product.get('name'),
-                'category': product.get('category'),
-                'description': product.get('description'),
-                'price': product.get('price'),
-                'quantity': product.get('quantity'),
-                'soil_type': product.get('soil_type'),
-                'season': product.get('season'),
-                'quality_grade': product.get('quality_grade'),
-                'rating': product.get('rating'),
-                'review_count': product.get('review_count'),
-                'image_url': product.get('image_url')
-            }
+            'data': serialize(product, PRODUCT_DETAIL_FIELDS)
         }), 200
     
     except NotFoundError as e:
@@ -110,29 +319,14 @@ def create_product():
         data = request.get_json()
         
         # Validation
-        required_fields = ['name', 'category', 'description', 'price', 'quantity']
-        if not all(field in data for field in required_fields):
-            raise BadRequestError(f"Missing required fields: {required_fields}")
-        
-        if data['category'] not in Product.CATEGORIES:
-            raise BadRequestError(f"Invalid category. Must be one of {Product.CATEGORIES}")
-        
-        if data['price'] <= 0 or data['quantity'] < 0:
-            raise BadRequestError("Price must be positive and quantity must be non-negative")
+        try:
+            fields = Product.clean_fields(data)
+        except ValueError as e:
+            raise BadRequestError(str(e))
         
         # Create product
-        product_id = Product.create_product(
-            farmer_id=farmer_id,
-            name=data['name'],
-            category=data['category'],
-            description=data['description'],
-            price=data['price'],
-            quantity=data['quantity'],
-            soil_type=data.get('soil_type'),
-            season=data.get('season'),
-            quality_grade=data.get('quality_grade'),
-            image_url=data.get('image_url')
-        )
+        product_id = Product.create_product(farmer_id=farmer_id, **fields)
+        product_search.refresh_product(product_id)
         
         return jsonify({
             'status': 'success',
@@ -148,6 +342,78 @@ def create_product():
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 
+@products_bp.route('/import', methods=['POST'])
+@jwt_required()
+@role_required(['farmer'])
+def bulk_import():
+    """Create listings from a CSV or NDJSON request body, streamed row by row"""
+    try:
+        identity = get_identity()
+        fmt = detect_format(request.args.get('format'), request.content_type)
+        
+        # Read the raw body ourselves: MAX_CONTENT_LENGTH is sized for JSON requests
+        stream = get_input_stream(request.environ, max_content_length=config.PRODUCT_IMPORT_MAX_BYTES)
+        report = import_products(
+            stream, fmt, identity.get('user_id'),
+            chunk_size=config.PRODUCT_IMPORT_CHUNK_SIZE, on_inserted=_index_imported
+        )
+        
+        return jsonify({
+            'status': 'error' if report.aborted else 'success',
+            'message': report.aborted or f'{report.inserted} of {report.rows} products imported',
+            'data': report.as_dict()
+        }), 400 if report.aborted else 200
+    
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except RequestEntityTooLarge:
+        return jsonify({
+            'status': 'error',
+            'message': f'File too large (max {config.PRODUCT_IMPORT_MAX_BYTES // (1024 * 1024)} MB)'
+        }), 413
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+
+def _index_imported(documents):
+    """Make a chunk of imported products searchable in this process right away"""
+    for doc in documents:
+        product_search.apply_change(str(doc['_id']), 'insert', doc)
+        product_suggestions.apply_change(str(doc['_id']), 'insert', doc)
+
+
+@products_bp.route('/export', methods=['GET'])
+@jwt_required()
+@role_required(['farmer', 'admin'])
+def bulk_export():
+    """Stream the caller's active listings (any farmer's, or all, for admins) as CSV or NDJSON"""
+    try:
+        identity = get_identity()
+        fmt = detect_format(request.args.get('format', 'csv'))
+        
+        query = {'is_active': True}
+        farmer_id = identity.get('user_id')
+        if identity.get('role') == 'admin':
+            farmer_id = request.args.get('farmer_id')
+        if farmer_id:
+            if not ObjectId.is_valid(farmer_id):
+                raise BadRequestError("Invalid farmer_id")
+            query['farmer_id'] = ObjectId(farmer_id)
+        
+        # Rows are written as the cursor yields them; nothing is collected in memory
+        cursor = Product.get_analytics_collection().find(query, EXPORT_PROJECTION, batch_size=1000)
+        response = Response(stream_with_context(export_products(cursor, fmt)), mimetype=FORMATS[fmt])
+        response.headers['Content-Disposition'] = (
+            f'attachment; filename="products-{datetime.utcnow():%Y%m%d}.{fmt}"'
+        )
+        return response
+    
+    except (BadRequestError, ValueError) as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+
 @products_bp.route('/<product_id>', methods=['PUT'])
 @jwt_required()
 @role_required(['farmer'])
@@ -172,10 +438,20 @@ def update_product(product_id):
         allowed_fields = ['name', 'description', 'price', 'quantity', 'soil_type', 'season', 'quality_grade', 'image_url']
         update_data = {field: data[field] for field in allowed_fields if field in data}
         
+        # A null location puts the product back at the farm
+        if 'location' in data:
+            try:
+                location = parse_location(data['location']) if data['location'] else None
+            except ValueError as e:
+                raise BadRequestError(str(e))
+            update_data['location'] = location or Product.farm_location(product['farmer_id'])
+            update_data['location_inherited'] = location is None
+        
         if not update_data:
             raise BadRequestError("No valid fields to update")
         
         Product.update(product_id, update_data)
+        product_search.refresh_product(product_id)
         
         return jsonify({
             'status': 'success',
@@ -209,6 +485,7 @@ def delete_product(product_id):
         
         # Soft delete (mark as inactive)
         Product.update(product_id, {'is_active': False})
+        product_search.refresh_product(product_id)
         
         return jsonify({
             'status': 'success',
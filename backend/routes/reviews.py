@@ -9,10 +9,23 @@ from models import Review, Order, Product
 from bson import ObjectId
 from utils.errors import BadRequestError, UnauthorizedError, NotFoundError
 from utils.decorators import role_required, get_identity
+from utils.serialization import serialize_many, projection
+from utils.http_cache import http_cache, collection_version
+from utils.startup import loaded
 from datetime import datetime
 
 reviews_bp = Blueprint('reviews', __name__, url_prefix='/api/reviews')
 
+# Response field map: output key -> document key
+REVIEW_FIELDS = {
+    'review_id': '_id',
+    'product_id': 'product_id',
+    'rating': 'rating',
+    'comment': 'comment',
+    'user_name': 'user_name',
+    'created_at': 'created_at'
+}
+
 
 @reviews_bp.route('/', methods=['POST'])
 @jwt_required()
@@ -40,7 +53,7 @@ def create_review():
             buyer_obj = ObjectId(user_id)
         except Exception:
             buyer_obj = user_id
-
+        
         order = Order.find_one({'buyer_id': buyer_obj, 'items.product_id': product_id})
         if not order:
             raise UnauthorizedError("You can only review products you have purchased")
@@ -55,13 +68,18 @@ def create_review():
             prod_obj = ObjectId(product_id)
         except Exception:
             prod_obj = product_id
-
+        
         reviews = Review.find_many({'product_id': prod_obj})
         avg_rating = sum(r.get('rating', 0) for r in reviews) / len(reviews) if reviews else 0
         Product.update(product_id, {
             'rating': round(avg_rating, 1),
             'review_count': len(reviews)
         })
+        # Averaged with any earlier reviews of the product, as a full rebuild does. Only
+        # workers serving recommendations hold a matrix; the rest never import the ML stack
+        recommender = loaded('ml.models', 'product_recommender')
+        if recommender is not None:
+            recommender.refresh_ratings(user_id, [product_id])
         
         return jsonify({
             'status': 'success',
@@ -77,6 +95,7 @@ def create_review():
 
 
 @reviews_bp.route('/', methods=['GET'])
+@http_cache(max_age=60, stale_while_revalidate=300, version=collection_version('reviews'))
 def get_reviews():
     """Get reviews for a product"""
     try:
@@ -88,24 +107,14 @@ def get_reviews():
             raise BadRequestError("Product ID is required")
         
         skip = (page - 1) * limit
-        reviews = Review.find_many({'product_id': product_id}, limit=limit, skip=skip)
-        total = Review.count({'product_id': product_id})
-        
-        reviews_list = [
-            {
-                'review_id': str(r['_id']),
-                'product_id': str(r.get('product_id')) if r.get('product_id') else None,
-                'rating': r.get('rating'),
-                'comment': r.get('comment'),
-                'user_name': r.get('user_name'),
-                'created_at': r.get('created_at')
-            }
-            for r in reviews
-        ]
+        # Reviews store product_id as an ObjectId
+        query = {'product_id': ObjectId(product_id) if ObjectId.is_valid(product_id) else product_id}
+        reviews = Review.find_many(query, limit=limit, skip=skip, projection=projection(REVIEW_FIELDS))
+        total = Review.count(query)
         
         return jsonify({
             'status': 'success',
-            'data': reviews_list,
+            'data': serialize_many(reviews, REVIEW_FIELDS),
             'pagination': {
                 'page': page,
                 'limit': limit,
@@ -160,6 +169,9 @@ def update_review(review_id):
                 'rating': round(avg_rating, 1),
                 'review_count': len(reviews)
             })
+            recommender = loaded('ml.models', 'product_recommender')
+            if 'rating' in update_data and recommender is not None:
+                recommender.refresh_ratings(user_id, [product_id])
         
         return jsonify({
             'status': 'success',
@@ -202,6 +214,9 @@ def delete_review(review_id):
             'rating': round(avg_rating, 1) if avg_rating > 0 else 0,
             'review_count': len(reviews)
         })
+        recommender = loaded('ml.models', 'product_recommender')
+        if recommender is not None:
+            recommender.remove_rating(user_id, product_id)
         
         return jsonify({
             'status': 'success',
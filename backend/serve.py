@@ -0,0 +1,23 @@
+"""
+Waitress Server
+Multi-threaded single-process server, for Windows hosts where gunicorn is unavailable
+Run with: python serve.py
+"""
+
+from waitress import serve
+from config import config
+from wsgi import app
+from automation import automation_manager
+
+
+if __name__ == '__main__':
+    # Single process, so it is always the designated scheduler process
+    if config.SCHEDULER_ENABLED:
+        automation_manager.start()
+    
+    print(f"[START] Waitress serving on http://{config.SERVER_HOST}:{config.SERVER_PORT} "
+          f"with {config.WEB_THREADS} threads")
+    try:
+        serve(app, host=config.SERVER_HOST, port=config.SERVER_PORT, threads=config.WEB_THREADS)
+    finally:
+        automation_manager.stop()
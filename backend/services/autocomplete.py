@@ -0,0 +1,238 @@
+"""
+Autocomplete
+Popularity-ranked typeahead completions for the product search box and the
+chatbot question box, answered from process memory
+"""
+
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+from functools import partial
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_SPACE_RE = re.compile(r'\s+')
+
+# Longer questions are rarely asked twice word for word, so they are not counted
+MAX_QUESTION_LENGTH = 200
+
+
+def normalize(text):
+    """Case-folded text with whitespace runs collapsed"""
+    return _SPACE_RE.sub(' ', text.casefold()).strip()
+
+
+def question_key(text):
+    """Key under which repeats of a question are counted ('How to grow potatoes?' == 'how to grow potatoes')"""
+    return normalize(text).rstrip('?!. ')
+
+
+class PrefixIndex:
+    """Immutable completion index: a trie flattened into a sorted key array.
+    
+    Entries are numbered by rank (weight, then shorter text), so the best
+    completions of a prefix are the smallest entry ids in the contiguous
+    run of keys that start with it. With match_words, every word of an
+    entry also starts a key, so 'tom' completes 'Organic Tomato'.
+    """
+    
+    MAX_LIMIT = 20
+    # Prefixes matching more keys than this have their top MAX_LIMIT memoized
+    CACHE_MIN_MATCHES = 256
+    
+    def __init__(self, entries, match_words=False):
+        merged = {}
+        for text, weight in entries:
+            text = _SPACE_RE.sub(' ', text or '').strip()
+            key = question_key(text)
+            if not key:
+                continue
+            total, best_weight, display = merged.get(key, (0.0, None, text))
+            if best_weight is None or weight > best_weight:
+                best_weight, display = weight, text
+            merged[key] = (total + weight, best_weight, display)
+        
+        ranked = sorted(merged.values(), key=lambda e: (-e[0], len(e[2]), e[2]))
+        self.texts = [display for _, _, display in ranked]
+        self.weights = [total for total, _, _ in ranked]
+        
+        keys = []
+        for entry, text in enumerate(self.texts):
+            key = normalize(text)
+            keys.append((key, entry))
+            if match_words:
+                keys.extend((key[i + 1:], entry) for i, char in enumerate(key) if char == ' ')
+        keys.sort()
+        self._keys = [key for key, _ in keys]
+        self._entries = np.fromiter((entry for _, entry in keys), dtype=np.int32, count=len(keys))
+        self._cache = {}
+    
+    def __len__(self):
+        return len(self.texts)
+    
+    def complete(self, prefix, limit=10):
+        """Up to limit (text, weight) completions of prefix, most popular first"""
+        key = normalize(prefix)
+        # 'tomato ' should not complete to 'tomatoes'
+        if key and prefix[-1:].isspace():
+            key += ' '
+        lo = bisect_left(self._keys, key)
+        hi = bisect_left(self._keys, key + '\uffff', lo)
+        if hi - lo > self.CACHE_MIN_MATCHES:
+            top = self._cache.get(key)
+            if top is None:
+                top = self._cache[key] = self._top(lo, hi, self.MAX_LIMIT)
+            return top[:limit]
+        return self._top(lo, hi, limit)
+    
+    def _top(self, lo, hi, limit):
+        entries = np.unique(self._entries[lo:hi])[:limit]
+        return [(self.texts[entry], self.weights[entry]) for entry in entries.tolist()]
+    
+    def contains(self, text):
+        key = normalize(text)
+        i = bisect_left(self._keys, key)
+        return i < len(self._keys) and self._keys[i] == key
+
+
+class SuggestionIndex:
+    """
+    Shared completions for one input box.
+    - loader() yields (text, weight) pairs; weights add up for repeated texts
+    - rebuilt in a background thread every refresh_seconds, or sooner once
+      marked stale, but never more often than min_rebuild_seconds
+    - readers keep using the previous PrefixIndex while a rebuild runs
+    """
+    
+    def __init__(self, name, loader, match_words=False, refresh_seconds=600, min_rebuild_seconds=30):
+        self.name = name
+        self.loader = loader
+        self.match_words = match_words
+        self.refresh_seconds = refresh_seconds
+        self.min_rebuild_seconds = min_rebuild_seconds
+        self.built_at = None
+        self.build_seconds = None
+        self._index = None
+        self._stale = False
+        self._last_attempt = None
+        self._build_lock = threading.Lock()
+    
+    @classmethod
+    def from_config(cls, config, name, loader, **kwargs):
+        return cls(
+            name, loader,
+            refresh_seconds=config.AUTOCOMPLETE_REFRESH_SECONDS,
+            min_rebuild_seconds=config.AUTOCOMPLETE_MIN_REBUILD_SECONDS,
+            **kwargs
+        )
+    
+    def is_ready(self):
+        return self._index is not None
+    
+    def build(self, entries=None):
+        """Load the entries (or use the given ones) and swap in a new index"""
+        with self._build_lock:
+            self._last_attempt = time.monotonic()
+            # Cleared first so changes made while loading mark the new index stale
+            self._stale = False
+            start = time.perf_counter()
+            index = PrefixIndex(self.loader() if entries is None else entries, self.match_words)
+            self._index = index
+            self.built_at = datetime.utcnow()
+            self.build_seconds = round(time.perf_counter() - start, 3)
+        logger.info(f"[OK] {self.name} suggestions built: {len(index)} completions in {self.build_seconds}s")
+        return len(index)
+    
+    def build_async(self):
+        """Rebuild in a background thread unless one is already running"""
+        if self._build_lock.locked():
+            return
+        threading.Thread(target=self._build_quietly, name=f'{self.name}-suggestions-build', daemon=True).start()
+    
+    def _build_quietly(self):
+        try:
+            self.build()
+        except Exception as e:
+            logger.error(f"{self.name} suggestions build failed: {str(e)}")
+    
+    def _needs_build(self):
+        if self._last_attempt is None:
+            return True
+        age = time.monotonic() - self._last_attempt
+        if age < self.min_rebuild_seconds:
+            return False
+        return self._index is None or self._stale or age >= self.refresh_seconds
+    
+    def suggest(self, prefix, limit=10):
+        """Completions of prefix; empty until the first build has finished"""
+        if self._needs_build():
+            self.build_async()
+        index = self._index
+        if index is None:
+            return []
+        return [text for text, _ in index.complete(prefix, limit)]
+    
+    def apply_change(self, item_id, operation, document):
+        """catalog_watcher subscriber: rebuild soon unless the change keeps a known name"""
+        index = self._index
+        text = (document or {}).get('name')
+        if operation != 'delete' and text and index is not None and index.contains(text):
+            return
+        self._stale = True
+    
+    def get_stats(self):
+        index = self._index
+        return {
+            'ready': index is not None,
+            'completions': len(index) if index is not None else 0,
+            'stale': self._stale,
+            'built_at': self.built_at.isoformat() if self.built_at else None,
+            'build_seconds': self.build_seconds
+        }
+
+
+def _product_entries():
+    """Active product names weighted by popularity; every listing counts at least 1"""
+    from ml.popularity import popularity_index
+    for _, score, product in popularity_index.scores():
+        yield product.get('name'), 1.0 + score
+
+
+def _question_entries(min_count, limit=5000):
+    """Suggested questions plus questions asked at least min_count times"""
+    from models import ChatQuery
+    from services.chatbot_service import SUGGESTED_QUESTIONS
+    for question in SUGGESTED_QUESTIONS:
+        yield question, min_count
+    for row in ChatQuery.most_asked(min_count=min_count, limit=limit):
+        yield row['text'], row['count']
+
+
+def record_question(question):
+    """Count an asked chatbot question towards the question completions"""
+    key = question_key(question)
+    if not key or len(question) > MAX_QUESTION_LENGTH:
+        return
+    from models import ChatQuery
+    try:
+        ChatQuery.record(key, _SPACE_RE.sub(' ', question).strip())
+    except Exception as e:
+        # Never fail the answer over its bookkeeping
+        logger.warning(f"[WARN] Could not record chatbot question: {str(e)}")
+
+
+def _create_suggestion_indexes():
+    from config import config
+    products = SuggestionIndex.from_config(config, 'products', _product_entries, match_words=True)
+    questions = SuggestionIndex.from_config(
+        config, 'questions', partial(_question_entries, config.AUTOCOMPLETE_MIN_QUESTION_COUNT)
+    )
+    return products, questions
+
+
+# Shared per-process indexes; built on first use or by warm_up()
+product_suggestions, question_suggestions = _create_suggestion_indexes()
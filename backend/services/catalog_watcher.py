@@ -0,0 +1,166 @@
+"""
+Catalogue Watcher
+Invalidates the process-local Product cache when products change in any process
+"""
+
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogWatcher:
+    """
+    Background thread following product changes.
+    - MongoDB change stream when the deployment supports it (replica set / Atlas)
+    - otherwise polls for products with a newer updated_at
+    - notifies subscribers with (product_id, operation, document or None)
+    
+    Deletes are only seen through change streams; when polling, the cache
+    TTL bounds how long a deleted product can still be served.
+    """
+    
+    OPERATIONS = ('insert', 'update', 'replace', 'delete')
+    # Re-scan this far back each poll to tolerate clock skew between app hosts
+    POLL_OVERLAP = timedelta(seconds=10)
+    
+    def __init__(self, poll_interval=5.0, enabled=True):
+        self.poll_interval = poll_interval
+        self.enabled = enabled
+        self.mode = None
+        self._subscribers = []
+        self._thread = None
+        self._pid = None
+        self._resume_token = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+    
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            poll_interval=config.CATALOG_POLL_INTERVAL,
+            enabled=config.CATALOG_WATCH_ENABLED
+        )
+    
+    def subscribe(self, callback):
+        """Call callback(product_id, operation, document) for each product change"""
+        self._subscribers.append(callback)
+    
+    def ensure_running(self):
+        """Start the watcher in this process if it is not running.
+        
+        Cheap enough to call per request; it also restarts the thread in
+        workers forked from a preloaded master, where it does not survive.
+        """
+        if not self.enabled:
+            return
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='catalog-watcher', daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+    
+    def _run(self):
+        from models import Product
+        
+        while not self._stop.is_set():
+            try:
+                self._watch_change_stream(Product)
+            except OperationFailure as e:
+                # Standalone servers don't support change streams
+                logger.info(f"Change streams unavailable ({e.code}); polling products every {self.poll_interval}s")
+                self._poll(Product)
+            except PyMongoError as e:
+                logger.warning(f"Catalogue change stream interrupted: {str(e)}")
+                self._stop.wait(self.poll_interval)
+            except Exception as e:
+                logger.error(f"Catalogue watcher failed: {str(e)}")
+                self._stop.wait(self.poll_interval)
+    
+    def _watch_change_stream(self, Product):
+        pipeline = [{'$match': {'operationType': {'$in': list(self.OPERATIONS)}}}]
+        with Product.get_collection().watch(
+            pipeline, full_document='updateLookup', resume_after=self._resume_token
+        ) as stream:
+            self.mode = 'change_stream'
+            if self._resume_token is None:
+                # Without a resume point, entries cached so far may have missed changes
+                Product.cache.clear()
+            while not self._stop.is_set():
+                change = stream.try_next()
+                self._resume_token = stream.resume_token
+                if change is None:
+                    continue
+                self._dispatch(
+                    Product,
+                    change['documentKey']['_id'],
+                    change['operationType'],
+                    change.get('fullDocument')
+                )
+    
+    def _poll(self, Product):
+        self.mode = 'polling'
+        last_seen = datetime.utcnow()
+        dispatched = {}
+        while not self._stop.wait(self.poll_interval):
+            try:
+                last_seen = self._poll_once(Product, last_seen, dispatched)
+            except PyMongoError as e:
+                logger.warning(f"Catalogue poll failed: {str(e)}")
+    
+    def _poll_once(self, Product, last_seen, dispatched):
+        """Dispatch products changed since last_seen - POLL_OVERLAP; returns the new last_seen.
+        
+        dispatched maps product _id to the updated_at already dispatched, so
+        changes re-read inside the overlap window are not dispatched again.
+        """
+        since = last_seen - self.POLL_OVERLAP
+        changed = Product.get_collection().find({'updated_at': {'$gt': since}}).sort('updated_at', 1)
+        for doc in changed:
+            last_seen = max(last_seen, doc['updated_at'])
+            if dispatched.get(doc['_id']) == doc['updated_at']:
+                continue
+            dispatched[doc['_id']] = doc['updated_at']
+            self._dispatch(Product, doc['_id'], 'update', doc)
+        
+        # Entries older than the next window can no longer be re-read
+        since = last_seen - self.POLL_OVERLAP
+        for product_id in [pid for pid, updated_at in dispatched.items() if updated_at <= since]:
+            del dispatched[product_id]
+        return last_seen
+    
+    def _dispatch(self, Product, product_id, operation, document):
+        Product.invalidate(product_id)
+        for callback in self._subscribers:
+            try:
+                callback(str(product_id), operation, document)
+            except Exception as e:
+                logger.error(f"Catalogue subscriber failed: {str(e)}")
+    
+    def get_status(self):
+        from models import Product
+        return {
+            'enabled': self.enabled,
+            'running': self._thread is not None and self._thread.is_alive() and self._pid == os.getpid(),
+            'mode': self.mode,
+            'cache': Product.cache.stats()
+        }
+
+
+def _create_catalog_watcher():
+    from config import config
+    return CatalogWatcher.from_config(config)
+
+
+# Shared watcher; started per process by ensure_running()
+catalog_watcher = _create_catalog_watcher()
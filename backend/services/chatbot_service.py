@@ -4,12 +4,26 @@ Manages internal KB, embeddings, retrieval, and answer generation
 """
 
 import logging
+import threading
 from typing import List, Dict, Optional
 from services.vector_store import VectorStore
 from services.gemini_client import GeminiClient
+from utils.metrics import timed
 
 logger = logging.getLogger(__name__)
 
+# Shown before the user types, and seeds for question autocomplete
+SUGGESTED_QUESTIONS = [
+    "Which fertilizer is best for tomatoes?",
+    "How do I grow cucumber?",
+    "What is the best irrigation method for wheat?",
+    "How can I prevent pests on rice?",
+    "When should I harvest onions?",
+    "What fertilizer for cotton?",
+    "How to grow potatoes?",
+    "When to plant wheat?"
+]
+
 
 class ChatbotService:
     """
@@ -21,11 +35,17 @@ class ChatbotService:
     
     def __init__(self):
         self.vector_store = VectorStore()
-        self.gemini_client = GeminiClient()
+        self.gemini_client = None
         self.kb_initialized = False
-        
-        # Initialize KB on startup
-        self._init_knowledge_base()
+        self._lock = threading.Lock()
+    
+    def load(self):
+        """Build the KB and Gemini client on first query (or warm_up), not at import"""
+        with self._lock:
+            if self.kb_initialized:
+                return
+            self.gemini_client = GeminiClient()
+            self._init_knowledge_base()
     
     def _init_knowledge_base(self):
         """Build and load internal agriculture knowledge base"""
@@ -209,6 +229,7 @@ class ChatbotService:
             }
         """
         try:
+            self.load()
             question_clean = question.strip()
             if not question_clean:
                 return {
@@ -218,7 +239,8 @@ class ChatbotService:
                 }
             
             # Retrieve relevant documents
-            retrieved = self.vector_store.search(question_clean, k=3)
+            with timed('chatbot.retrieval'):
+                retrieved = self.vector_store.search(question_clean, k=3)
             
             if not retrieved:
                 return {
@@ -242,7 +264,8 @@ class ChatbotService:
             
             # Generate answer using Gemini (or fallback)
             if self.gemini_client.is_available():
-                answer = self.gemini_client.generate_answer(question_clean, context)
+                with timed('chatbot.generation'):
+                    answer = self.gemini_client.generate_answer(question_clean, context)
             else:
                 # Fallback: return context directly
                 answer = f"Based on available information:\n\n{context}"
@@ -265,7 +288,7 @@ class ChatbotService:
         """Return KB and system stats"""
         return {
             'total_documents': len(self.vector_store.documents),
-            'gemini_available': self.gemini_client.is_available(),
+            'gemini_available': self.gemini_client is not None and self.gemini_client.is_available(),
             'vector_store_ready': self.kb_initialized,
             'status': 'healthy' if self.kb_initialized else 'initializing'
         }
@@ -9,12 +9,15 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-try:
-    import google.generativeai as genai
-    HAS_GEMINI = True
-except ImportError:
-    HAS_GEMINI = False
-    logger.warning('google.generativeai not installed; Gemini client unavailable')
+
+def _import_genai():
+    """google.generativeai, imported only once a client is configured (it loads grpc), or None"""
+    try:
+        import google.generativeai as genai
+        return genai
+    except ImportError:
+        logger.warning('google.generativeai not installed; Gemini client unavailable')
+        return None
 
 
 class GeminiClient:
@@ -47,8 +50,8 @@ Remember: Your credibility depends on staying within the provided context."""
             logger.warning('GOOGLE_API_KEY not set; Gemini API will not be available')
             return
         
-        if not HAS_GEMINI:
-            logger.warning('google.generativeai package not installed')
+        genai = _import_genai()
+        if genai is None:
             return
         
         try:
@@ -0,0 +1,216 @@
+"""
+Password Hashing Service
+Runs bcrypt/scrypt on a bounded worker pool so slow hashes don't block request threads
+"""
+
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+try:
+    import bcrypt
+    HAS_BCRYPT = True
+except ImportError:
+    HAS_BCRYPT = False
+
+logger = logging.getLogger(__name__)
+
+_LEGACY_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+
+class PasswordHasherBusyError(Exception):
+    """Raised when the hashing pool is full or a hash does not finish in time"""
+
+
+class PasswordHasher:
+    """
+    Password hashing on a bounded thread pool.
+    - bcrypt (default) or scrypt with configurable cost
+    - verifies legacy unsalted SHA-256 hashes and flags them for upgrade
+    - records queue wait and hashing latency
+    
+    Both bcrypt and hashlib.scrypt release the GIL while hashing, so a
+    small thread pool caps hashing CPU at `workers` cores while the rest
+    of the API keeps serving.
+    """
+    
+    SCHEMES = ('bcrypt', 'scrypt')
+    # Default bound on queued + running jobs: one running and one waiting per worker
+    PENDING_PER_WORKER = 2
+    
+    def __init__(self, scheme='bcrypt', bcrypt_rounds=12, scrypt_n=2 ** 14, scrypt_r=8, scrypt_p=1,
+                 workers=2, max_pending=None, timeout=10.0):
+        if scheme not in self.SCHEMES:
+            raise ValueError(f"Invalid hashing scheme. Must be one of {self.SCHEMES}")
+        if scheme == 'bcrypt' and not HAS_BCRYPT:
+            logger.warning('bcrypt not installed; falling back to scrypt password hashing')
+            scheme = 'scrypt'
+        
+        self.scheme = scheme
+        self.bcrypt_rounds = bcrypt_rounds
+        self.scrypt_params = (scrypt_n, scrypt_r, scrypt_p)
+        self.workers = workers
+        self.max_pending = max_pending or workers * self.PENDING_PER_WORKER
+        self.timeout = timeout
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        # Bounds queued + running jobs; callers beyond it are rejected at once instead of
+        # holding a request thread while they wait for a slot
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._metrics_lock = threading.Lock()
+        self._metrics = {}
+    
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            scheme=config.PASSWORD_HASH_SCHEME,
+            bcrypt_rounds=config.PASSWORD_BCRYPT_ROUNDS,
+            scrypt_n=config.PASSWORD_SCRYPT_N,
+            workers=config.PASSWORD_HASH_WORKERS,
+            max_pending=config.PASSWORD_HASH_MAX_PENDING,
+            timeout=config.PASSWORD_HASH_TIMEOUT
+        )
+    
+    def _get_executor(self):
+        # Created lazily so the pool is started after any pre-fork in the server
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix='password-hash'
+                    )
+        return self._executor
+    
+    def _run(self, operation, func, *args):
+        """Run func on the pool and record queue wait and total latency"""
+        if not self._slots.acquire(blocking=False):
+            self._record(operation, None, None, rejected=True)
+            raise PasswordHasherBusyError("Password hashing is overloaded; please retry")
+        
+        submitted = time.perf_counter()
+        started = []
+        
+        def job():
+            started.append(time.perf_counter())
+            return func(*args)
+        
+        try:
+            future = self._get_executor().submit(job)
+        except Exception:
+            self._slots.release()
+            raise
+        # The slot is held until the hash actually finishes, even if we stop waiting
+        future.add_done_callback(lambda _: self._slots.release())
+        
+        # Admission keeps at most PENDING_PER_WORKER hashes ahead of us per worker,
+        # so this only times out if hashing itself stalls
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self._record(operation, None, None, rejected=True)
+            raise PasswordHasherBusyError("Password hashing timed out; please retry")
+        
+        finished = time.perf_counter()
+        queue_wait = (started[0] - submitted) if started else 0.0
+        self._record(operation, finished - submitted, queue_wait)
+        return result
+    
+    def hash(self, password):
+        """Hash a password with the configured scheme"""
+        return self._run('hash', self._hash_sync, password)
+    
+    def verify(self, password, stored_hash):
+        """Check a password; returns (matches, needs_rehash)"""
+        if not stored_hash:
+            return False, False
+        if _LEGACY_SHA256.match(stored_hash):
+            # Cheap enough to check inline; always upgrade on success
+            legacy = hashlib.sha256(password.encode()).hexdigest()
+            return hmac.compare_digest(legacy, stored_hash), True
+        matches = self._run('verify', self._verify_sync, password, stored_hash)
+        return matches, matches and self.needs_rehash(stored_hash)
+    
+    def needs_rehash(self, stored_hash):
+        """True if the hash uses another scheme or a different cost"""
+        if stored_hash.startswith('$2'):
+            if self.scheme != 'bcrypt':
+                return True
+            return stored_hash.split('$')[2] != f'{self.bcrypt_rounds:02d}'
+        if stored_hash.startswith('scrypt$'):
+            if self.scheme != 'scrypt':
+                return True
+            return tuple(int(x) for x in stored_hash.split('$')[1:4]) != self.scrypt_params
+        return True
+    
+    def _hash_sync(self, password):
+        if self.scheme == 'bcrypt':
+            return bcrypt.hashpw(password.encode(), bcrypt.gensalt(self.bcrypt_rounds)).decode()
+        n, r, p = self.scrypt_params
+        salt = os.urandom(16)
+        digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=0, dklen=32)
+        return 'scrypt${}${}${}${}${}'.format(
+            n, r, p, base64.b64encode(salt).decode(), base64.b64encode(digest).decode()
+        )
+    
+    @staticmethod
+    def _verify_sync(password, stored_hash):
+        if stored_hash.startswith('$2'):
+            if not HAS_BCRYPT:
+                raise RuntimeError('bcrypt is required to verify this password hash')
+            return bcrypt.checkpw(password.encode(), stored_hash.encode())
+        if stored_hash.startswith('scrypt$'):
+            _, n, r, p, salt, digest = stored_hash.split('$')
+            candidate = hashlib.scrypt(
+                password.encode(), salt=base64.b64decode(salt),
+                n=int(n), r=int(r), p=int(p), maxmem=0, dklen=32
+            )
+            return hmac.compare_digest(candidate, base64.b64decode(digest))
+        return False
+    
+    def _record(self, operation, latency, queue_wait, rejected=False):
+        with self._metrics_lock:
+            stats = self._metrics.setdefault(operation, {
+                'count': 0, 'rejected': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'queue_wait_ms': 0.0
+            })
+            if rejected:
+                stats['rejected'] += 1
+                return
+            stats['count'] += 1
+            stats['total_ms'] += latency * 1000
+            stats['max_ms'] = max(stats['max_ms'], latency * 1000)
+            stats['queue_wait_ms'] += queue_wait * 1000
+    
+    def get_metrics(self):
+        """Latency summary per operation"""
+        with self._metrics_lock:
+            operations = {}
+            for operation, stats in self._metrics.items():
+                count = stats['count'] or 1
+                operations[operation] = {
+                    'count': stats['count'],
+                    'rejected': stats['rejected'],
+                    'avg_ms': round(stats['total_ms'] / count, 2),
+                    'max_ms': round(stats['max_ms'], 2),
+                    'avg_queue_wait_ms': round(stats['queue_wait_ms'] / count, 2)
+                }
+        return {
+            'scheme': self.scheme,
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'operations': operations
+        }
+
+
+def _create_password_hasher():
+    from config import config
+    return PasswordHasher.from_config(config)
+
+
+# Shared hasher configured from config.Config
+password_hasher = _create_password_hasher()
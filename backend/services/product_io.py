@@ -0,0 +1,196 @@
+"""
+Product Import / Export
+Streaming CSV and NDJSON bulk listing for farmer cooperatives; memory stays
+bounded by the chunk size whatever the file size
+"""
+
+import csv
+import io
+import json
+import logging
+from datetime import datetime
+from werkzeug.exceptions import RequestEntityTooLarge
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+
+# Export columns; an exported file imports back as new listings (product_id is ignored)
+EXPORT_COLUMNS = [
+    'product_id', 'name', 'category', 'description', 'price', 'quantity', 'soil_type',
+    'season', 'quality_grade', 'image_url', 'latitude', 'longitude', 'rating',
+    'review_count', 'created_at'
+]
+
+EXPORT_PROJECTION = {
+    'name': 1, 'category': 1, 'description': 1, 'price': 1, 'quantity': 1, 'soil_type': 1,
+    'season': 1, 'quality_grade': 1, 'image_url': 1, 'location': 1, 'rating': 1,
+    'review_count': 1, 'created_at': 1
+}
+
+
+def detect_format(requested=None, content_type=None):
+    """'csv' or 'ndjson' from an explicit format or the Content-Type; raises ValueError"""
+    if requested:
+        if requested not in FORMATS:
+            raise ValueError(f"Unsupported format. Must be one of {list(FORMATS)}")
+        return requested
+    mimetype = (content_type or '').split(';')[0].strip().lower()
+    if mimetype in ('text/csv', 'application/csv'):
+        return 'csv'
+    if mimetype in ('application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/json-lines'):
+        return 'ndjson'
+    raise ValueError("Send Content-Type text/csv or application/x-ndjson, or pass ?format=")
+
+
+def read_rows(stream, fmt):
+    """Yield (row number, record dict or error message) from a binary stream.
+    
+    Row numbers are file line numbers, so they match spreadsheet rows.
+    Undecodable or malformed input raises ValueError.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        if fmt == 'csv':
+            reader = csv.DictReader(text)
+            for record in reader:
+                if None in record:
+                    yield reader.line_num, f"Row has {len(reader.fieldnames) + len(record[None])} cells, header has {len(reader.fieldnames)}"
+                    continue
+                yield reader.line_num, {key.strip(): (value or '').strip() for key, value in record.items() if key}
+        else:
+            for line_number, line in enumerate(text, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_number, f"Invalid JSON: {e.msg}"
+                    continue
+                yield line_number, record if isinstance(record, dict) else "Each line must be a JSON object"
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ValueError(f"Could not read the file: {str(e)}")
+    finally:
+        # The stream belongs to the request
+        text.detach()
+
+
+class ImportReport:
+    """Counts and the first max_errors row errors of one import"""
+    
+    def __init__(self, max_errors=1000):
+        self.max_errors = max_errors
+        self.rows = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+        self.aborted = None
+    
+    def error(self, row, message):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': row, 'message': message})
+    
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'inserted': self.inserted,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+            'aborted': self.aborted
+        }
+
+
+def import_products(stream, fmt, farmer_id, chunk_size=1000, max_errors=1000, on_inserted=None):
+    """Validate rows as they are read and insert them in unordered chunks.
+    
+    Only one chunk of documents is held at a time. on_inserted(documents)
+    is called after each chunk, e.g. to update the search index.
+    """
+    from models import Product
+    report = ImportReport(max_errors=max_errors)
+    # Looked up once, not per row
+    farm_location = Product.farm_location(farmer_id)
+    chunk, chunk_rows = [], []
+    
+    def flush():
+        inserted, errors = Product.create_many(chunk)
+        for position, message in errors.items():
+            report.error(chunk_rows[position], message)
+        report.inserted += len(inserted)
+        if inserted and on_inserted is not None:
+            on_inserted(inserted)
+        chunk.clear()
+        chunk_rows.clear()
+    
+    try:
+        for row, record in read_rows(stream, fmt):
+            report.rows += 1
+            if isinstance(record, str):
+                report.error(row, record)
+                continue
+            try:
+                chunk.append(Product.new_document(farmer_id, farm_location=farm_location, **Product.clean_fields(record)))
+            except ValueError as e:
+                report.error(row, str(e))
+                continue
+            chunk_rows.append(row)
+            if len(chunk) >= chunk_size:
+                flush()
+    except ValueError as e:
+        # Rows before the unreadable part are still imported
+        report.aborted = str(e)
+    except RequestEntityTooLarge:
+        report.aborted = "File is larger than the import size limit"
+    if chunk:
+        flush()
+    
+    logger.info(
+        f"[OK] Product import for farmer {farmer_id}: {report.inserted} inserted, "
+        f"{report.failed} failed of {report.rows} rows"
+    )
+    return report
+
+
+def _export_row(doc):
+    coordinates = (doc.get('location') or {}).get('coordinates') or [None, None]
+    created_at = doc.get('created_at')
+    return {
+        **{column: doc.get(column) for column in EXPORT_COLUMNS},
+        'product_id': str(doc['_id']),
+        'longitude': coordinates[0],
+        'latitude': coordinates[1],
+        'created_at': created_at.isoformat() if isinstance(created_at, datetime) else created_at
+    }
+
+
+def export_products(cursor, fmt, rows_per_chunk=500):
+    """Yield the file in chunks of rows_per_chunk rows, straight from a cursor"""
+    buffer = io.StringIO()
+    writer = None
+    if fmt == 'csv':
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+    
+    pending = 0
+    for doc in cursor:
+        row = _export_row(doc)
+        if writer is not None:
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps(row, ensure_ascii=False))
+            buffer.write('\n')
+        pending += 1
+        if pending >= rows_per_chunk:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    
+    tail = buffer.getvalue()
+    if tail:
+        yield tail
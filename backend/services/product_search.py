@@ -0,0 +1,452 @@
+"""
+Product Search
+In-process inverted index over product name, category and description with
+BM25 ranking, prefix matching, regional names and typo tolerance
+"""
+
+import logging
+import re
+import threading
+from bisect import bisect_left
+from collections import Counter
+from functools import lru_cache
+from datetime import datetime
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r'\w+')
+
+# Regional names farmers search by -> the term used in the catalogue
+REGIONAL_NAMES = {
+    'tamatar': 'tomato', 'aloo': 'potato', 'alu': 'potato', 'pyaz': 'onion', 'pyaaz': 'onion',
+    'kanda': 'onion', 'gehun': 'wheat', 'gehu': 'wheat', 'chawal': 'rice', 'dhan': 'rice',
+    'paddy': 'rice', 'makka': 'maize', 'makki': 'maize', 'corn': 'maize', 'mirch': 'chilli',
+    'mirchi': 'chilli', 'chili': 'chilli', 'haldi': 'turmeric', 'adrak': 'ginger', 'lahsun': 'garlic',
+    'jeera': 'cumin', 'kapas': 'cotton', 'ganna': 'sugarcane', 'sarson': 'mustard', 'chana': 'chickpea',
+    'bhindi': 'okra', 'baingan': 'brinjal', 'gobi': 'cauliflower', 'matar': 'peas', 'khad': 'fertilizer',
+    'beej': 'seed'
+}
+
+
+@lru_cache(maxsize=65536)
+def _stem(token):
+    """Fold simple English plurals so 'tomatoes' and 'tomato' share a term"""
+    if len(token) <= 3 or not token.isalpha():
+        return token
+    if token.endswith('ies'):
+        return token[:-3] + 'y'
+    if token.endswith(('oes', 'ches', 'shes', 'xes', 'sses')):
+        return token[:-2]
+    if token.endswith('s') and not token.endswith(('ss', 'us', 'is')):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Lower-cased, plural-folded word tokens of text"""
+    return [_stem(token) for token in _TOKEN_RE.findall(text.casefold())] if text else []
+
+
+def _grams(term):
+    padded = f'^{term}$'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance (transpositions count once), capped at limit + 1"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if before is not None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, before[j - 2] + 1)
+            current[j] = value
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+def _synonym_map():
+    """Map both directions, so 'tomato' also finds products listed as 'tamatar'"""
+    synonyms = {}
+    for regional, term in REGIONAL_NAMES.items():
+        synonyms.setdefault(_stem(regional), set()).add(_stem(term))
+        synonyms.setdefault(_stem(term), set()).add(_stem(regional))
+    return synonyms
+
+
+SYNONYMS = _synonym_map()
+
+
+class _IndexData:
+    """One generation of the index; a rebuild fills a new one and swaps it in"""
+    
+    def __init__(self, avg_length=1.0):
+        self.product_ids = []
+        # product id -> (doc number, fingerprint of the indexed fields)
+        self.docs = {}
+        self.alive = np.zeros(0, dtype=bool)
+        self.categories = np.zeros(0, dtype=np.int32)
+        self.category_codes = {}
+        self.size = 0
+        self.dead = 0
+        self.avg_length = avg_length
+        # term -> (doc numbers, weights) arrays, plus lists of postings added since
+        self.postings = {}
+        self.delta = {}
+        self.delta_count = 0
+        # Document frequency, counting tombstoned documents until the next rebuild
+        self.df = {}
+        self.grams = {}
+        self._sorted_terms = None
+    
+    def allocate(self, category):
+        """Next document number, growing the per-document arrays as needed"""
+        if self.size == len(self.alive):
+            capacity = max(1024, 2 * self.size)
+            self.alive = np.concatenate([self.alive, np.zeros(capacity - self.size, dtype=bool)])
+            self.categories = np.concatenate([self.categories, np.zeros(capacity - self.size, dtype=np.int32)])
+        doc = self.size
+        self.size += 1
+        self.alive[doc] = True
+        self.categories[doc] = self.category_code(category)
+        return doc
+    
+    def category_code(self, category):
+        return self.category_codes.setdefault(category, len(self.category_codes))
+    
+    def add_term(self, term, count=1):
+        if term not in self.df:
+            self.df[term] = 0
+            for gram in _grams(term):
+                self.grams.setdefault(gram, set()).add(term)
+            self._sorted_terms = None
+        self.df[term] += count
+    
+    def sorted_terms(self):
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self.df)
+        return self._sorted_terms
+
+
+class ProductSearchIndex:
+    """BM25 inverted index over active products, kept in process memory.
+    
+    Postings are numpy arrays of (document, weight) per term with the BM25
+    length normalisation folded into the weight, so a query is one
+    bincount over the postings its tokens expand to. Products created or
+    changed after a build are appended as per-term deltas and merged into
+    the arrays every compaction_threshold postings; replaced and removed
+    documents are tombstoned until the next rebuild.
+    """
+    
+    # Name matches outrank category matches, which outrank description matches
+    FIELD_WEIGHTS = (('name', 3.0), ('category', 2.0), ('description', 1.0))
+    K1 = 1.2
+    B = 0.75
+    SYNONYM_BOOST = 0.9
+    PREFIX_BOOST = 0.7
+    # Score multiplier by number of edits for typo-corrected terms
+    FUZZY_BOOSTS = {1: 0.8, 2: 0.6}
+    FUZZY_CANDIDATES = 50
+    MAX_PREFIX_TERMS = 20
+    # Tombstones only skew document frequencies; small catalogues never need a rebuild for them
+    MIN_REBUILD_DEAD = 1000
+    
+    def __init__(self, max_edits=2, compaction_threshold=20000, rebuild_dead_ratio=0.25):
+        self.max_edits = max_edits
+        self.compaction_threshold = compaction_threshold
+        self.rebuild_dead_ratio = rebuild_dead_ratio
+        self.built_at = None
+        self._data = None
+        # Changes seen while a rebuild runs, replayed onto the new generation
+        self._pending = None
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+    
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            max_edits=config.SEARCH_FUZZY_MAX_EDITS,
+            compaction_threshold=config.SEARCH_COMPACTION_THRESHOLD
+        )
+    
+    def is_ready(self):
+        return self._data is not None
+    
+    def build(self, documents=None):
+        """Index every active product (or the given documents) and swap the result in"""
+        with self._build_lock:
+            with self._lock:
+                self._pending = []
+            try:
+                data = self._build_data(documents if documents is not None else self._load_products())
+            except Exception:
+                with self._lock:
+                    self._pending = None
+                raise
+            with self._lock:
+                pending, self._pending = self._pending, None
+                self._data = data
+                for product_id, document in pending:
+                    self._apply(data, product_id, document)
+                self.built_at = datetime.utcnow()
+        logger.info(f"[OK] Product search index built: {data.size - data.dead} products, {len(data.df)} terms")
+        return True
+    
+    def build_async(self):
+        """Rebuild in a background thread unless one is already running"""
+        if self._build_lock.locked():
+            return
+        threading.Thread(target=self._build_quietly, name='product-search-build', daemon=True).start()
+    
+    def _build_quietly(self):
+        try:
+            self.build()
+        except Exception as e:
+            logger.error(f"Product search index build failed: {str(e)}")
+    
+    @staticmethod
+    def _load_products():
+        from models import Product
+        return Product.get_analytics_collection().find(
+            {'is_active': True}, {'name': 1, 'category': 1, 'description': 1}, batch_size=2000
+        )
+    
+    def _term_frequencies(self, document):
+        """Field-weighted term frequencies and weighted length of a product"""
+        frequencies = Counter()
+        for field, weight in self.FIELD_WEIGHTS:
+            for term in tokenize(document.get(field) or ''):
+                frequencies[term] += weight
+        return frequencies, sum(frequencies.values())
+    
+    @staticmethod
+    def _fingerprint(document):
+        return hash((document.get('name'), document.get('category'), document.get('description')))
+    
+    def _build_data(self, documents):
+        term_docs = {}
+        term_tfs = {}
+        lengths = []
+        data = _IndexData()
+        for document in documents:
+            product_id = str(document['_id'])
+            frequencies, length = self._term_frequencies(document)
+            doc = data.allocate(document.get('category'))
+            data.product_ids.append(product_id)
+            data.docs[product_id] = (doc, self._fingerprint(document))
+            lengths.append(length)
+            for term, tf in frequencies.items():
+                term_docs.setdefault(term, []).append(doc)
+                term_tfs.setdefault(term, []).append(tf)
+        
+        lengths = np.asarray(lengths, dtype=np.float32)
+        data.avg_length = float(lengths.mean()) if lengths.size and lengths.mean() > 0 else 1.0
+        norms = self.K1 * (1 - self.B + self.B * lengths / data.avg_length)
+        for term, docs in term_docs.items():
+            docs = np.asarray(docs, dtype=np.int32)
+            tfs = np.asarray(term_tfs[term], dtype=np.float32)
+            data.postings[term] = (docs, tfs * (self.K1 + 1) / (tfs + norms[docs]))
+            data.add_term(term, docs.size)
+        return data
+    
+    def refresh_product(self, product_id):
+        """Re-read one product after a local write; no-op until the index is built"""
+        if self._data is None:
+            return
+        from models import Product
+        self.apply_change(str(product_id), 'update', Product.find_by_id(product_id))
+    
+    def apply_change(self, product_id, operation, document):
+        """catalog_watcher subscriber: re-index a product, or drop it when deleted or deactivated"""
+        if self._data is None:
+            return
+        if operation == 'delete':
+            document = None
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((product_id, document))
+            self._apply(self._data, product_id, document)
+            dead, size = self._data.dead, self._data.size
+            rebuild = dead > max(self.MIN_REBUILD_DEAD, self.rebuild_dead_ratio * size)
+        if rebuild:
+            self.build_async()
+    
+    def _apply(self, data, product_id, document):
+        current = data.docs.get(product_id)
+        if document is not None and document.get('is_active', True):
+            fingerprint = self._fingerprint(document)
+            if current is not None and current[1] == fingerprint:
+                # Stock and price updates don't touch the indexed text
+                return
+        else:
+            fingerprint = None
+        
+        if current is not None:
+            data.alive[current[0]] = False
+            data.dead += 1
+            del data.docs[product_id]
+        if fingerprint is None:
+            return
+        
+        frequencies, length = self._term_frequencies(document)
+        doc = data.allocate(document.get('category'))
+        data.product_ids.append(product_id)
+        data.docs[product_id] = (doc, fingerprint)
+        norm = self.K1 * (1 - self.B + self.B * length / data.avg_length)
+        for term, tf in frequencies.items():
+            docs, weights = data.delta.setdefault(term, ([], []))
+            docs.append(doc)
+            weights.append(tf * (self.K1 + 1) / (tf + norm))
+            data.add_term(term)
+        data.delta_count += len(frequencies)
+        if data.delta_count >= self.compaction_threshold:
+            self._compact(data)
+    
+    def _compact(self, data):
+        """Merge delta postings into the arrays, dropping tombstoned documents"""
+        for term in data.delta:
+            docs, weights = self._postings(data, term)
+            keep = data.alive[docs]
+            data.postings[term] = (docs[keep], weights[keep])
+        data.delta = {}
+        data.delta_count = 0
+    
+    @staticmethod
+    def _postings(data, term):
+        docs, weights = data.postings.get(term, (None, None))
+        delta = data.delta.get(term)
+        if delta is None:
+            return docs, weights
+        delta_docs = np.asarray(delta[0], dtype=np.int32)
+        delta_weights = np.asarray(delta[1], dtype=np.float32)
+        if docs is None:
+            return delta_docs, delta_weights
+        return np.concatenate([docs, delta_docs]), np.concatenate([weights, delta_weights])
+    
+    def _prefixed(self, data, prefix):
+        """Most frequent indexed terms that extend prefix"""
+        terms = data.sorted_terms()
+        start = bisect_left(terms, prefix)
+        end = bisect_left(terms, prefix + '\uffff', lo=start)
+        matches = [term for term in terms[start:end] if term != prefix]
+        if len(matches) > self.MAX_PREFIX_TERMS:
+            matches.sort(key=lambda term: -data.df[term])
+        return matches[:self.MAX_PREFIX_TERMS]
+    
+    def _fuzzy(self, data, token):
+        """(term, edits) for indexed terms within the edit budget of a misspelt token, best first"""
+        max_edits = min(self.max_edits, 0 if len(token) < 4 else 1 if len(token) <= 5 else 2)
+        if max_edits == 0:
+            return []
+        grams = _grams(token)
+        shared = Counter()
+        for gram in grams:
+            for term in data.grams.get(gram, ()):
+                if abs(len(term) - len(token)) <= max_edits:
+                    shared[term] += 1
+        # Each edit changes at most three trigrams
+        needed = len(grams) - 3 * max_edits
+        matches = []
+        for term, count in shared.most_common(self.FUZZY_CANDIDATES):
+            if count < needed:
+                break
+            edits = edit_distance(token, term, max_edits)
+            if edits <= max_edits:
+                matches.append((term, edits))
+        matches.sort(key=lambda match: (match[1], -data.df[match[0]]))
+        return matches[:3]
+    
+    def _expand(self, data, token, prefix):
+        """Indexed terms a query token matches, with their score boosts, and its correction if any"""
+        boosts = {}
+        if token in data.df:
+            boosts[token] = 1.0
+        for synonym in SYNONYMS.get(token, ()):
+            if synonym in data.df:
+                boosts.setdefault(synonym, self.SYNONYM_BOOST)
+        if prefix and len(token) >= 2:
+            for term in self._prefixed(data, token):
+                boosts.setdefault(term, self.PREFIX_BOOST)
+        if boosts:
+            return boosts, None
+        matches = self._fuzzy(data, token)
+        for term, edits in matches:
+            boosts[term] = self.FUZZY_BOOSTS[edits]
+        return boosts, matches[0][0] if matches else None
+    
+    def search(self, query, limit=20, offset=0, category=None):
+        """Ranked page of (product_id, score), total hits and {token: corrected term}.
+        
+        The last token also matches as a prefix unless the query ends in
+        whitespace, so results follow the user while they type. Until the
+        index is built this starts a background build and finds nothing;
+        callers check is_ready() and fall back to Mongo text search.
+        """
+        if self._data is None:
+            self.build_async()
+            return [], 0, {}
+        tokens = tokenize(query)
+        still_typing = bool(query) and not query[-1].isspace()
+        corrections = {}
+        
+        with self._lock:
+            data = self._data
+            all_docs, all_weights = [], []
+            for token in dict.fromkeys(tokens):
+                boosts, correction = self._expand(data, token, still_typing and token == tokens[-1])
+                if correction:
+                    corrections[token] = correction
+                for term, boost in boosts.items():
+                    docs, weights = self._postings(data, term)
+                    df = data.df[term]
+                    idf = np.log1p((data.size - df + 0.5) / (df + 0.5))
+                    all_docs.append(docs)
+                    all_weights.append(weights * np.float32(idf * boost))
+            if not all_docs:
+                return [], 0, corrections
+            
+            scores = np.bincount(np.concatenate(all_docs), np.concatenate(all_weights), minlength=data.size)
+            mask = data.alive[:data.size] & (scores > 0)
+            if category is not None:
+                code = data.category_codes.get(category)
+                if code is None:
+                    return [], 0, corrections
+                mask &= data.categories[:data.size] == code
+            hits = np.flatnonzero(mask)
+            total = int(hits.size)
+            
+            wanted = offset + limit
+            if 0 < wanted < hits.size:
+                hits = hits[np.argpartition(-scores[hits], wanted - 1)[:wanted]]
+            # Ties keep document order, i.e. older products first
+            ranked = hits[np.argsort(-scores[hits], kind='stable')][offset:wanted]
+            return [(data.product_ids[doc], float(scores[doc])) for doc in ranked], total, corrections
+    
+    def get_stats(self):
+        data = self._data
+        if data is None:
+            return {'ready': False}
+        return {
+            'ready': True,
+            'products': data.size - data.dead,
+            'tombstoned': data.dead,
+            'terms': len(data.df),
+            'pending_postings': data.delta_count,
+            'built_at': self.built_at.isoformat() if self.built_at else None
+        }
+
+
+def _create_product_search():
+    from config import config
+    return ProductSearchIndex.from_config(config)
+
+
+# Shared per-process index; built on first search or by warm_up()
+product_search = _create_product_search()
@@ -9,19 +9,32 @@ import numpy as np
 from typing import List, Dict, Tuple
 import pickle
 
-try:
-    from sentence_transformers import SentenceTransformer
-    HAS_SENTENCE_TRANSFORMERS = True
-except ImportError:
-    HAS_SENTENCE_TRANSFORMERS = False
-    print('[WARN] sentence-transformers not available; using keyword fallback')
+# Optional backends, imported on first use by _load_backends(): sentence-transformers
+# pulls in torch, which would otherwise cost seconds in every worker at startup
+SentenceTransformer = None
+faiss = None
+HAS_SENTENCE_TRANSFORMERS = None
+HAS_FAISS = None
 
-try:
-    import faiss
-    HAS_FAISS = True
-except ImportError:
-    HAS_FAISS = False
-    print('[WARN] FAISS not available; using cosine similarity')
+
+def _load_backends():
+    global SentenceTransformer, faiss, HAS_SENTENCE_TRANSFORMERS, HAS_FAISS
+    if HAS_SENTENCE_TRANSFORMERS is not None:
+        return
+    
+    try:
+        from sentence_transformers import SentenceTransformer
+        HAS_SENTENCE_TRANSFORMERS = True
+    except ImportError:
+        HAS_SENTENCE_TRANSFORMERS = False
+        print('[WARN] sentence-transformers not available; using keyword fallback')
+    
+    try:
+        import faiss
+        HAS_FAISS = True
+    except ImportError:
+        HAS_FAISS = False
+        print('[WARN] FAISS not available; using cosine similarity')
 
 
 class VectorStore:
@@ -49,6 +62,7 @@ class VectorStore:
         if self._initialized:
             return
         
+        _load_backends()
         if HAS_SENTENCE_TRANSFORMERS:
             try:
                 print(f'[...] Loading embeddings model: {self.model_name}...')
@@ -0,0 +1,52 @@
+"""
+Shared pytest fixtures
+Tests run against an in-memory MongoDB (mongomock, from requirements-dev.txt), like the benchmarks
+"""
+
+import os
+import sys
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# Config is read from the environment at import time
+os.environ['MONGODB_URI'] = 'mongomock://'
+os.environ['MONGODB_DB_NAME'] = 'agrismart_test'
+os.environ['SCHEDULER_ENABLED'] = 'false'
+os.environ['CATALOG_WATCH_ENABLED'] = 'false'
+os.environ['ENABLED_BLUEPRINTS'] = 'auth,products,orders,reviews'
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import create_app
+    return create_app(start_scheduler=False)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def db(app):
+    """Empty database for one test; indexes are kept"""
+    from extensions import get_db
+    from models.database import BaseModel
+    database = get_db()
+    yield database
+    for name in database.list_collection_names():
+        database[name].delete_many({})
+    for model in BaseModel.__subclasses__():
+        if model.cache is not None:
+            model.cache.clear()
+
+
+@pytest.fixture
+def farmer_token(client, db):
+    response = client.post('/api/auth/signup', json={
+        'email': 'farmer@example.com', 'password': 'secret123', 'name': 'Farmer', 'role': 'farmer'
+    })
+    return response.get_json()['access_token']
@@ -0,0 +1,95 @@
+"""
+Catalogue watcher: polling fallback and cache invalidation
+"""
+
+import time
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+from models import Product
+from services.catalog_watcher import CatalogWatcher
+
+
+@pytest.fixture
+def watcher():
+    watcher = CatalogWatcher(poll_interval=0.05)
+    watcher.changes = []
+    watcher.subscribe(lambda product_id, operation, doc: watcher.changes.append((product_id, operation)))
+    return watcher
+
+
+@pytest.fixture
+def product_id(db):
+    return Product.create_product(ObjectId(), 'Tomato', 'Vegetables', 'Red', 20, 50)
+
+
+def test_poll_dispatches_each_change_once(watcher, product_id):
+    last_seen, dispatched = datetime.utcnow() - timedelta(seconds=1), {}
+    Product.update(str(product_id), {'price': 25})
+    
+    for _ in range(5):
+        last_seen = watcher._poll_once(Product, last_seen, dispatched)
+    
+    assert watcher.changes == [(str(product_id), 'update')]
+
+
+def test_poll_dispatches_later_changes_of_same_product(watcher, product_id):
+    last_seen, dispatched = datetime.utcnow() - timedelta(seconds=1), {}
+    last_seen = watcher._poll_once(Product, last_seen, dispatched)
+    
+    Product.get_collection().update_one(
+        {'_id': product_id}, {'$set': {'price': 30, 'updated_at': datetime.utcnow() + timedelta(milliseconds=5)}}
+    )
+    last_seen = watcher._poll_once(Product, last_seen, dispatched)
+    watcher._poll_once(Product, last_seen, dispatched)
+    
+    assert watcher.changes == [(str(product_id), 'update')] * 2
+
+
+def test_poll_forgets_changes_outside_the_window(watcher, product_id):
+    dispatched = {}
+    last_seen = watcher._poll_once(Product, datetime.utcnow() - timedelta(seconds=1), dispatched)
+    assert product_id in dispatched
+    
+    watcher._poll_once(Product, last_seen + CatalogWatcher.POLL_OVERLAP + timedelta(seconds=1), dispatched)
+    assert dispatched == {}
+
+
+def test_dispatch_invalidates_cache_and_survives_failing_subscriber(watcher, product_id):
+    def broken(*args):
+        raise RuntimeError('boom')
+    
+    watcher._subscribers.insert(0, broken)
+    Product.find_by_id(product_id)
+    assert Product.cache.get(product_id) is not None
+    
+    watcher._dispatch(Product, product_id, 'update', None)
+    
+    assert Product.cache.get(product_id) is None
+    assert watcher.changes == [(str(product_id), 'update')]
+
+
+def test_polling_fallback_thread(watcher, product_id, monkeypatch):
+    def unsupported(self, Product):
+        raise OperationFailure('The $changeStream stage is only supported on replica sets', code=40573)
+    
+    monkeypatch.setattr(CatalogWatcher, '_watch_change_stream', unsupported)
+    Product.get_collection().update_one(
+        {'_id': product_id}, {'$set': {'updated_at': datetime.utcnow() - timedelta(hours=1)}}
+    )
+    watcher.ensure_running()
+    try:
+        time.sleep(0.2)
+        Product.update(str(product_id), {'price': 25})
+        time.sleep(0.5)
+    finally:
+        watcher.stop()
+    
+    assert watcher.mode == 'polling'
+    assert watcher.changes == [(str(product_id), 'update')]
+
+
+def test_updated_at_is_indexed(db):
+    keys = [index['key'] for index in Product.get_collection().index_information().values()]
+    assert [('updated_at', 1)] in keys
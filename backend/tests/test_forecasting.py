@@ -0,0 +1,84 @@
+"""
+Price forecaster: naive forecasts until the scheduled job has trained a model
+"""
+
+import os
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from ml.forecasting import PriceForecaster
+from models import PriceHistory
+
+
+@pytest.fixture
+def forecaster(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(PriceForecaster, 'MODEL_PATH', str(tmp_path / 'price_forecast_model.pkl'))
+    return PriceForecaster()
+
+
+def _seed_history(n_products=5, days=60):
+    product_ids = [ObjectId() for _ in range(n_products)]
+    start = datetime.utcnow() - timedelta(days=days)
+    PriceHistory.get_collection().insert_many([
+        {'product_id': pid, 'price': 20 + i + (day % 7), 'timestamp': start + timedelta(days=day)}
+        for i, pid in enumerate(product_ids) for day in range(days)
+    ])
+    return [str(pid) for pid in product_ids]
+
+
+def test_forecast_without_model_is_naive_and_does_not_train(forecaster, monkeypatch):
+    product_ids = _seed_history()
+    monkeypatch.setattr(PriceForecaster, '_train', lambda self: pytest.fail('trained on the request path'))
+    
+    forecasts = forecaster.forecast_many(product_ids, horizon=7)
+    
+    assert set(forecasts) == set(product_ids)
+    assert all(f['method'] == 'naive' and len(f['predicted']) == 7 for f in forecasts.values())
+    assert not os.path.exists(PriceForecaster.MODEL_PATH)
+
+
+def test_trained_model_is_used_once_written(forecaster):
+    product_ids = _seed_history()
+    assert forecaster.forecast_many(product_ids[:1])[product_ids[0]]['method'] == 'naive'
+    
+    # The scheduler process trains and saves; this process only loads
+    assert PriceForecaster().train()
+    
+    forecast = forecaster.forecast_many(product_ids[:1])[product_ids[0]]
+    assert forecast['method'] == 'random_forest'
+
+
+def test_workers_reload_a_retrained_model(forecaster, monkeypatch):
+    product_ids = _seed_history()
+    scheduler_side = PriceForecaster()
+    assert scheduler_side.train()
+    assert forecaster.load()
+    first_version = forecaster.model_version
+    
+    assert scheduler_side.train()
+    # Make sure the rewrite is visible even on filesystems with coarse mtimes
+    os.utime(PriceForecaster.MODEL_PATH, (first_version + 10, first_version + 10))
+    monkeypatch.setattr(PriceForecaster, 'RELOAD_CHECK_SECONDS', 0)
+    
+    forecast = forecaster.forecast_many(product_ids[:1])[product_ids[0]]
+    assert forecaster.model_version == first_version + 10
+    assert forecast['method'] == 'random_forest'
+
+
+def test_scheduled_training_records_rows_or_skip(forecaster):
+    from automation.scheduler import AutomationManager
+    from models import JobLease, JobRun
+    manager = AutomationManager()
+    
+    manager.run_now('price_forecast_model')
+    skipped = JobRun.find_recent('price_forecast_model', limit=1)[0]
+    assert (skipped['status'], skipped['documents_touched']) == ('skipped', 0)
+    assert 'Not enough price history' in skipped['error']
+    assert not os.path.exists(PriceForecaster.MODEL_PATH)
+    
+    _seed_history()
+    JobLease.release('price_forecast_model', manager.owner)
+    manager.run_now('price_forecast_model')
+    trained = JobRun.find_recent('price_forecast_model', limit=1)[0]
+    assert trained['status'] == 'success'
+    assert trained['documents_touched'] >= PriceForecaster.MIN_TRAINING_ROWS
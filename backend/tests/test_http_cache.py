@@ -0,0 +1,117 @@
+"""
+ETags, 304 responses and collection version bumps
+"""
+
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from models import CollectionVersion, Product
+
+
+@pytest.fixture
+def auth(farmer_token):
+    return {'Authorization': f'Bearer {farmer_token}'}
+
+
+@pytest.fixture
+def product_id(client, auth):
+    response = client.post('/api/products/', headers=auth, json={
+        'name': 'Tomato', 'category': 'Vegetables', 'description': 'Red', 'price': 20, 'quantity': 50
+    })
+    return response.get_json()['product_id']
+
+
+def version(name='products'):
+    doc = CollectionVersion.get_collection().find_one({'_id': name})
+    return doc['version'] if doc else 0
+
+
+def test_product_etag_and_304(client, product_id):
+    first = client.get(f'/api/products/{product_id}')
+    assert first.status_code == 200
+    assert first.headers['ETag'].startswith('W/')
+    assert 'max-age=30' in first.headers['Cache-Control']
+    
+    again = client.get(f'/api/products/{product_id}', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert again.data == b''
+
+
+def test_product_update_changes_etag(client, auth, product_id):
+    etag = client.get(f'/api/products/{product_id}').headers['ETag']
+    client.put(f'/api/products/{product_id}', headers=auth, json={'price': 25})
+    
+    response = client.get(f'/api/products/{product_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['data']['price'] == 25
+    assert response.headers['ETag'] != etag
+
+
+def test_etag_matches_the_served_document(client, product_id):
+    old = client.get(f'/api/products/{product_id}')
+    # Another worker renames the product; this worker's cache still has the old document
+    Product.get_collection().update_one(
+        {'_id': ObjectId(product_id)},
+        {'$set': {'name': 'Cherry Tomato', 'updated_at': datetime.utcnow() + timedelta(seconds=1)}}
+    )
+    stale = client.get(f'/api/products/{product_id}')
+    assert stale.get_json()['data']['name'] == 'Tomato'
+    assert stale.headers['ETag'] == old.headers['ETag']
+    
+    # Once the catalogue watcher drops the entry, the client's ETag no longer matches
+    Product.invalidate(product_id)
+    fresh = client.get(f'/api/products/{product_id}', headers={'If-None-Match': stale.headers['ETag']})
+    assert fresh.status_code == 200
+    assert fresh.get_json()['data']['name'] == 'Cherry Tomato'
+
+
+def test_list_etag_follows_collection_version(client, auth, product_id):
+    first = client.get('/api/products/')
+    assert client.get('/api/products/', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    
+    client.post('/api/products/', headers=auth, json={
+        'name': 'Onion', 'category': 'Vegetables', 'description': 'Red', 'price': 30, 'quantity': 10
+    })
+    response = client.get('/api/products/', headers={'If-None-Match': first.headers['ETag']})
+    assert response.status_code == 200
+    assert response.get_json()['pagination']['total'] == 2
+
+
+def test_search_does_not_serve_cached_documents(client, product_id):
+    from services.product_search import product_search
+    product_search.build()
+    client.get(f'/api/products/{product_id}')
+    
+    # Written by another worker, which also bumped the collection version
+    Product.get_collection().update_one({'_id': ObjectId(product_id)}, {'$set': {'price': 99}})
+    CollectionVersion.bump('products')
+    
+    response = client.get('/api/products/search?q=tomato')
+    assert response.get_json()['data'][0]['price'] == 99
+
+
+def test_one_version_bump_per_request(client, db, product_id):
+    other = Product.create_product(ObjectId(), 'Onion', 'Vegetables', 'Red', 30, 10)
+    buyer = client.post('/api/auth/signup', json={
+        'email': 'buyer@example.com', 'password': 'secret123', 'name': 'Buyer'
+    }).get_json()['access_token']
+    before = version()
+    
+    response = client.post('/api/orders/', headers={'Authorization': f'Bearer {buyer}'}, json={
+        'items': [{'product_id': product_id, 'quantity': 1}, {'product_id': str(other), 'quantity': 2}],
+        'shipping_address': 'Pune'
+    })
+    
+    assert response.status_code == 201
+    assert version() == before + 1
+
+
+def test_one_version_bump_per_scheduled_run(db, product_id):
+    from automation.scheduler import AutomationManager
+    Product.create_product(ObjectId(), 'Onion', 'Vegetables', 'Red', 30, 10)
+    before = version()
+    
+    AutomationManager().run_now('update_prices')
+    
+    assert version() == before + 1
+    assert Product.find_by_id(product_id)['price'] == pytest.approx(20.4)
@@ -0,0 +1,73 @@
+"""
+Item similarity index builds and the scheduled job that runs them
+"""
+
+import os
+from bson import ObjectId
+from ml.item_similarity import ItemSimilarityIndex
+
+
+def _seed_reviews(db, n_buyers=6, n_products=4):
+    buyers = [ObjectId() for _ in range(n_buyers)]
+    products = [ObjectId() for _ in range(n_products)]
+    # Each buyer rates two neighbouring products, so every product has neighbours
+    db['reviews'].insert_many([
+        {'buyer_id': buyers[b], 'product_id': products[(b + k) % n_products], 'rating': 5}
+        for b in range(n_buyers) for k in range(2)
+    ])
+    return [str(pid) for pid in products]
+
+
+def test_build_is_published_by_pointer(db, tmp_path):
+    products = _seed_reviews(db)
+    index = ItemSimilarityIndex(str(tmp_path))
+    assert index.build() == len(products)
+    
+    build = index.current_build()
+    assert sorted(os.listdir(tmp_path)) == ['CURRENT', build]
+    
+    reader = ItemSimilarityIndex(str(tmp_path))
+    assert reader.is_ready()
+    assert reader.recommend([products[0]])
+
+
+def test_reader_picks_up_new_build(db, tmp_path):
+    _seed_reviews(db)
+    writer = ItemSimilarityIndex(str(tmp_path))
+    reader = ItemSimilarityIndex(str(tmp_path))
+    writer.build()
+    assert reader.is_ready()
+    first = reader._loaded_build
+    
+    new_products = _seed_reviews(db)
+    writer.build()
+    reader._last_check = float('-inf')
+    assert reader.is_ready()
+    assert reader._loaded_build != first
+    assert new_products[0] in reader.item_index
+
+
+def test_old_builds_are_removed(db, tmp_path):
+    _seed_reviews(db)
+    index = ItemSimilarityIndex(str(tmp_path))
+    for _ in range(4):
+        index.build()
+    builds = [name for name in os.listdir(tmp_path) if name.startswith('build-')]
+    assert len(builds) == ItemSimilarityIndex.KEEP_BUILDS
+    assert index.current_build() in builds
+
+
+def test_scheduled_job_builds_index(db, tmp_path, monkeypatch):
+    from automation.scheduler import AutomationManager
+    from ml.item_similarity import item_similarity_index
+    from models import JobRun
+    _seed_reviews(db)
+    monkeypatch.setattr(item_similarity_index, 'index_dir', str(tmp_path))
+    
+    manager = AutomationManager()
+    manager._register_jobs()
+    assert 'item_similarity' in [job.id for job in manager.scheduler.get_jobs()]
+    
+    manager.run_now('item_similarity')
+    assert item_similarity_index.current_build() is not None
+    assert JobRun.find_recent('item_similarity')[0]['status'] == 'success'
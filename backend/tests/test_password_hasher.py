@@ -0,0 +1,45 @@
+"""
+Password hashing pool admission
+"""
+
+import threading
+import time
+import pytest
+from services.password_hasher import PasswordHasher, PasswordHasherBusyError
+
+
+@pytest.fixture
+def hasher():
+    return PasswordHasher(scheme='scrypt', scrypt_n=2 ** 4, workers=1, timeout=5)
+
+
+def test_max_pending_defaults_from_workers(hasher):
+    assert hasher.max_pending == PasswordHasher.PENDING_PER_WORKER
+    assert PasswordHasher(workers=3, max_pending=5).max_pending == 5
+
+
+def test_full_pool_rejects_without_waiting(hasher):
+    release = threading.Event()
+    callers = [
+        threading.Thread(target=hasher._run, args=('hash', release.wait))
+        for _ in range(hasher.max_pending)
+    ]
+    for caller in callers:
+        caller.start()
+    time.sleep(0.05)
+    
+    started = time.perf_counter()
+    with pytest.raises(PasswordHasherBusyError):
+        hasher.hash('secret123')
+    assert time.perf_counter() - started < 0.1
+    
+    release.set()
+    for caller in callers:
+        caller.join()
+    assert hasher.get_metrics()['operations']['hash']['rejected'] == 1
+
+
+def test_slots_free_up_after_hashing(hasher):
+    for _ in range(hasher.max_pending + 2):
+        stored = hasher.hash('secret123')
+    assert hasher.verify('secret123', stored) == (True, False)
@@ -0,0 +1,73 @@
+"""
+Popularity snapshot: aggregated by the scheduled job, read from memory by workers
+"""
+
+import threading
+from datetime import datetime
+import pytest
+from bson import ObjectId
+from automation.scheduler import AutomationManager
+from extensions import get_db
+from models import JobRun, Order, Product
+from ml.popularity import PopularityIndex
+
+
+@pytest.fixture
+def catalogue(db):
+    farmer = ObjectId()
+    tomato = Product.create_product(farmer, 'Tomato', 'Vegetables', 'Red', 20, 50)
+    rice = Product.create_product(farmer, 'Basmati Rice', 'Grains', 'Aged', 90, 50)
+    Order.get_collection().insert_many([
+        {'buyer_id': ObjectId(), 'status': 'delivered', 'created_at': datetime.utcnow(),
+         'items': [{'product_id': tomato, 'quantity': 1}]}
+        for _ in range(3)
+    ])
+    return str(tomato), str(rice)
+
+
+def test_refresh_publishes_snapshot_other_workers_load(catalogue):
+    tomato, rice = catalogue
+    assert PopularityIndex().refresh() == 2
+    
+    worker = PopularityIndex()
+    assert worker.load()
+    assert [product['product_id'] for product in worker.top(5)] == [tomato, rice]
+    assert [product['product_id'] for product in worker.top(5, category='Grains')] == [rice]
+
+
+def test_top_never_aggregates_on_the_request_thread(catalogue, monkeypatch):
+    index = PopularityIndex()
+    calls = []
+    monkeypatch.setattr(index, 'scores', lambda now=None: calls.append(threading.current_thread()) or iter(()))
+    monkeypatch.setattr(index, 'load_async', lambda: calls.append('async'))
+    
+    assert index.top(5) == []
+    assert calls == ['async']
+
+
+def test_background_load_aggregates_only_without_fresh_snapshot(catalogue, monkeypatch):
+    tomato, _ = catalogue
+    first = PopularityIndex()
+    first._load_quietly()
+    assert first.top(1)[0]['product_id'] == tomato
+    
+    worker = PopularityIndex()
+    monkeypatch.setattr(worker, 'refresh', lambda: pytest.fail('fresh snapshot re-aggregated'))
+    worker._load_quietly()
+    assert worker.top(5) == first.top(5)
+    
+    # The job has stopped: the next loader recomputes
+    get_db()[PopularityIndex.COLLECTION].update_one(
+        {}, {'$set': {'refreshed_at': datetime.utcnow() - 3 * PopularityIndex.TTL}}
+    )
+    later = PopularityIndex()
+    later._load_quietly()
+    assert later.refreshed_at > first.refreshed_at
+
+
+def test_scheduled_job_records_products(catalogue):
+    AutomationManager().run_now('popularity_index')
+    
+    run = JobRun.find_recent('popularity_index', limit=1)[0]
+    assert (run['status'], run['documents_touched']) == ('success', 2)
+    assert PopularityIndex().load()
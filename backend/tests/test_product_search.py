@@ -0,0 +1,127 @@
+"""
+Product search index and the /search route
+"""
+
+import pytest
+from services.product_search import ProductSearchIndex, product_search
+from routes import products as product_routes
+
+CATALOGUE = [
+    {'_id': 'p1', 'name': 'Red Tomato', 'category': 'Vegetables', 'description': 'Fresh tomatoes from Nashik'},
+    {'_id': 'p2', 'name': 'Tomato Seed', 'category': 'seeds', 'description': 'Hybrid seed'},
+    {'_id': 'p3', 'name': 'Basmati Rice', 'category': 'Grains', 'description': 'Aged long grain rice'},
+    {'_id': 'p4', 'name': 'Potato', 'category': 'Vegetables', 'description': 'Tomato sized potatoes'},
+]
+
+
+@pytest.fixture
+def index():
+    index = ProductSearchIndex()
+    index.build(CATALOGUE)
+    return index
+
+
+def ids(ranked):
+    return [product_id for product_id, _ in ranked]
+
+
+def test_name_matches_rank_first(index):
+    ranked, total, corrections = index.search('tomato ')
+    assert total == 3
+    assert set(ids(ranked)[:2]) == {'p1', 'p2'}
+    assert ids(ranked)[-1] == 'p4'
+    assert corrections == {}
+
+
+def test_prefix_regional_names_and_category(index):
+    assert ids(index.search('bas')[0]) == ['p3']
+    assert ids(index.search('chawal ')[0]) == ['p3']
+    assert ids(index.search('tomato ', category='seeds')[0]) == ['p2']
+
+
+def test_typo_correction(index):
+    ranked, _, corrections = index.search('tomatp ')
+    assert 'p1' in ids(ranked)
+    assert corrections == {'tomatp': 'tomato'}
+
+
+def test_apply_change_reindexes_and_removes(index):
+    index.apply_change('p3', 'update', {'name': 'Wheat', 'category': 'Grains', 'description': 'Sharbati'})
+    assert ids(index.search('wheat ')[0]) == ['p3']
+    assert index.search('basmati ')[1] == 0
+    
+    index.apply_change('p3', 'delete', None)
+    assert index.search('wheat ')[1] == 0
+
+
+def test_search_before_build_starts_background_build(monkeypatch):
+    index = ProductSearchIndex()
+    started = []
+    monkeypatch.setattr(index, 'build', lambda documents=None: pytest.fail('built on the request path'))
+    monkeypatch.setattr(index, 'build_async', lambda: started.append(True))
+    
+    assert index.search('tomato') == ([], 0, {})
+    assert started == [True]
+
+
+@pytest.fixture
+def unbuilt_search(monkeypatch):
+    started = []
+    monkeypatch.setattr(product_search, '_data', None)
+    monkeypatch.setattr(product_search, 'build_async', lambda: started.append(True))
+    return started
+
+
+def test_search_route_falls_back_while_index_builds(client, db, unbuilt_search, monkeypatch):
+    calls = []
+    
+    def text_search(query, search, limit, skip):
+        calls.append((query, search, limit, skip))
+        return [{'_id': 'p1', 'name': 'Red Tomato', 'score': 1.5}], 1
+    
+    monkeypatch.setattr(product_routes, '_text_search', text_search)
+    response = client.get('/api/products/search?q=tomato&category=Vegetables&page=2&limit=5')
+    
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [product['product_id'] for product in body['data']] == ['p1']
+    assert body['pagination']['total'] == 1
+    assert calls == [({'is_active': True, 'category': 'Vegetables'}, 'tomato', 5, 5)]
+    assert unbuilt_search == [True]
+    assert not product_search.is_ready()
+
+
+def test_search_route_uses_index_when_ready(client, db, farmer_token, monkeypatch):
+    auth = {'Authorization': f'Bearer {farmer_token}'}
+    created = client.post('/api/products/', headers=auth, json={
+        'name': 'Tomato', 'category': 'Vegetables', 'description': 'Red', 'price': 20, 'quantity': 50
+    }).get_json()['product_id']
+    monkeypatch.setattr(product_search, '_data', None)
+    product_search.build()
+    
+    body = client.get('/api/products/search?q=tomatoes').get_json()
+    
+    assert [product['product_id'] for product in body['data']] == [created]
+    assert body['data'][0]['score'] > 0
+
+
+def test_near_search_matches_words_while_index_builds(client, db, unbuilt_search, monkeypatch):
+    from models import Product
+    searches = []
+    
+    def find_near(point, radius_m, query=None, **kwargs):
+        searches.append(query)
+        return Product.find_many(query), Product.count(query)
+    
+    farmer_id = db['users'].insert_one({'role': 'farmer'}).inserted_id
+    tomato = Product.create_product(farmer_id, 'Cherry Tomato', 'Vegetables', 'Sweet', 20, 50)
+    Product.create_product(farmer_id, 'Rice', 'Grains', 'Long (grain)', 20, 50)
+    # mongomock has no $geoNear; the filter the route builds is what matters here
+    monkeypatch.setattr(Product, 'find_near', find_near)
+    
+    response = client.get('/api/products/?near=18.5,73.8&search=TOMATO c%2B%2B')
+    
+    assert response.status_code == 200
+    assert [product['product_id'] for product in response.get_json()['data']] == [str(tomato)]
+    assert '$text' not in searches[0]
+    assert unbuilt_search == [True]
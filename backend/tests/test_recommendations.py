@@ -0,0 +1,197 @@
+"""
+Sparse user-item matrix: delta updates, compaction and rebuilds
+"""
+
+from datetime import datetime
+import numpy as np
+import pytest
+from bson import ObjectId
+from ml.interactions import PURCHASE_WEIGHT
+from ml.models import ProductRecommendationModel
+from models import Order, Product, Review
+
+
+@pytest.fixture
+def ids():
+    return {name: ObjectId() for name in ('alice', 'bob', 'apple', 'bean', 'corn')}
+
+
+@pytest.fixture
+def model(db, ids):
+    Review.create_review(ids['apple'], ids['alice'], 4)
+    Review.create_review(ids['bean'], ids['bob'], 2)
+    Order.create_order(ids['bob'], [{'product_id': str(ids['corn']), 'quantity': 1}], 10, 'addr')
+    recommender = ProductRecommendationModel()
+    assert recommender.build_user_item_matrix()
+    return recommender
+
+
+def cell(model, buyer_id, product_id):
+    row, col = model.user_index[str(buyer_id)], model.item_index[str(product_id)]
+    return float(model.user_item_matrix[row, col]) + model._delta.get((row, col), 0.0)
+
+
+def assert_norms_exact(model):
+    effective = (model.user_item_matrix + model._get_delta_matrix()).toarray()
+    np.testing.assert_allclose(model.row_sq_norms, (effective ** 2).sum(axis=1))
+
+
+def test_record_rating_is_a_delta(model, ids):
+    base = model.user_item_matrix.copy()
+    model.record_rating(ids['alice'], ids['bean'], 5)
+    
+    assert cell(model, ids['alice'], ids['bean']) == 5
+    assert (model.user_item_matrix != base).nnz == 0
+    assert_norms_exact(model)
+
+
+def test_new_buyer_and_product_grow_the_matrix(model, ids):
+    stranger, new_product = ObjectId(), ObjectId()
+    model.record_rating(stranger, new_product, 3)
+    
+    assert model.user_item_matrix.shape == (3, 4)
+    assert cell(model, stranger, new_product) == 3
+    assert_norms_exact(model)
+
+
+def test_purchase_does_not_overwrite_rating(model, ids):
+    model.record_purchase(ids['alice'], [ids['apple'], ids['corn']])
+    
+    assert cell(model, ids['alice'], ids['apple']) == 4
+    assert cell(model, ids['alice'], ids['corn']) == PURCHASE_WEIGHT
+
+
+def test_compaction_keeps_values(model, ids):
+    model.record_rating(ids['alice'], ids['bean'], 5)
+    model.record_rating(ids['bob'], ids['bean'], 1)
+    expected = (model.user_item_matrix + model._get_delta_matrix()).toarray()
+    
+    model.compact()
+    
+    assert model._delta == {}
+    np.testing.assert_allclose(model.user_item_matrix.toarray(), expected)
+    assert_norms_exact(model)
+
+
+def test_remove_rating_without_purchase_clears_cell(model, ids):
+    Review.get_collection().delete_many({'buyer_id': ids['alice']})
+    model.remove_rating(ids['alice'], ids['apple'])
+    
+    assert cell(model, ids['alice'], ids['apple']) == 0
+    assert_norms_exact(model)
+
+
+def test_remove_rating_falls_back_to_purchase(model, ids):
+    Review.create_review(ids['corn'], ids['bob'], 5)
+    model.record_rating(ids['bob'], ids['corn'], 5)
+    Review.get_collection().delete_many({'buyer_id': ids['bob'], 'product_id': ids['corn']})
+    model.remove_rating(ids['bob'], ids['corn'])
+    
+    assert cell(model, ids['bob'], ids['corn']) == PURCHASE_WEIGHT
+
+
+def test_remove_rating_keeps_remaining_reviews(model, ids):
+    Review.create_review(ids['apple'], ids['alice'], 2)
+    model.remove_rating(ids['alice'], ids['apple'])
+    
+    assert cell(model, ids['alice'], ids['apple']) == 3
+
+
+def test_rebuild_picks_up_writes_from_other_workers(model, ids, monkeypatch):
+    # Written by another process: no delta was applied here
+    Review.create_review(ids['corn'], ids['alice'], 5)
+    assert not model.needs_rebuild()
+    
+    monkeypatch.setattr(model, 'built_at', datetime(2000, 1, 1))
+    assert model.needs_rebuild()
+    model.build_user_item_matrix()
+    
+    assert cell(model, ids['alice'], ids['corn']) == 5
+    assert not model.needs_rebuild()
+
+
+def test_updates_during_rebuild_are_replayed(model, ids, monkeypatch):
+    import ml.models
+    load = ml.models.load_interaction_matrix
+    
+    def load_then_write():
+        loaded = load()
+        # A review saved after the database was read
+        model.record_rating(ids['bob'], ids['apple'], 1)
+        return loaded
+    
+    monkeypatch.setattr(ml.models, 'load_interaction_matrix', load_then_write)
+    model.build_user_item_matrix()
+    
+    assert cell(model, ids['bob'], ids['apple']) == 1
+    assert model._replay is None
+
+
+@pytest.fixture
+def shop(client, db, farmer_token, monkeypatch):
+    """A buyer with one delivered order, and the recommender the routes update"""
+    farmer = {'Authorization': f'Bearer {farmer_token}'}
+    products = [
+        client.post('/api/products/', headers=farmer, json={
+            'name': name, 'category': 'Vegetables', 'description': name, 'price': 10, 'quantity': 50
+        }).get_json()['product_id']
+        for name in ('Apple', 'Bean')
+    ]
+    buyer_token = client.post('/api/auth/signup', json={
+        'email': 'buyer@example.com', 'password': 'secret123', 'name': 'Buyer', 'role': 'buyer'
+    }).get_json()['access_token']
+    buyer = {'Authorization': f'Bearer {buyer_token}'}
+    client.post('/api/orders/', headers=buyer, json={
+        'items': [{'product_id': products[0], 'quantity': 1}], 'shipping_address': 'addr'
+    })
+    
+    recommender = ProductRecommendationModel()
+    assert recommender.build_user_item_matrix()
+    import ml.models
+    monkeypatch.setattr(ml.models, 'product_recommender', recommender)
+    buyer_id = next(iter(recommender.user_index))
+    return recommender, buyer, buyer_id, products
+
+
+def assert_matches_rebuild(model):
+    rebuilt = ProductRecommendationModel()
+    rebuilt.build_user_item_matrix()
+    for buyer_id in model.user_index:
+        for product_id in model.item_index:
+            expected = 0.0
+            if buyer_id in rebuilt.user_index and product_id in rebuilt.item_index:
+                expected = cell(rebuilt, buyer_id, product_id)
+            assert cell(model, buyer_id, product_id) == pytest.approx(expected), (buyer_id, product_id)
+
+
+def test_review_writes_match_a_full_rebuild(client, shop):
+    model, buyer, buyer_id, (apple, _) = shop
+    assert cell(model, buyer_id, apple) == PURCHASE_WEIGHT
+    
+    first = client.post('/api/reviews/', headers=buyer, json={'product_id': apple, 'rating': 5}).get_json()
+    client.post('/api/reviews/', headers=buyer, json={'product_id': apple, 'rating': 1})
+    assert cell(model, buyer_id, apple) == 3
+    assert_matches_rebuild(model)
+    
+    client.put(f"/api/reviews/{first['review_id']}", headers=buyer, json={'rating': 3})
+    assert cell(model, buyer_id, apple) == 2
+    assert_matches_rebuild(model)
+
+
+def test_cancelled_order_stops_counting(client, shop, monkeypatch):
+    model, buyer, buyer_id, (apple, bean) = shop
+    # mongomock's bulk_write rejects the UpdateOne objects current pymongo builds
+    monkeypatch.setattr(Product, 'restock', lambda items: len(items))
+    order = client.post('/api/orders/', headers=buyer, json={
+        'items': [{'product_id': apple, 'quantity': 1}, {'product_id': bean, 'quantity': 1}],
+        'shipping_address': 'addr'
+    }).get_json()
+    assert cell(model, buyer_id, bean) == PURCHASE_WEIGHT
+    
+    response = client.post(f"/api/orders/{order['order_id']}/cancel", headers=buyer)
+    assert response.status_code == 200, response.get_json()
+    
+    assert cell(model, buyer_id, bean) == 0
+    # Still bought in the first order
+    assert cell(model, buyer_id, apple) == PURCHASE_WEIGHT
+    assert_matches_rebuild(model)
@@ -0,0 +1,89 @@
+"""
+Scheduled job leases: one runner executes each run
+"""
+
+from datetime import datetime, timedelta
+from apscheduler.triggers.interval import IntervalTrigger
+from automation.scheduler import AutomationManager, INTERVAL_ANCHOR
+from models import JobLease, JobRun
+
+
+class Runner(AutomationManager):
+    """Scheduler process with a fixed identity"""
+    
+    def __init__(self, name):
+        super().__init__()
+        self.name = name
+    
+    @property
+    def owner(self):
+        return self.name
+
+
+def test_lease_excludes_other_owners(db):
+    assert JobLease.acquire('job', 'a', 60)
+    assert not JobLease.acquire('job', 'b', 60)
+    # The holder may renew its own lease
+    assert JobLease.acquire('job', 'a', 60)
+    assert not JobLease.release('job', 'b')
+    assert JobLease.release('job', 'a')
+    assert JobLease.acquire('job', 'b', 60)
+
+
+def test_expired_lease_can_be_taken(db):
+    assert JobLease.acquire('job', 'a', 60)
+    JobLease.get_collection().update_one(
+        {'_id': 'job'}, {'$set': {'expires_at': datetime.utcnow() - timedelta(seconds=1)}}
+    )
+    assert JobLease.acquire('job', 'b', 60)
+    assert JobLease.get_collection().find_one({'_id': 'job'})['owner'] == 'b'
+
+
+def test_run_executes_in_one_runner(db):
+    calls = []
+    runners = [Runner('a'), Runner('b')]
+    for runner in runners:
+        runner.add_job('count', lambda: calls.append(1) or 1,
+                       trigger=IntervalTrigger(minutes=30, start_date=INTERVAL_ANCHOR))
+        runner._run_job('count')
+    
+    assert len(calls) == 1
+    runs = JobRun.find_recent('count')
+    assert [(run['owner'], run['status'], run['documents_touched']) for run in runs] == [('a', 'success', 1)]
+
+
+def test_failed_run_releases_lease(db):
+    def fail():
+        raise RuntimeError('boom')
+    
+    calls = []
+    first, second = Runner('a'), Runner('b')
+    first.add_job('flaky', fail, trigger=IntervalTrigger(minutes=30, start_date=INTERVAL_ANCHOR))
+    second.add_job('flaky', lambda: calls.append(1), trigger=IntervalTrigger(minutes=30, start_date=INTERVAL_ANCHOR))
+    
+    first._run_job('flaky')
+    second._run_job('flaky')
+    
+    assert calls == [1]
+    assert sorted((run['owner'], run['status']) for run in JobRun.find_recent('flaky')) == [('a', 'failed'), ('b', 'success')]
+
+
+def test_interval_jobs_share_slots_across_runners(db):
+    runner = Runner('a')
+    runner._register_jobs()
+    now = datetime.now(INTERVAL_ANCHOR.tzinfo)
+    
+    for job_id in ('update_prices', 'order_reminders'):
+        trigger = runner.jobs[job_id]['trigger']
+        # A runner started 20 minutes later fires on the same grid
+        for started in (now, now + timedelta(minutes=20)):
+            next_fire = trigger.get_next_fire_time(None, started)
+            assert (next_fire - INTERVAL_ANCHOR) % trigger.interval == timedelta(0)
+
+
+def test_popularity_job_is_registered_on_the_anchor(db):
+    runner = Runner('a')
+    runner._register_jobs()
+    trigger = runner.jobs['popularity_index']['trigger']
+    assert trigger.interval == timedelta(minutes=15)
+    assert trigger.start_date == INTERVAL_ANCHOR
@@ -0,0 +1,25 @@
+"""
+Lazy loading: workers without the ml blueprint never import the ML stack
+"""
+
+import os
+import subprocess
+import sys
+from conftest import BACKEND_DIR
+
+CHECK = '''
+import sys
+from app import create_app
+create_app(start_scheduler=False)
+print('loaded:', *sorted(m for m in ('scipy', 'sklearn', 'ml.models') if m in sys.modules))
+'''
+
+
+def test_order_and_review_workers_skip_ml_stack():
+    env = {**os.environ, 'ENABLED_BLUEPRINTS': 'auth,products,orders,reviews'}
+    result = subprocess.run(
+        [sys.executable, '-c', CHECK], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr
+    assert 'loaded:' in result.stdout.splitlines()
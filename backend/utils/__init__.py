@@ -14,6 +14,9 @@ from utils.errors import (
 from utils.decorators import (
     role_required, admin_required, farmer_required, buyer_required
 )
+from utils.cache import TTLCache
+from utils.serialization import FastJSONProvider, serialize, serialize_many, projection
+from utils.http_cache import http_cache, collection_version
 
 __all__ = [
     'validate_email', 'validate_password', 'validate_phone',
@@ -21,5 +24,8 @@ __all__ = [
     'sanitize_input',
     'APIError', 'BadRequestError', 'UnauthorizedError', 'ForbiddenError',
     'NotFoundError', 'ConflictError', 'ValidationError', 'InternalServerError',
-    'role_required', 'admin_required', 'farmer_required', 'buyer_required'
+    'role_required', 'admin_required', 'farmer_required', 'buyer_required',
+    'TTLCache',
+    'FastJSONProvider', 'serialize', 'serialize_many', 'projection',
+    'http_cache', 'collection_version'
 ]
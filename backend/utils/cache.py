@@ -0,0 +1,73 @@
+"""
+In-process caching helpers
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache with an optional per-entry time-to-live.
+    
+    Entries beyond maxsize evict the least recently used key. With
+    ttl=None entries never expire and are only evicted or invalidated.
+    """
+    
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key, default=None):
+        """Return the cached value, or default when missing or expired"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def set(self, key, value, ttl=_MISSING):
+        """Store a value, overriding the default TTL if ttl is given"""
+        ttl = self.ttl if ttl is _MISSING else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def pop(self, key):
+        """Invalidate a single key"""
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[0] if entry else None
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self):
+        return len(self._data)
+    
+    def stats(self):
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses
+        }
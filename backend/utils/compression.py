@@ -0,0 +1,132 @@
+"""
+Response compression
+Negotiated brotli/gzip for API responses, including streamed (SSE/chunked) bodies
+"""
+
+import zlib
+from flask import request
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+
+class CompressionSettings:
+    """Effective settings for one request: app defaults overridden per blueprint"""
+    
+    def __init__(self, enabled=True, min_size=500, gzip_level=6, brotli_quality=4, mimetypes=()):
+        self.enabled = enabled
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.mimetypes = frozenset(mimetypes)
+    
+    def override(self, overrides):
+        if overrides is False:
+            overrides = {'enabled': False}
+        values = dict(vars(self), **(overrides or {}))
+        return CompressionSettings(**values)
+
+
+def _choose_encoding(accept_encodings):
+    """Best encoding the client accepts: br, then gzip"""
+    if HAS_BROTLI and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compressor(encoding, settings):
+    """(compress, flush, finish) callables; flush emits everything buffered so far"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=settings.brotli_quality)
+        return compressor.process, compressor.flush, compressor.finish
+    compressor = zlib.compressobj(settings.gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return (
+        compressor.compress,
+        lambda: compressor.flush(zlib.Z_SYNC_FLUSH),
+        lambda: compressor.flush(zlib.Z_FINISH)
+    )
+
+
+def _compress_body(data, encoding, settings):
+    if encoding == 'br':
+        return brotli.compress(data, quality=settings.brotli_quality)
+    compress, _, finish = _compressor(encoding, settings)
+    return compress(data) + finish()
+
+
+def _compress_stream(chunks, encoding, settings):
+    """Compress a streamed body chunk by chunk.
+    
+    Each chunk is flushed so SSE events reach the client as they are
+    produced instead of waiting for the compressor's buffer to fill.
+    """
+    compress, flush, finish = _compressor(encoding, settings)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            out = compress(chunk) + flush()
+            if out:
+                yield out
+        yield finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def init_compression(app):
+    """Register the compression after_request hook using app config.
+    
+    COMPRESSION_BLUEPRINTS maps blueprint names to overrides of the
+    defaults (e.g. {'chatbot': {'min_size': 256}}), or to False to turn
+    compression off for that blueprint.
+    """
+    defaults = CompressionSettings(
+        enabled=app.config.get('COMPRESSION_ENABLED', True),
+        min_size=app.config.get('COMPRESSION_MIN_SIZE', 500),
+        gzip_level=app.config.get('COMPRESSION_GZIP_LEVEL', 6),
+        brotli_quality=app.config.get('COMPRESSION_BROTLI_QUALITY', 4),
+        mimetypes=app.config.get('COMPRESSION_MIMETYPES', ('application/json',))
+    )
+    per_blueprint = {
+        name: defaults.override(overrides)
+        for name, overrides in app.config.get('COMPRESSION_BLUEPRINTS', {}).items()
+    }
+    
+    @app.after_request
+    def compress_response(response):
+        settings = per_blueprint.get(request.blueprint, defaults)
+        if not settings.enabled:
+            return response
+        
+        response.vary.add('Accept-Encoding')
+        if (response.status_code < 200 or response.status_code in (204, 304)
+                or request.method == 'HEAD'
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in settings.mimetypes
+                or 'no-transform' in response.headers.get('Cache-Control', '')):
+            return response
+        
+        encoding = _choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+        
+        if response.is_streamed:
+            response.response = _compress_stream(response.response, encoding, settings)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < settings.min_size:
+                return response
+            response.set_data(_compress_body(data, encoding, settings))
+        
+        response.headers['Content-Encoding'] = encoding
+        return response
+    
+    return app
@@ -3,11 +3,16 @@ Decorators for common functionality
 """
 
 from functools import wraps
-from flask_jwt_extended import get_jwt_identity
+from flask import g
+from flask_jwt_extended import get_jwt, get_jwt_identity
 from utils.errors import UnauthorizedError
 import json
 
 
+# Top-level token claims that make up the identity dict
+IDENTITY_CLAIMS = ('user_id', 'email', 'role')
+
+
 def _normalize_role(role):
     """Normalize equivalent role names between frontend and backend"""
     if not role:
@@ -20,34 +25,44 @@ def _normalize_role(role):
 def get_identity():
     """Return JWT identity as a dict when possible.
 
-    Some versions/configurations store the identity as a JSON string in the
-    token's "sub" claim. This helper parses that into a dict so existing
-    code can continue to use identity.get('user_id') etc.
+    Tokens carry the identity either as top-level user_id/email/role claims
+    (current layout) or, for tokens issued earlier, as a JSON string in the
+    "sub" claim. Either way the parsed dict is cached on flask.g so repeated
+    calls within a request (decorator plus handler) decode it only once.
     """
-    identity = get_jwt_identity()
-    if isinstance(identity, str):
-        try:
-            return json.loads(identity)
-        except Exception:
-            return identity
+    identity = g.get('_jwt_identity')
+    if identity is not None:
+        return identity
+    
+    claims = get_jwt()
+    if 'user_id' in claims and 'role' in claims:
+        identity = {key: claims.get(key) for key in IDENTITY_CLAIMS}
+    else:
+        identity = get_jwt_identity()
+        if isinstance(identity, str):
+            try:
+                identity = json.loads(identity)
+            except Exception:
+                pass
+    
+    g._jwt_identity = identity
     return identity
 
 
 def role_required(allowed_roles):
     """Decorator to check user role"""
+    # Normalize allowed roles once, when the route is decorated
+    normalized_allowed = frozenset(_normalize_role(r) for r in allowed_roles)
+    denied_message = f"Access denied. Required roles: {', '.join(allowed_roles)}"
+    
     def decorator(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
             identity = get_identity()
             user_role = _normalize_role(identity.get('role'))
             
-            # Normalize allowed roles as well for comparison
-            normalized_allowed = [_normalize_role(r) for r in allowed_roles]
-
             if user_role not in normalized_allowed:
-                raise UnauthorizedError(
-                    f"Access denied. Required roles: {', '.join(allowed_roles)}"
-                )
+                raise UnauthorizedError(denied_message)
             
             return fn(*args, **kwargs)
         
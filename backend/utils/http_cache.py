@@ -0,0 +1,93 @@
+"""
+HTTP caching helpers
+Weak ETags, conditional GET handling and Cache-Control for public read endpoints
+"""
+
+import hashlib
+from functools import wraps
+from flask import request, make_response
+
+
+def _weak_etag(*parts):
+    digest = hashlib.blake2b(digest_size=12)
+    for part in parts:
+        digest.update(str(part).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _cache_control(max_age, stale_while_revalidate, private):
+    directives = ['private' if private else 'public', f'max-age={max_age}']
+    if stale_while_revalidate:
+        directives.append(f'stale-while-revalidate={stale_while_revalidate}')
+    return ', '.join(directives)
+
+
+def _not_modified(etag, cache_control):
+    response = make_response('', 304)
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+
+def http_cache(max_age=0, stale_while_revalidate=0, private=False, version=None):
+    """Add a weak ETag and Cache-Control to a GET endpoint and answer If-None-Match.
+    
+    version(*view_args, **view_kwargs) returns a token that changes whenever
+    the response would (e.g. a collection version or a document's
+    updated_at). It is combined with the path and query string, and a
+    matching If-None-Match gets a 304 before the view runs. Without a
+    version, or when it returns None, the ETag is a hash of the body.
+    """
+    cache_control = _cache_control(max_age, stale_while_revalidate, private)
+    
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(*args, **kwargs)
+            
+            etag = None
+            if version is not None:
+                token = version(*args, **kwargs)
+                if token is not None:
+                    etag = _weak_etag(request.full_path, token)
+                    if request.if_none_match.contains_weak(etag):
+                        return _not_modified(etag, cache_control)
+            
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            
+            if etag is None:
+                etag = _weak_etag(request.full_path, response.get_data())
+                if request.if_none_match.contains_weak(etag):
+                    return _not_modified(etag, cache_control)
+            
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = cache_control
+            return response
+        return wrapper
+    return decorator
+
+
+def init_http_cache(app):
+    """Bump collection versions once per request rather than once per written document"""
+    from models import CollectionVersion
+    
+    @app.before_request
+    def defer_version_bumps():
+        CollectionVersion.defer()
+    
+    @app.teardown_request
+    def flush_version_bumps(error):
+        CollectionVersion.flush()
+
+
+def collection_version(*collection_names):
+    """version callable for http_cache from CollectionVersion counters"""
+    def version(*args, **kwargs):
+        from models import CollectionVersion
+        tokens = [CollectionVersion.get_token(name) for name in collection_names]
+        return None if None in tokens else '|'.join(tokens)
+    return version
@@ -0,0 +1,334 @@
+"""
+Application metrics
+Request, MongoDB and sub-operation timings exposed in Prometheus text format
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from flask import g, request, Response
+from pymongo import monitoring
+
+
+# Latency buckets in seconds, from cache hits to slow model calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 500, 1000, 5000, 10000, 50000, 100000, 500000, 1000000)
+
+# Handshake and monitoring chatter skipped by every command listener; not application queries
+IGNORED_COMMANDS = frozenset(['hello', 'ismaster', 'isMaster', 'ping', 'saslStart', 'saslContinue',
+                              'endSessions', 'buildInfo', 'getnonce', 'authenticate'])
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    """Base for labelled series; values are keyed by the tuple of label values"""
+    
+    kind = None
+    
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+    
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+    
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+    
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_series(key, value))
+        return lines
+    
+    def _render_series(self, key, value):
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}']
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    
+    kind = 'counter'
+    
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, e.g. requests in flight"""
+    
+    kind = 'gauge'
+    
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+    
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+    
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram with sum and count per label set"""
+    
+    kind = 'histogram'
+    
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+    
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Per-bucket (non-cumulative) counts plus +Inf, then sum
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+    
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+    
+    def snapshot(self, **labels):
+        """(count, sum) for one label set"""
+        series = self._values.get(self._key(labels))
+        if series is None:
+            return 0, 0.0
+        return sum(series[0]), series[1]
+    
+    def _render_series(self, key, value):
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+            lines.append(f'{self.name}_bucket{le} {cumulative}')
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f'{self.name}_sum{labels} {total!r}')
+        lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """Named metrics of this process, rendered together for /metrics"""
+    
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+    
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+    
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+    
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+    
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+    
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Shared registry; metrics are per process, so each gunicorn worker reports its own
+registry = MetricsRegistry()
+
+REQUEST_LATENCY = registry.histogram(
+    'http_request_duration_seconds', 'HTTP request latency', ('method', 'blueprint', 'endpoint')
+)
+REQUESTS = registry.counter(
+    'http_requests_total', 'HTTP requests by status code', ('method', 'blueprint', 'endpoint', 'status')
+)
+IN_FLIGHT = registry.gauge(
+    'http_requests_in_flight', 'HTTP requests currently being served', ('blueprint',)
+)
+RESPONSE_SIZE = registry.histogram(
+    'http_response_size_bytes', 'HTTP response body size as sent', ('blueprint', 'endpoint'), buckets=SIZE_BUCKETS
+)
+MONGO_LATENCY = registry.histogram(
+    'mongodb_command_duration_seconds', 'MongoDB command latency', ('command', 'collection')
+)
+MONGO_FAILURES = registry.counter(
+    'mongodb_command_failures_total', 'MongoDB commands that failed', ('command', 'collection')
+)
+OPERATION_LATENCY = registry.histogram(
+    'app_operation_duration_seconds', 'Latency of timed steps inside requests', ('operation',)
+)
+
+
+def timed(operation):
+    """Time a block or function as app_operation_duration_seconds{operation=...}.
+    
+    Use as a context manager (with timed('chatbot.retrieval'): ...) or a
+    decorator.
+    """
+    return _Timed(operation)
+
+
+class _Timed:
+    def __init__(self, operation):
+        self.operation = operation
+        self._starts = threading.local()
+    
+    def __enter__(self):
+        stack = getattr(self._starts, 'stack', None)
+        if stack is None:
+            stack = self._starts.stack = []
+        stack.append(time.perf_counter())
+        return self
+    
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self._starts.stack.pop()
+        OPERATION_LATENCY.observe(elapsed, operation=self.operation)
+        return False
+    
+    def __call__(self, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with self:
+                return func(*args, **kwargs)
+        return wrapper
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo listener recording per-command latency and failures"""
+    
+    IGNORED = IGNORED_COMMANDS
+    
+    def __init__(self):
+        self._collections = {}
+    
+    def started(self, event):
+        if event.command_name in self.IGNORED:
+            return
+        collection = event.command.get(event.command_name)
+        self._collections[(event.connection_id, event.request_id)] = (
+            collection if isinstance(collection, str) else ''
+        )
+    
+    def succeeded(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), None)
+        if collection is not None:
+            MONGO_LATENCY.observe(
+                event.duration_micros / 1e6, command=event.command_name, collection=collection
+            )
+    
+    def failed(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), None)
+        if collection is not None:
+            MONGO_LATENCY.observe(
+                event.duration_micros / 1e6, command=event.command_name, collection=collection
+            )
+            MONGO_FAILURES.inc(command=event.command_name, collection=collection)
+
+
+def _request_labels():
+    # Unmatched URLs share one label so 404 scans can't explode the series count
+    return request.blueprint or '', request.endpoint or 'unmatched'
+
+
+def init_metrics(app):
+    """Record request metrics and serve them at METRICS_PATH.
+    
+    Register before other after_request hooks (e.g. compression): Flask
+    runs them in reverse order, so the size recorded is what was sent.
+    """
+    if not app.config.get('METRICS_ENABLED', True):
+        return app
+    
+    @app.before_request
+    def start_request_timer():
+        g._metrics_start = time.perf_counter()
+        g._metrics_status = 500
+        IN_FLIGHT.inc(blueprint=request.blueprint or '')
+    
+    @app.after_request
+    def record_response(response):
+        if '_metrics_start' not in g:
+            return response
+        blueprint, endpoint = _request_labels()
+        g._metrics_status = response.status_code
+        if not response.is_streamed:
+            RESPONSE_SIZE.observe(
+                response.calculate_content_length() or 0, blueprint=blueprint, endpoint=endpoint
+            )
+        return response
+    
+    @app.teardown_request
+    def finish_request_timer(exc):
+        # Runs even when the view raised, so in-flight always comes back down
+        start = g.pop('_metrics_start', None)
+        if start is None:
+            return
+        blueprint, endpoint = _request_labels()
+        elapsed = time.perf_counter() - start
+        IN_FLIGHT.dec(blueprint=blueprint)
+        REQUEST_LATENCY.observe(elapsed, method=request.method, blueprint=blueprint, endpoint=endpoint)
+        REQUESTS.inc(method=request.method, blueprint=blueprint, endpoint=endpoint,
+                     status=g.pop('_metrics_status', 500))
+    
+    @app.route(app.config.get('METRICS_PATH', '/metrics'), methods=['GET'])
+    def metrics():
+        return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    
+    return app
@@ -0,0 +1,163 @@
+"""
+Sampling profiler
+Periodic stack snapshots of running threads, reported as collapsed stacks
+(one "frame;frame;frame count" line per stack) for flamegraph.pl / speedscope
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from flask import g, request, Response
+
+_PREFIXES = sorted({p for p in (sys.prefix, sys.base_prefix, os.getcwd()) if p}, key=len, reverse=True)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    filename = code.co_filename
+    for prefix in _PREFIXES:
+        if filename.startswith(prefix):
+            filename = filename[len(prefix):].lstrip(os.sep)
+            break
+    # ';' separates frames in the collapsed format
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(';', ',')
+
+
+def collapse(frame, root=None):
+    """Stack of frame as 'root;outermost;...;innermost'"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    if root:
+        labels.append(root)
+    return ';'.join(reversed(labels))
+
+
+def render_collapsed(samples):
+    """Collapsed-stack text, heaviest stacks first"""
+    return ''.join(f'{stack} {count}\n' for stack, count in samples.most_common())
+
+
+class StackSampler:
+    """Samples thread stacks every interval seconds from a background thread.
+    
+    Uses sys._current_frames(), so the profiled code runs untouched (no
+    sys.setprofile hooks); cost is one stack walk per thread per sample.
+    thread_ids limits sampling to those threads, otherwise every thread
+    except the sampler and those in exclude is sampled.
+    """
+    
+    def __init__(self, interval=0.005, thread_ids=None, exclude=()):
+        self.interval = interval
+        self.thread_ids = set(thread_ids) if thread_ids else None
+        self.exclude = set(exclude)
+        self.samples = Counter()
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        """Stop sampling and return the Counter of collapsed stacks"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.samples
+    
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or thread_id in self.exclude:
+                    continue
+                if self.thread_ids is not None and thread_id not in self.thread_ids:
+                    continue
+                self.samples[collapse(frame, names.get(thread_id, str(thread_id)))] += 1
+            self.sample_count += 1
+
+
+class ProcessProfiler:
+    """Whole-process profiling on demand, one session at a time"""
+    
+    def __init__(self, interval=0.005, max_seconds=60):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self._busy = threading.Lock()
+    
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            interval=config.PROFILER_INTERVAL_MS / 1000.0,
+            max_seconds=config.PROFILER_MAX_SECONDS
+        )
+    
+    def profile(self, seconds, interval=None):
+        """Sample every other thread for seconds; returns (samples, sample_count) or None if busy"""
+        if not self._busy.acquire(blocking=False):
+            return None
+        try:
+            sampler = StackSampler(
+                interval=interval or self.interval, exclude=[threading.get_ident()]
+            ).start()
+            time.sleep(min(seconds, self.max_seconds))
+            return sampler.stop(), sampler.sample_count
+        finally:
+            self._busy.release()
+
+
+def _is_admin():
+    from flask_jwt_extended import verify_jwt_in_request
+    from utils.decorators import get_identity
+    try:
+        if verify_jwt_in_request(optional=True) is None:
+            return False
+        identity = get_identity()
+    except Exception:
+        return False
+    return isinstance(identity, dict) and identity.get('role') == 'admin'
+
+
+def init_request_profiler(app):
+    """Answer ?profile=1 from admins with the collapsed stacks of that request.
+    
+    The view runs normally; its response is replaced by the profile, with
+    the original status in X-Profiled-Status.
+    """
+    interval = app.config.get('PROFILER_INTERVAL_MS', 5) / 1000.0
+    
+    @app.before_request
+    def start_request_profile():
+        if request.args.get('profile') != '1' or not _is_admin():
+            return
+        g._profiler = StackSampler(interval=interval, thread_ids=[threading.get_ident()]).start()
+    
+    @app.after_request
+    def finish_request_profile(response):
+        sampler = g.pop('_profiler', None)
+        if sampler is None:
+            return response
+        samples = sampler.stop()
+        profiled = Response(render_collapsed(samples), mimetype='text/plain')
+        profiled.headers['X-Profiled-Status'] = str(response.status_code)
+        profiled.headers['X-Profile-Samples'] = str(sampler.sample_count)
+        profiled.headers['Cache-Control'] = 'no-store'
+        return profiled
+    
+    return app
+
+
+def _create_profiler():
+    from config import config
+    return ProcessProfiler.from_config(config)
+
+
+# Shared per-process profiler behind /api/admin/profile
+process_profiler = _create_profiler()
@@ -0,0 +1,168 @@
+"""
+MongoDB query monitor
+Per-request command counts and timings, slow-query log and N+1 detection
+"""
+
+import logging
+import threading
+from flask import g, has_request_context, request
+from pymongo import monitoring
+from utils.metrics import IGNORED_COMMANDS, registry
+
+logger = logging.getLogger(__name__)
+
+N_PLUS_ONE = registry.counter(
+    'mongodb_n_plus_one_total', 'Requests that repeated a command on one collection past the threshold',
+    ('endpoint', 'collection')
+)
+
+# Keys whose values are query documents in each command
+_FILTER_KEYS = {
+    'find': 'filter', 'count': 'query', 'distinct': 'query',
+    'findAndModify': 'query', 'delete': 'deletes', 'update': 'updates', 'aggregate': 'pipeline'
+}
+
+
+def query_shape(value, depth=0):
+    """Query document with every literal replaced by '?'.
+    
+    Keeps field names and operators so slow queries can be grouped and
+    matched to indexes without logging user data.
+    """
+    if depth > 6:
+        return '...'
+    if isinstance(value, dict):
+        return {key: query_shape(item, depth + 1) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and isinstance(value[0], dict):
+            return [query_shape(value[0], depth + 1)] + (['...'] if len(value) > 1 else [])
+        return '[?]'
+    return '?'
+
+
+def command_shape(command_name, command):
+    """Shape of the filter (or pipeline / first update or delete spec) of a command"""
+    key = _FILTER_KEYS.get(command_name)
+    if key is None:
+        return None
+    value = command.get(key)
+    if command_name in ('update', 'delete') and value:
+        value = value[0].get('q')
+    return query_shape(value) if value is not None else None
+
+
+class RequestQueryStats:
+    """Commands issued while serving one request, grouped by collection"""
+    
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        # collection -> [count, seconds, {command_name: count}]
+        self.by_collection = {}
+    
+    def record(self, command_name, collection, duration):
+        self.count += 1
+        self.duration += duration
+        entry = self.by_collection.setdefault(collection, [0, 0.0, {}])
+        entry[0] += 1
+        entry[1] += duration
+        entry[2][command_name] = entry[2].get(command_name, 0) + 1
+    
+    def repeated(self, threshold):
+        """(collection, count) for collections hit more than threshold times"""
+        return [(name, entry[0]) for name, entry in self.by_collection.items() if entry[0] > threshold]
+    
+    def header(self):
+        """Compact breakdown for the X-DB-Queries debug header"""
+        parts = [f'count={self.count}', f'time_ms={self.duration * 1000:.1f}']
+        for name, (count, duration, _) in sorted(self.by_collection.items(), key=lambda kv: -kv[1][1]):
+            parts.append(f'{name or "-"}={count}/{duration * 1000:.1f}ms')
+        return '; '.join(parts)
+
+
+class QueryMonitor(monitoring.CommandListener):
+    """pymongo listener feeding RequestQueryStats and the slow-query log.
+    
+    Commands run on the thread that issued them, so stats are attached to
+    the current request through flask.g; commands from background threads
+    (scheduler, catalogue watcher) are only checked for slowness.
+    """
+    
+    IGNORED = IGNORED_COMMANDS
+    
+    def __init__(self, slow_query_ms=100):
+        self.slow_query_seconds = slow_query_ms / 1000.0
+        self._pending = {}
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def from_config(cls, config):
+        return cls(slow_query_ms=config.SLOW_QUERY_MS)
+    
+    def started(self, event):
+        if event.command_name in self.IGNORED:
+            return
+        # getMore carries the cursor id under its own name and the collection separately
+        key = 'collection' if event.command_name == 'getMore' else event.command_name
+        collection = event.command.get(key)
+        stats = None
+        if has_request_context():
+            stats = g.get('_query_stats')
+            if stats is None:
+                stats = g._query_stats = RequestQueryStats()
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (
+                collection if isinstance(collection, str) else '', event.command, stats
+            )
+    
+    def succeeded(self, event):
+        self._finish(event)
+    
+    def failed(self, event):
+        self._finish(event)
+    
+    def _finish(self, event):
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        collection, command, stats = pending
+        duration = event.duration_micros / 1e6
+        if stats is not None:
+            stats.record(event.command_name, collection, duration)
+        if duration >= self.slow_query_seconds:
+            logger.warning(
+                f"[SLOW QUERY] {event.command_name} {collection} {duration * 1000:.1f}ms "
+                f"shape={command_shape(event.command_name, command)}"
+            )
+
+
+def init_query_monitor(app):
+    """Check each request for N+1 patterns and optionally expose its DB breakdown.
+    
+    The X-DB-Queries and Server-Timing headers are added in debug mode or
+    when QUERY_DEBUG_HEADER is set.
+    """
+    threshold = app.config.get('N_PLUS_ONE_THRESHOLD', 10)
+    debug_header = app.debug or app.config.get('QUERY_DEBUG_HEADER', False)
+    
+    @app.after_request
+    def report_queries(response):
+        stats = g.pop('_query_stats', None)
+        if stats is None:
+            return response
+        
+        for collection, count in stats.repeated(threshold):
+            endpoint = request.endpoint or 'unmatched'
+            N_PLUS_ONE.inc(endpoint=endpoint, collection=collection)
+            logger.warning(
+                f"[N+1] {request.method} {request.path} issued {count} commands on "
+                f"{collection} ({stats.by_collection[collection][2]})"
+            )
+        
+        if debug_header:
+            response.headers['X-DB-Queries'] = stats.header()
+            response.headers.add('Server-Timing', f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries"')
+        return response
+    
+    return app
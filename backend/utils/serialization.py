@@ -0,0 +1,95 @@
+"""
+JSON serialization for API responses
+orjson-backed Flask JSON provider and field maps for emitting Mongo documents directly
+"""
+
+import sys
+from datetime import date, datetime
+from bson import ObjectId
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+def _default(obj):
+    """Types neither encoder handles natively"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    # numpy values can only exist once something else imported it; don't pay for it at startup
+    np = sys.modules.get('numpy')
+    if np is not None:
+        if isinstance(obj, np.generic):
+            return obj.item()
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    # Decimal, UUID, dataclasses, ...
+    return DefaultJSONProvider.default(obj)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider using orjson when installed, stdlib json otherwise.
+    
+    ObjectId is encoded as its hex string and datetime as ISO 8601 on both
+    paths, so routes can return Mongo documents without converting fields.
+    """
+    
+    # Key order carries no meaning for API clients; sorting costs time
+    sort_keys = False
+    
+    def dumps(self, obj, **kwargs):
+        if HAS_ORJSON and not kwargs:
+            return orjson.dumps(obj, default=_default, option=self._orjson_options()).decode()
+        kwargs.setdefault('default', _default)
+        return super().dumps(obj, **kwargs)
+    
+    def loads(self, s, **kwargs):
+        if HAS_ORJSON and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+    
+    def response(self, *args, **kwargs):
+        if not HAS_ORJSON:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        # Hand orjson's bytes straight to the response instead of round-tripping through str
+        body = orjson.dumps(obj, default=_default, option=self._orjson_options())
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+    
+    def _orjson_options(self):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if self.compact is False or (self.compact is None and self._app.debug):
+            option |= orjson.OPT_INDENT_2
+        return option
+
+
+def serialize(doc, fields):
+    """Build a response dict from a document using a field map.
+    
+    fields maps output keys to a document key, or to a callable taking the
+    document. Values are emitted as-is; the JSON provider encodes ObjectId
+    and datetime.
+    """
+    return {
+        key: source(doc) if callable(source) else doc.get(source)
+        for key, source in fields.items()
+    }
+
+
+def serialize_many(docs, fields):
+    """serialize() for a list of documents"""
+    return [serialize(doc, fields) for doc in docs]
+
+
+def projection(fields):
+    """Mongo projection fetching only the document keys a field map reads"""
+    return {source: 1 for source in fields.values() if isinstance(source, str)}
@@ -0,0 +1,139 @@
+"""
+Startup profiling
+Wall time and newly imported packages for each phase of create_app and warm-up
+
+Run `python -m utils.startup` for a report, with --imports to break the
+import cost down by package (via python -X importtime).
+"""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _root(module_name):
+    return module_name.partition('.')[0]
+
+
+class StartupReport:
+    """Ordered phase timings for this process.
+    
+    Each phase records its wall time and the top-level packages first
+    imported during it, which is where most startup cost hides.
+    Phases may nest; the report keeps the nesting depth.
+    """
+    
+    def __init__(self):
+        self.phases = []
+        self._depth = 0
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def phase(self, name):
+        before = set(sys.modules)
+        with self._lock:
+            entry = {'phase': name, 'depth': self._depth, 'seconds': None, 'packages': []}
+            self.phases.append(entry)
+            self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            elapsed = time.perf_counter() - start
+            loaded = set(sys.modules) - before
+            with self._lock:
+                self._depth -= 1
+                entry['seconds'] = round(elapsed, 4)
+                entry['modules'] = len(loaded)
+                new = {_root(m) for m in loaded} - {_root(m) for m in before}
+                # Private extension modules (_ctypes, _cython_...) only add noise
+                entry['packages'] = sorted(name for name in new if not name.startswith('_'))
+    
+    def get(self, name):
+        """Most recent record of a phase, or None"""
+        for entry in reversed(self.phases):
+            if entry['phase'] == name:
+                return entry
+        return None
+    
+    def render(self):
+        lines = []
+        for entry in self.phases:
+            seconds = f"{entry['seconds']:.3f}s" if entry['seconds'] is not None else 'running'
+            label = '  ' * entry['depth'] + entry['phase']
+            line = f"{label:<40}{seconds:>10}"
+            if entry['packages']:
+                line += '  +' + ', '.join(entry['packages'])
+            lines.append(line)
+        return '\n'.join(lines)
+    
+    def as_dict(self):
+        with self._lock:
+            return {'pid': os.getpid(), 'phases': [dict(entry) for entry in self.phases]}
+
+
+# Shared per-process report; create_app and warm_up record into it
+startup_report = StartupReport()
+
+
+def loaded(module_name, attribute):
+    """module_name.attribute if that module is already imported in this process, else None.
+    
+    Lets write paths keep an optional subsystem's in-memory state current
+    (e.g. the recommender matrix) without importing it in workers that
+    never serve it.
+    """
+    module = sys.modules.get(module_name)
+    return getattr(module, attribute, None) if module is not None else None
+
+
+def import_costs(code='from app import create_app; create_app(start_scheduler=False)'):
+    """Self import time per top-level package in seconds, from a fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    costs = defaultdict(float)
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        costs[_root(name.strip())] += int(self_us) / 1e6
+    return sorted(costs.items(), key=lambda kv: -kv[1])
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Startup time report for the Flask app')
+    parser.add_argument('--warm-up', action='store_true', help='also run warm_up() and report its steps')
+    parser.add_argument('--imports', type=int, nargs='?', const=25, default=0, metavar='N',
+                        help='list the N packages with the highest import cost')
+    args = parser.parse_args()
+    
+    sys.path.insert(0, BACKEND_DIR)
+    # The instance app.py records into; under -m this module is also __main__
+    from utils.startup import startup_report
+    from dotenv import load_dotenv
+    load_dotenv()
+    with startup_report.phase('import app'):
+        from app import create_app, warm_up
+    create_app(start_scheduler=False)
+    if args.warm_up:
+        warm_up()
+    
+    print('\n' + startup_report.render())
+    
+    if args.imports:
+        print(f"\n{'package':<40}{'import':>10}")
+        for package, seconds in import_costs()[:args.imports]:
+            print(f"{package:<40}{seconds:>9.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,7 @@
 Utility validators for input validation
 """
 
+import math
 import re
 from datetime import datetime
 
@@ -33,6 +34,48 @@ def validate_url(url: str) -> bool:
     return bool(re.match(pattern, url))
 
 
+def parse_location(value) -> dict:
+    """GeoJSON Point from "lat,lng", {"latitude", "longitude"} or a GeoJSON Point; raises ValueError"""
+    if isinstance(value, str):
+        parts = value.split(',')
+        if len(parts) != 2:
+            raise ValueError("Location must be given as 'latitude,longitude'")
+        latitude, longitude = parts
+    elif isinstance(value, dict) and value.get('type') == 'Point':
+        coordinates = value.get('coordinates')
+        if not isinstance(coordinates, (list, tuple)) or len(coordinates) != 2:
+            raise ValueError("GeoJSON Point coordinates must be [longitude, latitude]")
+        longitude, latitude = coordinates
+    elif isinstance(value, dict):
+        latitude, longitude = value.get('latitude'), value.get('longitude')
+    else:
+        raise ValueError("Location must be 'latitude,longitude', {latitude, longitude} or a GeoJSON Point")
+    
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        raise ValueError("Latitude and longitude must be numbers")
+    # Written so that NaN fails too
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError("Latitude must be between -90 and 90 and longitude between -180 and 180")
+    return {'type': 'Point', 'coordinates': [longitude, latitude]}
+
+
+def parse_number(value):
+    """int or float from a JSON number or a numeric string (CSV cells); raises ValueError"""
+    if isinstance(value, str):
+        text = value.strip()
+        try:
+            return int(text)
+        except ValueError:
+            value = float(text)
+    elif isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{value!r} is not a number")
+    if not math.isfinite(value):
+        raise ValueError(f"{value!r} is not a finite number")
+    return value
+
+
 def validate_positive_number(value) -> bool:
     """Validate positive number"""
     try:
@@ -0,0 +1,16 @@
+"""
+WSGI Entry Point
+Production app instance for gunicorn (gunicorn.conf.py) and waitress (serve.py)
+"""
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from config import config
+from app import create_app, warm_up
+
+# The scheduler is started by the server in a single designated process
+app = create_app(start_scheduler=False)
+
+if config.PRELOAD_MODELS:
+    warm_up()